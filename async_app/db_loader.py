@@ -1,22 +1,203 @@
-from typing import List, Dict
-from async_app.database import async_session, init_db
-from async_app.models import Trade
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import select, text
+from async_app import database
+from async_app.database import async_session, init_db, ensure_partitions
+from common import loading
+from common.batch import TradeBatch
+from common.ingest import Bulletin
+from common.loading import (  # noqa: F401
+    CLEAR_STAGING_SQL, CREATE_STAGING_SQL, INTEGER_COLUMNS, LOAD_METHOD, LOAD_METHODS, MERGE_STAGING_SQL,
+    STAGING_TABLE, TRADE_COLUMNS, TRADE_KEY, check_method, keyed_rows,
+)
+from common.metrics import metrics
+from common.models import Trade
+from common.result_cache import query_cache
 
-async def load_data(data: List[Dict]) -> None:
+# Способы загрузки и общая часть загрузчика - в common.loading; здесь строки
+# передаются бинарным COPY по соединению asyncpg, а общие функции над
+# синхронной сессией вызываются через AsyncSession.run_sync
+
+# Кэши справочников и проверенные месяцы секций в памяти процесса
+_state = loading.LoaderState()
+
+async def _ensure_partitions(batches: List[TradeBatch]) -> None:
+    """
+    Создает секции trades для месяцев загружаемых дат, которых этот
+    процесс еще не проверял.
+    """
+    months = _state.new_months(batches)
+    if months:
+        await ensure_partitions(months)
+        _state.partition_months.update(months)
+
+async def _resolve_dimensions(batches: List[TradeBatch]) -> None:
+    """
+    Находит id инструментов и базисов, которых еще нет в кэше, добавляя
+    новые значения в справочники.
+
+    Справочники пополняются отдельной короткой транзакцией, и id попадают
+    в кэш только после ее фиксации: откат загрузки сделок не оставит в
+    кэше id несуществующих строк.
+    """
+    names, bases = _state.missing_dimensions(batches)
+    if not names and not bases:
+        return
+    async with async_session() as session:
+        async with session.begin():
+            instrument_pairs, basis_pairs = await session.run_sync(loading.add_dimensions, names, bases)
+    _state.instrument_ids.update(instrument_pairs)
+    _state.basis_ids.update(basis_pairs)
+
+async def _copy_records(session, records: List[tuple], batch_size: int, table: str = Trade.__tablename__) -> None:
+    """
+    Передает записи в таблицу бинарным COPY (copy_records_to_table asyncpg)
+    внутри текущей транзакции сессии.
+    """
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    for start in range(0, len(records), batch_size):
+        await raw_connection.driver_connection.copy_records_to_table(
+            table,
+            records=records[start:start + batch_size],
+            columns=TRADE_COLUMNS
+        )
+        metrics.count_round_trip(connection.info)
+
+async def _merge_records(session, records: List[tuple], batch_size: int) -> None:
+    """
+    Загружает записи во временную таблицу и сливает ее с trades одним
+    оператором INSERT ... ON CONFLICT DO UPDATE.
+    """
+    await session.execute(text(CREATE_STAGING_SQL))
+    await _copy_records(session, records, batch_size, STAGING_TABLE)
+    await session.execute(text(MERGE_STAGING_SQL))
+    await session.execute(text(CLEAR_STAGING_SQL))
+
+async def _write_records(session, records: List[tuple], method: str, batch_size: Optional[int]) -> None:
+    if not records:
+        return
+    batch_size = batch_size or database.settings.copy_batch_size
+    if method == "merge":
+        await _merge_records(session, records, batch_size)
+    elif method == "copy":
+        await _copy_records(session, records, batch_size)
+    else:
+        await session.run_sync(loading.insert_records, records)
+
+async def load_data(data: TradeBatch, method: str = LOAD_METHOD, batch_size: Optional[int] = None) -> None:
     """
     Асинхронно загружает данные торгов в базу данных.
 
     Args:
-        data (List[Dict]): Список словарей с данными торгов.
+        data (TradeBatch): Колоночная пачка данных торгов.
+        method (str): Способ загрузки: "merge", "copy" или "insert".
+        batch_size (int): Строк в одной команде COPY (None - из database.settings).
+    """
+    check_method(method)
+    batch = keyed_rows(data)
+    await _ensure_partitions([batch])
+    await _resolve_dimensions([batch])
+
+    async with async_session() as session:
+        async with session.begin():
+            # COPY выполняется напрямую в asyncpg: открываем транзакцию через SQLAlchemy
+            await session.execute(select(1))
+            records = _state.trade_records(batch)
+            await _write_records(session, records, method, batch_size)
+            if records:
+                await session.run_sync(loading.refresh_aggregates, [batch.trade_date.date()])
+    if records:
+        # Сохраненные результаты запросов устарели
+        query_cache.invalidate()
+
+async def get_loaded_bulletins() -> Dict[str, str]:
+    """
+    Возвращает уже загруженные бюллетени.
+
+    Returns:
+        Dict[str, str]: Словарь {URL бюллетеня: хэш содержимого}
+    """
+    async with async_session() as session:
+        return await session.run_sync(loading.loaded_bulletins)
+
+async def load_bulletin(bulletin: Bulletin, data: TradeBatch, method: str = LOAD_METHOD,
+                        batch_size: Optional[int] = None) -> None:
+    """
+    Загружает данные торгов одного бюллетеня и отмечает бюллетень как
+    загруженный в одной транзакции.
+
+    Args:
+        bulletin (Bulletin): Загружаемый бюллетень
+        data (TradeBatch): Колоночная пачка данных торгов бюллетеня.
+        method (str): Способ загрузки: "merge", "copy" или "insert".
+        batch_size (int): Строк в одной команде COPY (None - из database.settings).
+    """
+    await load_bulletins([(bulletin, data)], method, batch_size)
+
+async def load_bulletins(items: List[Tuple[Bulletin, TradeBatch]], method: str = LOAD_METHOD,
+                         batch_size: Optional[int] = None) -> None:
+    """
+    Загружает пачку разобранных бюллетеней в одной транзакции и отмечает
+    их как загруженные.
+
+    В режимах "merge" и "copy" строки передаются бинарным COPY по
+    соединению asyncpg, которое SQLAlchemy использует для этой же
+    транзакции, порциями по batch_size строк. В режиме "merge" строки всех
+    бюллетеней пачки сначала попадают во временную таблицу, а затем
+    сливаются с trades одним оператором, поэтому повторная загрузка
+    того же периода безопасна.
+
+    Инструменты и базисы хранятся в справочниках instruments и bases, а
+    их id берутся из кэша в памяти процесса; новые значения добавляются
+    в справочники перед загрузкой сделок. Дневные агрегаты
+    (daily_aggregates) за загруженные даты пересчитываются в той же
+    транзакции. После фиксации транзакции
+    кэш результатов запросов (async_app.queries) сбрасывается.
+
+    Бюллетень без строк сделок не отмечается как загруженный (см.
+    common.loading.skip_empty) и будет запрошен снова.
+
+    Args:
+        items (List[Tuple[Bulletin, TradeBatch]]): Пары (бюллетень, данные торгов)
+        method (str): Способ загрузки: "merge", "copy" или "insert".
+        batch_size (int): Строк в одной команде COPY (None - из database.settings).
+    """
+    check_method(method)
+    batches = [keyed_rows(data) for _, data in items]
+    await _ensure_partitions(batches)
+    await _resolve_dimensions(batches)
+
+    with metrics.timer("spimex_db_batch_seconds", app="async", method=method):
+        async with async_session() as session:
+            async with session.begin():
+                info = (await session.connection()).info
+                round_trips = metrics.round_trips(info)
+                records = []
+                for (bulletin, _), batch in zip(items, batches):
+                    if len(batch) == 0:
+                        loading.skip_empty(bulletin, "async")
+                        continue
+                    bulletin_records = _state.trade_records(batch)
+                    # Отметка о бюллетене пишется первой: этот запрос через SQLAlchemy
+                    # открывает транзакцию, в которой затем выполняется COPY
+                    await session.execute(loading.ingest_state_upsert(bulletin, len(bulletin_records)))
+                    records.extend(bulletin_records)
+                await _write_records(session, records, method, batch_size)
+                if records:
+                    await session.run_sync(loading.refresh_aggregates, [batch.trade_date.date() for batch in batches if len(batch) > 0])
+                metrics.observe("spimex_db_batch_round_trips", metrics.round_trips(info) - round_trips,
+                                app="async", method=method)
+    metrics.observe("spimex_db_batch_rows", len(records), app="async", method=method)
+    if records:
+        # Сохраненные результаты запросов устарели
+        query_cache.invalidate()
+
+async def rebuild_daily_aggregates() -> None:
+    """
+    Пересчитывает таблицу дневных агрегатов по всей истории сделок
+    (одной транзакцией: до ее фиксации читатели видят прежние агрегаты).
     """
     async with async_session() as session:
         async with session.begin():
-            trades = [
-                Trade(
-                    trade_date=record["trade_date"],
-                    volume=record["volume"],
-                    price=record["price"]
-                ) for record in data
-            ]
-            session.add_all(trades)
-        await session.commit()
+            await session.run_sync(loading.rebuild_aggregates)
+    query_cache.invalidate()
@@ -1,96 +1,384 @@
 import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
-import re
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import urlsplit
 
-async def find_file_links(session, date):
+from common.cache import BulletinCache, get_cache
+from common.index import (  # noqa: F401
+    BASE_URL, MAX_INDEX_PAGES, RESULTS_URL, file_date_from_url, index_page_url, links_in_period,
+    merge_index_page, parse_index_page, period_bounds,
+)
+from common.ingest import Bulletin, filter_new_bulletins, make_bulletin, select_new_links
+from common.metrics import metrics
+from common.spool import SPOOL_CHUNK_SIZE, SpooledBody
+
+# Параметры планировщика загрузок
+MAX_CONCURRENCY = 16       # Общее число одновременных запросов
+MAX_PER_HOST = 4           # Одновременных запросов к одному хосту
+CONNECT_TIMEOUT = 10       # Таймаут установки соединения, сек
+READ_TIMEOUT = 60          # Таймаут чтения из сокета, сек
+MAX_RETRIES = 5            # Повторных попыток после первой неудачной
+BACKOFF_BASE = 0.5         # Базовая задержка экспоненциального backoff, сек
+BACKOFF_MAX = 30.0         # Максимальная задержка между попытками, сек
+
+# HTTP-статусы, при которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+@dataclass
+class DownloadResult:
+    """
+    Итог скачивания одного URL.
+    """
+    url: str
+    file_date: Optional[datetime] = None
+    content: Optional[bytes] = None
+    status: Optional[int] = None
+    attempts: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    from_cache: bool = False
+    body: Optional[SpooledBody] = None
+
+    @property
+    def ok(self) -> bool:
+        return (self.content is not None or self.body is not None) and self.error is None
+
+@dataclass
+class DownloadSummary:
+    """
+    Сводка по итогам скачивания: счетчики и неудачные файлы (без содержимого).
+    """
+    total: int = 0
+    cached: int = 0
+    retried: int = 0
+    failed: List[DownloadResult] = field(default_factory=list)
+
+    def add(self, result: DownloadResult) -> None:
+        self.total += 1
+        self.cached += result.from_cache
+        self.retried += result.attempts > 1
+        if not result.ok:
+            self.failed.append(result)
+
+async def _spool_response(response, max_size: int) -> SpooledBody:
+    """
+    Читает тело ответа порциями во временный файл.
+    """
+    body = SpooledBody(max_size)
+    try:
+        async for chunk in response.content.iter_chunked(SPOOL_CHUNK_SIZE):
+            body.write(chunk)
+    except BaseException:
+        body.close()
+        raise
+    return body
+
+class DownloadScheduler:
+    """
+    Планировщик HTTP-запросов с ограничением числа одновременных запросов
+    (общим и на хост), таймаутами и повторными попытками с экспоненциальной
+    задержкой и джиттером при ошибках 5xx/429 и обрывах соединения.
     """
-    Находит ссылки на файлы для конкретной даты.
-    
+
+    def __init__(self, session, max_concurrency=MAX_CONCURRENCY, max_per_host=MAX_PER_HOST,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.session = session
+        self.max_per_host = max_per_host
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._global_limit = asyncio.Semaphore(max_concurrency)
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    @staticmethod
+    def create_session(max_concurrency=MAX_CONCURRENCY, max_per_host=MAX_PER_HOST,
+                       connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        """
+        Создает aiohttp-сессию с пулом соединений под заданные лимиты.
+
+        Returns:
+            aiohttp.ClientSession: Сессия для HTTP-запросов
+        """
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout,
+                                        sock_read=read_timeout)
+        connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=max_per_host)
+        return aiohttp.ClientSession(timeout=timeout, connector=connector)
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_limits[host]
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """
+        Вычисляет задержку перед повторной попыткой (full jitter).
+
+        Args:
+            attempt (int): Номер неудачной попытки (начиная с 1)
+            retry_after (float): Значение заголовка Retry-After, если есть
+
+        Returns:
+            float: Задержка в секундах
+        """
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    async def fetch(self, url, headers=None, spool_max_bytes=None) -> DownloadResult:
+        """
+        Скачивает URL с учетом лимитов и повторных попыток.
+
+        Ответ 304 Not Modified на условный запрос считается успешным
+        завершением без содержимого.
+
+        Args:
+            url (str): URL для скачивания
+            headers (dict): Дополнительные заголовки запроса
+            spool_max_bytes (int): Если задан, тело ответа читается порциями во
+                временный файл (DownloadResult.body), в памяти - не больше этого числа байт
+
+        Returns:
+            DownloadResult: Итог скачивания (исключения не выбрасываются)
+        """
+        result = DownloadResult(url=url)
+        started = time.perf_counter()
+
+        while True:
+            result.attempts += 1
+            retry_after = None
+            async with self._global_limit, self._host_limit(url):
+                attempt_started = time.perf_counter()
+                outcome = "error"
+                try:
+                    async with self.session.get(url, headers=headers) as response:
+                        result.status = outcome = response.status
+                        result.etag = response.headers.get("ETag")
+                        result.last_modified = response.headers.get("Last-Modified")
+                        if response.status == 200:
+                            if spool_max_bytes is None:
+                                result.content = await response.read()
+                                size = len(result.content)
+                            else:
+                                result.body = await _spool_response(response, spool_max_bytes)
+                                size = result.body.size
+                            metrics.observe("spimex_http_response_bytes", size, app="async")
+                            result.error = None
+                            break
+                        if response.status == 304:
+                            result.error = None
+                            break
+                        result.error = f"HTTP {response.status}"
+                        retryable = response.status in RETRY_STATUSES
+                        header = response.headers.get("Retry-After")
+                        if header and header.isdigit():
+                            retry_after = float(header)
+                except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                        asyncio.TimeoutError) as e:
+                    result.error = f"{type(e).__name__}: {e}"
+                    retryable = True
+                except aiohttp.ClientError as e:
+                    result.error = f"{type(e).__name__}: {e}"
+                    retryable = False
+                finally:
+                    metrics.observe("spimex_http_request_seconds", time.perf_counter() - attempt_started,
+                                    app="async", status=outcome)
+
+            if not retryable or result.attempts > self.max_retries:
+                break
+            # Ждем вне семафоров, чтобы не занимать слоты во время паузы
+            await asyncio.sleep(self.backoff_delay(result.attempts, retry_after))
+
+        result.elapsed = time.perf_counter() - started
+        return result
+
+async def build_links_index(scheduler, start_date, max_pages=MAX_INDEX_PAGES):
+    """
+    Один раз обходит постраничный индекс результатов торгов и строит
+    словарь {дата торгов: [ссылки на файлы]}.
+
+    Обход останавливается, как только на странице встречаются даты раньше
+    start_date, либо когда страница не содержит новых ссылок.
+
     Args:
-        session (aiohttp.ClientSession): Сессия для HTTP-запросов
-        date (datetime): Дата для поиска файлов
-    
+        scheduler (DownloadScheduler): Планировщик HTTP-запросов
+        start_date (date): Самая ранняя интересующая дата
+        max_pages (int): Максимум страниц индекса
+
     Returns:
-        list: Список найденных ссылок на файлы
-    """
-    # Форматируем дату для URL
-    date_str = date.strftime("%Y%m%d")
-    url = f"https://spimex.com/markets/oil_products/trades/results/"
-    
-    async with session.get(url) as response:
-        response.raise_for_status()
-        content = await response.text()
-        soup = BeautifulSoup(content, "html.parser")
-        
-        # Ищем все ссылки с нужной датой
-        links = []
-        for link in soup.find_all("a", class_="accordeon-inner__item-title", href=True):
-            if date_str in link["href"]:
-                links.append("https://spimex.com" + link["href"])
-        
-        return links
-
-async def download_file(session, url):
+        dict: Словарь {дата торгов: [ссылки на файлы]}
+    """
+    links_index = {}
+    seen = set()
+
+    for page in range(1, max_pages + 1):
+        url = index_page_url(page)
+        result = await scheduler.fetch(url)
+        if not result.ok:
+            raise RuntimeError(f"Не удалось загрузить страницу индекса {url}: {result.error}")
+
+        if not merge_index_page(links_index, seen, parse_index_page(result.content), start_date):
+            break
+
+    return links_index
+
+async def download_file(scheduler, url, cache: Optional[BulletinCache] = None,
+                        spool_max_bytes: Optional[int] = None) -> DownloadResult:
     """
     Скачивает содержимое файла по URL.
-    
+
+    Если передан кэш и файл в нем есть, выполняется условный запрос
+    (If-None-Match / If-Modified-Since); при ответе 304 содержимое берется
+    из кэша.
+
     Args:
-        session (aiohttp.ClientSession): Сессия для HTTP-запросов
+        scheduler (DownloadScheduler): Планировщик HTTP-запросов
         url (str): URL файла
-    
+        cache (BulletinCache): Локальный кэш бюллетеней
+        spool_max_bytes (int): Если задан, содержимое возвращается во временном
+            файле (DownloadResult.body), а не в памяти (DownloadResult.content)
+
     Returns:
-        tuple: (дата файла, содержимое файла)
-    """
-    async with session.get(url) as response:
-        response.raise_for_status()
-        content = await response.read()
-        
-        # Извлекаем дату из URL
-        date_match = re.search(r'(\d{8})', url)
-        if date_match:
-            date_str = date_match.group(1)
-            file_date = datetime.strptime(date_str, "%Y%m%d")
+        DownloadResult: Итог скачивания с датой и содержимым файла
+    """
+    entry = cache.lookup(url) if cache is not None else None
+    result = await scheduler.fetch(url, entry.conditional_headers() if entry else None, spool_max_bytes)
+
+    if result.status == 304 and entry is not None:
+        content = cache.read(entry)
+        if content is None:
+            # Файл в кэше поврежден - скачиваем заново без условий
+            result = await scheduler.fetch(url, spool_max_bytes=spool_max_bytes)
         else:
-            file_date = None
-            
-        return file_date, content
+            if spool_max_bytes is None:
+                result.content = content
+            else:
+                result.body = SpooledBody(spool_max_bytes)
+                result.body.write(content)
+            result.from_cache = True
+            cache.touch(url, result.etag, result.last_modified)
+    elif result.status == 304:
+        result.error = "HTTP 304 на безусловный запрос"
+
+    if result.ok and not result.from_cache and cache is not None:
+        if result.body is not None:
+            cache.store_file(url, result.body.rewind(), result.body.digest, result.body.size,
+                             result.etag, result.last_modified)
+        else:
+            cache.store(url, result.content, result.etag, result.last_modified)
+
+    result.file_date = file_date_from_url(url)
+    if result.ok and result.file_date is None:
+        result.error = "Не удалось определить дату файла по URL"
+    if not result.ok and result.body is not None:
+        result.body.close()
+    return result
+
+@asynccontextmanager
+async def open_scheduler(**scheduler_options):
+    """
+    Создает HTTP-сессию и планировщик загрузок на время блока with.
+
+    Args:
+        **scheduler_options: Параметры DownloadScheduler (max_concurrency,
+            max_per_host, max_retries, backoff_base, backoff_max)
+
+    Yields:
+        DownloadScheduler: Планировщик HTTP-запросов
+    """
+    session_options = {key: scheduler_options[key]
+                       for key in ("max_concurrency", "max_per_host")
+                       if key in scheduler_options}
+    async with DownloadScheduler.create_session(**session_options) as session:
+        yield DownloadScheduler(session, **scheduler_options)
+
+async def discover_links(scheduler, start_date, end_date, known=None, max_pages=MAX_INDEX_PAGES,
+                         revalidate=False) -> List[str]:
+    """
+    Находит ссылки на бюллетени за период по индексу результатов торгов.
+
+    Args:
+        scheduler (DownloadScheduler): Планировщик HTTP-запросов
+        start_date (date): Начальная дата периода
+        end_date (date): Конечная дата периода
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш}, они пропускаются
+        max_pages (int): Максимум страниц индекса
+        revalidate (bool): Не пропускать загруженные URL, а перепроверять их
+            условным запросом (см. common.ingest.select_new_links)
+
+    Returns:
+        List[str]: Ссылки на файлы в порядке возрастания дат
+    """
+    # Индекс скачивается один раз, даты берутся из него
+    links_index = await build_links_index(scheduler, start_date, max_pages)
+    return select_new_links(links_in_period(links_index, start_date, end_date), known, revalidate)
+
+async def download_bulletins(days=7, known=None, use_cache=True, revalidate=False,
+                             **scheduler_options) -> List[DownloadResult]:
+    """
+    Скачивает файлы бюллетеней за указанный период и возвращает отчет
+    по каждому файлу.
+
+    Args:
+        days (int): Количество дней для скачивания (по умолчанию 7)
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш}, они не скачиваются
+        use_cache (bool): Использовать локальный кэш бюллетеней
+        revalidate (bool): Перепроверять уже загруженные URL (см. discover_links)
+        **scheduler_options: Параметры DownloadScheduler (max_concurrency,
+            max_per_host, max_retries, backoff_base, backoff_max)
 
-async def download_files_for_period(days=7):
+    Returns:
+        List[DownloadResult]: Итоги скачивания всех найденных файлов
+    """
+    async with open_scheduler(**scheduler_options) as scheduler:
+        start_date, end_date = period_bounds(days)
+        all_links = await discover_links(scheduler, start_date, end_date, known, revalidate=revalidate)
+
+        # Скачиваем файлы параллельно в пределах лимитов планировщика
+        cache = get_cache() if use_cache else None
+        return await asyncio.gather(*(download_file(scheduler, link, cache) for link in all_links))
+
+def print_download_report(results: Union[Iterable[DownloadResult], DownloadSummary]) -> None:
+    """
+    Выводит сводку по итогам скачивания и список неудачных файлов.
+
+    Args:
+        results (Iterable[DownloadResult] или DownloadSummary): Итоги скачивания или готовая сводка
+    """
+    summary = results
+    if not isinstance(results, DownloadSummary):
+        summary = DownloadSummary()
+        for result in results:
+            summary.add(result)
+    print(f"   Скачано: {summary.total - len(summary.failed)} из {summary.total}, "
+          f"из кэша: {summary.cached}, с повторами: {summary.retried}, с ошибкой: {len(summary.failed)}")
+    for result in summary.failed:
+        print(f"   ✗ {result.url}: {result.error} (попыток: {result.attempts})")
+
+async def download_files_for_period(days=7, known=None, revalidate=False) -> List[Bulletin]:
     """
     Скачивает файлы за указанный период дней.
-    
+
     Args:
         days (int): Количество дней для скачивания (по умолчанию 7)
-    
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш}; если
+            передан, скачиваются и возвращаются только новые или измененные
+        revalidate (bool): Перепроверять уже загруженные URL (см. discover_links)
+
     Returns:
-        list: Список кортежей (дата, содержимое файла)
-    """
-    async with aiohttp.ClientSession() as session:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        # Создаем список дат для скачивания
-        dates = []
-        current_date = start_date
-        while current_date <= end_date:
-            if current_date.weekday() < 5:  # Пропускаем выходные
-                dates.append(current_date)
-            current_date += timedelta(days=1)
-
-        # Получаем ссылки на файлы для всех дат
-        all_links = []
-        for date in dates:
-            links = await find_file_links(session, date)
-            all_links.extend(links)
-
-        # Скачиваем все файлы параллельно
-        tasks = [download_file(session, link) for link in all_links]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Фильтруем успешные результаты
-        valid_results = [(date, content) for date, content in results 
-                        if isinstance(content, bytes) and date is not None]
-        
-        return valid_results
\ No newline at end of file
+        List[Bulletin]: Скачанные бюллетени (дата, содержимое, URL, хэш)
+    """
+    results = await download_bulletins(days, known, revalidate=revalidate)
+    print_download_report(results)
+    bulletins = [make_bulletin(result.file_date, result.content, result.url)
+                 for result in results if result.ok]
+    return filter_new_bulletins(bulletins, known)
@@ -0,0 +1,321 @@
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from async_app.downloader import DownloadSummary, discover_links, download_file, open_scheduler
+from async_app import database
+from async_app.db_loader import LOAD_METHOD, load_bulletins
+from common.archive import BulletinArchive, parse_archived
+from common.cache import get_cache
+from common.cleaning import record_rejected
+from common.index import period_bounds
+from common.ingest import SpooledBulletin, filter_new_bulletins, make_bulletin, make_spooled_bulletin
+from common.metrics import metrics
+from common.parser import parse_data
+from common.spool import MemoryPlan
+
+# Размеры очередей между стадиями: ограничивают число файлов в памяти
+# и притормаживают предыдущую стадию, если следующая не успевает
+PARSE_QUEUE_SIZE = 8
+LOAD_QUEUE_SIZE = 8
+
+# Число одновременно работающих загрузчиков файлов
+DOWNLOAD_WORKERS = 16
+
+# Число процессов для парсинга Excel-файлов (0 - парсить в цикле событий)
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Маркер окончания потока данных в очереди
+_DONE = object()
+
+@dataclass
+class PipelineStats:
+    """
+    Итоги работы конвейера: счетчики и время занятости каждой стадии.
+
+    Для скачивания учитывается время от начала поиска ссылок до получения
+    последнего файла, для парсинга и загрузки - суммарное время работы.
+    Стадии выполняются одновременно, поэтому их сумма может превышать
+    общее время wall_time. Итоги скачивания хранятся только счетчиками
+    (и неудачными файлами), а не содержимым. rejected - строки,
+    отброшенные при очистке бюллетеней, по причинам.
+    """
+    files: int = 0
+    records: int = 0
+    parse_errors: int = 0
+    download_time: float = 0.0
+    parse_time: float = 0.0
+    load_time: float = 0.0
+    wall_time: float = 0.0
+    downloads: DownloadSummary = field(default_factory=DownloadSummary)
+    rejected: Dict[str, int] = field(default_factory=dict)
+
+def _init_parse_worker():
+    """
+    Инициализирует процесс-парсер: заранее импортирует pandas и движки
+    чтения Excel, чтобы первый файл не платил за импорт.
+    """
+    import pandas  # noqa: F401
+    import openpyxl  # noqa: F401
+    import xlrd  # noqa: F401
+    import common.parser  # noqa: F401
+
+@contextlib.asynccontextmanager
+async def _use_scheduler(scheduler, scheduler_options):
+    """
+    Отдает готовый планировщик (не закрывая его сессию) или открывает новый.
+    """
+    if scheduler is not None:
+        yield scheduler
+    else:
+        async with open_scheduler(**scheduler_options) as own_scheduler:
+            yield own_scheduler
+
+def _ping():
+    return os.getpid()
+
+def create_parse_pool(workers=PARSE_WORKERS) -> ProcessPoolExecutor:
+    """
+    Создает пул процессов для парсинга.
+
+    Используется контекст spawn: дочерние процессы не наследуют цикл
+    событий, сокеты и пул соединений с БД родителя.
+
+    Args:
+        workers (int): Число процессов
+
+    Returns:
+        ProcessPoolExecutor: Пул процессов
+    """
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_parse_worker)
+
+async def warm_up_pool(pool: ProcessPoolExecutor, workers=PARSE_WORKERS) -> None:
+    """
+    Запускает все процессы пула заранее (вместе с импортами инициализатора).
+
+    Args:
+        pool (ProcessPoolExecutor): Пул процессов
+        workers (int): Число процессов пула
+    """
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(workers)))
+
+async def _download_stage(scheduler, links, known, parse_queue, stats, workers, spool_max_bytes=None):
+    """
+    Скачивает файлы и передает их на парсинг по мере готовности.
+
+    При заданном spool_max_bytes содержимое файлов ждет разбора во
+    временных файлах, а не в памяти.
+    """
+    cache = get_cache()
+    pending = list(reversed(links))
+
+    async def worker():
+        while pending:
+            link = pending.pop()
+            result = await download_file(scheduler, link, cache, spool_max_bytes)
+            stats.downloads.add(result)
+            if not result.ok:
+                continue
+            if result.body is not None:
+                bulletin = make_spooled_bulletin(result.file_date, result.body, result.url)
+            else:
+                bulletin = make_bulletin(result.file_date, result.content, result.url)
+            if filter_new_bulletins([bulletin], known):
+                await parse_queue.put(bulletin)
+            elif result.body is not None:
+                result.body.close()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(links))))))
+
+async def _parse_stage(parse_queue, load_queue, stats, executor: Optional[Executor],
+                       archive: Optional[BulletinArchive] = None):
+    """
+    Парсит бюллетени по мере их поступления и передает строки на загрузку.
+
+    Если передан executor, парсинг выполняется в нем, и цикл событий
+    продолжает обслуживать загрузки, пока файл разбирается. С archive
+    уже разобранные бюллетени читаются из архива, а новые записываются в него.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        bulletin = await parse_queue.get()
+        if bulletin is _DONE:
+            break
+        if isinstance(bulletin, SpooledBulletin):
+            bulletin = bulletin.materialize()
+        started = time.perf_counter()
+        try:
+            if executor is not None:
+                data, archived = await loop.run_in_executor(executor, parse_archived, parse_data, bulletin, archive)
+            else:
+                data, archived = parse_archived(parse_data, bulletin, archive)
+        except Exception as e:
+            stats.parse_errors += 1
+            metrics.inc("spimex_parse_errors_total", app="async")
+            print(f"   Ошибка парсинга {bulletin.url}: {e}")
+            continue
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.parse_time += elapsed
+            metrics.observe("spimex_parse_seconds", elapsed, app="async")
+        metrics.observe("spimex_parse_rows", len(data), app="async")
+        if archived:
+            metrics.inc("spimex_archive_hits_total", app="async")
+        record_rejected(data.rejected, "async", stats.rejected)
+        # Содержимое файла больше не нужно: на загрузку уходит только описание бюллетеня
+        await load_queue.put((bulletin._replace(content=b""), data))
+        # Отдаем управление циклу событий, чтобы загрузки продолжались между файлами
+        await asyncio.sleep(0)
+
+async def _load_stage(load_queue, stats, batch_rows, load_method):
+    """
+    Загружает разобранные бюллетени в БД пачками: все, что уже накопилось
+    в очереди (но не больше batch_rows строк), пишется одной транзакцией.
+
+    Одновременно работают несколько таких задач, каждая - со своим
+    соединением из пула.
+    """
+    finished = False
+    while not finished:
+        item = await load_queue.get()
+        if item is _DONE:
+            break
+        batch = [item]
+        rows = len(item[1])
+        while rows < batch_rows and not load_queue.empty():
+            item = load_queue.get_nowait()
+            if item is _DONE:
+                finished = True
+                break
+            batch.append(item)
+            rows += len(item[1])
+
+        started = time.perf_counter()
+        await load_bulletins(batch, load_method)
+        stats.load_time += time.perf_counter() - started
+        stats.files += len(batch)
+        stats.records += rows
+
+async def run_pipeline(days=7, known: Optional[Dict[str, str]] = None,
+                       download_workers=DOWNLOAD_WORKERS, parse_workers=PARSE_WORKERS,
+                       batch_rows: Optional[int] = None, load_method=LOAD_METHOD,
+                       parse_executor: Optional[Executor] = None, memory: Optional[MemoryPlan] = None,
+                       links: Optional[List[str]] = None, writers: Optional[int] = None,
+                       archive: Optional[BulletinArchive] = None, scheduler=None, revalidate: bool = False,
+                       **scheduler_options) -> PipelineStats:
+    """
+    Скачивает, парсит и загружает бюллетени за период потоковым конвейером.
+
+    Стадии связаны ограниченными очередями asyncio.Queue: каждый файл
+    парсится сразу после скачивания, а строки пишутся в БД пачками, как
+    только они готовы, в writers одновременных транзакциях. Сеть,
+    процессор и БД работают одновременно, и общее время стремится ко
+    времени самой медленной стадии.
+
+    Парсинг выполняется в пуле из parse_workers процессов, который
+    прогревается параллельно с обходом индекса; при parse_workers=0 файлы
+    парсятся прямо в цикле событий.
+
+    С параметром memory (режим с ограничением памяти) скачанные файлы
+    ждут разбора во временных файлах (SpooledTemporaryFile), в памяти
+    одновременно находится не больше memory.files_in_flight файлов, а
+    все транзакции загрузки вместе - не больше memory.batch_rows строк. Объем памяти
+    не зависит от длины периода.
+
+    Args:
+        days (int): Количество дней (по умолчанию 7)
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш}, они пропускаются
+        download_workers (int): Число одновременно скачиваемых файлов
+        parse_workers (int): Число процессов-парсеров
+        batch_rows (int): Максимум строк в одной транзакции загрузки (None - из database.settings)
+        load_method (str): Способ записи в БД: "merge", "copy" или "insert"
+        parse_executor (Executor): Готовый пул для парсинга (не закрывается по окончании)
+        memory (MemoryPlan): Параметры режима с ограничением памяти (None - без ограничения)
+        links (List[str]): Готовый список ссылок на файлы; если передан, индекс
+            не обходится, а days не используется
+        writers (int): Одновременных транзакций загрузки (None - из database.settings)
+        archive (BulletinArchive): Архив разобранных бюллетеней (None - не использовать)
+        scheduler (DownloadScheduler): Готовый планировщик HTTP-запросов со своей
+            сессией (не закрывается по окончании; scheduler_options не используются)
+        revalidate (bool): Перепроверять уже загруженные URL условным запросом
+            (см. common.ingest.select_new_links)
+        **scheduler_options: Параметры DownloadScheduler
+
+    Returns:
+        PipelineStats: Итоги работы конвейера
+    """
+    stats = PipelineStats()
+    started = time.perf_counter()
+    batch_rows = batch_rows or database.settings.load_batch_rows
+    writers = writers or database.settings.writers
+    load_queue_size = LOAD_QUEUE_SIZE
+    spool_max_bytes = None
+    if memory is not None:
+        parse_workers = min(parse_workers, memory.files_in_flight)
+        batch_rows = min(batch_rows, max(1, memory.batch_rows // writers))
+        load_queue_size = min(load_queue_size, memory.files_in_flight)
+        spool_max_bytes = memory.spool_max_bytes
+    parse_queue = asyncio.Queue(maxsize=PARSE_QUEUE_SIZE)
+    load_queue = asyncio.Queue(maxsize=load_queue_size)
+
+    executor = parse_executor
+    own_executor = executor is None and parse_workers > 0
+    if own_executor:
+        executor = create_parse_pool(parse_workers)
+    parse_tasks_count = parse_workers if executor is not None else 1
+
+    try:
+        async with _use_scheduler(scheduler, scheduler_options) as scheduler:
+            if links is not None:
+                if own_executor:
+                    await warm_up_pool(executor, parse_workers)
+            elif own_executor:
+                start_date, end_date = period_bounds(days)
+                _, links = await asyncio.gather(
+                    warm_up_pool(executor, parse_workers),
+                    discover_links(scheduler, start_date, end_date, known, revalidate=revalidate),
+                )
+            else:
+                start_date, end_date = period_bounds(days)
+                links = await discover_links(scheduler, start_date, end_date, known, revalidate=revalidate)
+
+            async def produce():
+                try:
+                    await _download_stage(scheduler, links, known, parse_queue, stats, download_workers,
+                                          spool_max_bytes)
+                finally:
+                    stats.download_time = time.perf_counter() - started
+                    for _ in range(parse_tasks_count):
+                        await parse_queue.put(_DONE)
+
+            async def parse():
+                try:
+                    await asyncio.gather(*(_parse_stage(parse_queue, load_queue, stats, executor, archive)
+                                           for _ in range(parse_tasks_count)))
+                finally:
+                    for _ in range(writers):
+                        await load_queue.put(_DONE)
+
+            tasks = [asyncio.create_task(coro)
+                     for coro in (produce(), parse(),
+                                  *(_load_stage(load_queue, stats, batch_rows, load_method) for _ in range(writers)))]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                raise
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+
+    stats.wall_time = time.perf_counter() - started
+    return stats
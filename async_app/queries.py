@@ -0,0 +1,199 @@
+import functools
+from datetime import date
+from decimal import Decimal
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import func, select, text
+
+from async_app.database import async_session
+from async_app.models import Trade, Instrument, Basis, DailyAggregate
+from common.result_cache import query_cache
+
+# Последние даты торгов без сканирования trades: каждый шаг рекурсии
+# находит предыдущую дату по индексу с trade_date в начале ключа
+LAST_TRADING_DATES_SQL = """
+WITH RECURSIVE dates AS (
+    (SELECT max(trade_date) AS trade_date FROM trades)
+    UNION ALL
+    SELECT (SELECT max(t.trade_date) FROM trades t WHERE t.trade_date < dates.trade_date)
+    FROM dates
+    WHERE dates.trade_date IS NOT NULL
+)
+SELECT trade_date FROM dates WHERE trade_date IS NOT NULL LIMIT :limit
+"""
+
+class TradeRow(NamedTuple):
+    """
+    Строка результата торгов с расшифрованными инструментом и базисом.
+    """
+    trade_date: date
+    instrument_code: str
+    instrument_name: Optional[str]
+    basis: str
+    volume: Optional[int]
+    value_contracts: Optional[int]
+    price_change: Optional[Decimal]
+    price: Optional[Decimal]
+    max_price: Optional[Decimal]
+    price_in_quotes: Optional[Decimal]
+    contracts_count: Optional[int]
+
+class DailyAggregateRow(NamedTuple):
+    """
+    Дневные итоги торгов инструментом по всем базисам.
+    """
+    trade_date: date
+    instrument_code: str
+    total_volume: Optional[int]
+    total_value: Optional[int]
+    vwap: Optional[Decimal]
+    contracts_count: Optional[int]
+    min_price: Optional[Decimal]
+    max_price: Optional[Decimal]
+
+def _cached(query):
+    """
+    Кэширует результат запроса в query_cache по имени функции и аргументам.
+
+    Результат хранится кортежем неизменяемых строк, а вызывающему
+    возвращается новый список, поэтому его можно менять, не портя кэш.
+    """
+    @functools.wraps(query)
+    async def wrapper(*args, **kwargs):
+        key = (query.__name__, args, tuple(sorted(kwargs.items())))
+        found, result = query_cache.get(key)
+        if not found:
+            generation = query_cache.generation
+            result = tuple(await query(*args, **kwargs))
+            query_cache.put(key, result, generation)
+        return list(result)
+    return wrapper
+
+def _trade_rows():
+    return (
+        select(
+            Trade.trade_date,
+            Instrument.code,
+            Instrument.name,
+            Basis.name,
+            Trade.volume,
+            Trade.value_contracts,
+            Trade.price_change,
+            Trade.price,
+            Trade.max_price,
+            Trade.price_in_quotes,
+            Trade.contracts_count,
+        )
+        .join(Instrument, Instrument.id == Trade.instrument_id)
+        .join(Basis, Basis.id == Trade.basis_id)
+    )
+
+@_cached
+async def get_last_trading_dates(limit: int = 10) -> List[date]:
+    """
+    Возвращает последние даты торгов, по которым загружены сделки.
+
+    Args:
+        limit (int): Количество дат
+
+    Returns:
+        List[date]: Даты торгов, от новых к старым
+    """
+    async with async_session() as session:
+        result = await session.execute(text(LAST_TRADING_DATES_SQL), {"limit": limit})
+        return list(result.scalars().all())
+
+@_cached
+async def get_dynamics(instrument_code: str, start_date: date, end_date: date,
+                       basis: Optional[str] = None) -> List[TradeRow]:
+    """
+    Возвращает результаты торгов инструментом за период.
+
+    Запрос читает только секции trades за период и использует индекс
+    (instrument_id, trade_date).
+
+    Args:
+        instrument_code (str): Код инструмента
+        start_date (date): Начало периода (включительно)
+        end_date (date): Конец периода (включительно)
+        basis (str): Базис поставки (по умолчанию - все базисы)
+
+    Returns:
+        List[TradeRow]: Строки, упорядоченные по дате торгов
+    """
+    statement = (
+        _trade_rows()
+        .where(Instrument.code == instrument_code)
+        .where(Trade.trade_date.between(start_date, end_date))
+        .order_by(Trade.trade_date, Basis.name)
+    )
+    if basis is not None:
+        statement = statement.where(Basis.name == basis)
+    async with async_session() as session:
+        result = await session.execute(statement)
+        return [TradeRow(*row) for row in result.all()]
+
+@_cached
+async def get_trading_results(code_prefix: Optional[str] = None, limit: Optional[int] = None) -> List[TradeRow]:
+    """
+    Возвращает результаты последней торговой сессии.
+
+    Args:
+        code_prefix (str): Начало кода инструмента, например "A592"
+            (по умолчанию - все инструменты)
+        limit (int): Максимум строк (по умолчанию - без ограничения)
+
+    Returns:
+        List[TradeRow]: Строки, упорядоченные по коду инструмента и базису
+    """
+    last_date = select(func.max(Trade.trade_date)).scalar_subquery()
+    statement = (
+        _trade_rows()
+        .where(Trade.trade_date == last_date)
+        .order_by(Instrument.code, Basis.name)
+    )
+    if code_prefix:
+        statement = statement.where(Instrument.code.startswith(code_prefix, autoescape=True))
+    if limit is not None:
+        statement = statement.limit(limit)
+    async with async_session() as session:
+        result = await session.execute(statement)
+        return [TradeRow(*row) for row in result.all()]
+
+@_cached
+async def get_daily_aggregates(start_date: date, end_date: date,
+                               instrument_code: Optional[str] = None) -> List[DailyAggregateRow]:
+    """
+    Возвращает дневные итоги торгов по инструментам за период.
+
+    Итоги читаются из таблицы daily_aggregates, которую загрузчики
+    обновляют вместе со сделками, поэтому запрос не агрегирует trades.
+
+    Args:
+        start_date (date): Начало периода (включительно)
+        end_date (date): Конец периода (включительно)
+        instrument_code (str): Код инструмента (по умолчанию - все инструменты)
+
+    Returns:
+        List[DailyAggregateRow]: Строки, упорядоченные по дате и коду инструмента
+    """
+    statement = (
+        select(
+            DailyAggregate.trade_date,
+            Instrument.code,
+            DailyAggregate.total_volume,
+            DailyAggregate.total_value,
+            DailyAggregate.vwap,
+            DailyAggregate.contracts_count,
+            DailyAggregate.min_price,
+            DailyAggregate.max_price,
+        )
+        .join(Instrument, Instrument.id == DailyAggregate.instrument_id)
+        .where(DailyAggregate.trade_date.between(start_date, end_date))
+        .order_by(DailyAggregate.trade_date, Instrument.code)
+    )
+    if instrument_code is not None:
+        statement = statement.where(Instrument.code == instrument_code)
+    async with async_session() as session:
+        result = await session.execute(statement)
+        return [DailyAggregateRow(*row) for row in result.all()]
@@ -0,0 +1,229 @@
+"""
+Загрузка истории торгов за произвольный период с возобновлением.
+
+Период [--from, --to] делится на шарды по календарным месяцам, которые
+обрабатываются пулом процессов: у каждого процесса свой цикл событий,
+своя HTTP-сессия и свой пул соединений с БД. Внутри шарда работает
+обычный конвейер async_app.pipeline (парсинг - в цикле событий процесса).
+
+Контрольные точки - записи ingest_state: каждый бюллетень (дата торгов)
+отмечается в той же транзакции, что и его сделки. Перезапущенная загрузка
+пропускает уже отмеченные бюллетени и продолжает с места остановки.
+
+Пример:
+    python backfill.py --from 2015-01-01 --to 2024-12-31 --workers 4
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+from async_app import database
+from async_app.downloader import discover_links, open_scheduler
+from async_app.db_loader import LOAD_METHOD, get_loaded_bulletins
+from async_app.database import init_db
+from common import db_settings
+from common.archive import ARCHIVE_DIR, BulletinArchive
+from common.db_settings import DatabaseSettings
+from common.index import file_date_from_url
+from common.spool import memory_plan
+from common.sql import month_start
+
+# Число процессов-загрузчиков по умолчанию
+BACKFILL_WORKERS = os.cpu_count() or 1
+
+# Сколько календарных месяцев в одном шарде
+SHARD_MONTHS = 1
+
+# Максимум страниц индекса при обходе (по 10 ссылок: около 20 лет истории)
+BACKFILL_MAX_INDEX_PAGES = 600
+
+class Shard(NamedTuple):
+    """
+    Часть периода загрузки: даты [start, end] и ссылки на еще не загруженные файлы.
+    """
+    start: date
+    end: date
+    links: List[str]
+
+def make_shards(links: List[str], start: date, end: date, months: int = SHARD_MONTHS) -> List[Shard]:
+    """
+    Делит ссылки на шарды по months календарных месяцев; пустые шарды не создаются.
+
+    Args:
+        links (List[str]): Ссылки на файлы (дата торгов берется из URL)
+        start (date): Начало периода
+        end (date): Конец периода
+        months (int): Месяцев в шарде
+
+    Returns:
+        List[Shard]: Шарды в порядке возрастания дат
+    """
+    first = month_start(start)
+    groups: Dict[int, List[str]] = {}
+    for link in sorted(links, key=lambda link: file_date_from_url(link) or datetime.max):
+        file_date = file_date_from_url(link)
+        if file_date is None or not start <= file_date.date() <= end:
+            continue
+        index = ((file_date.year - first.year) * 12 + file_date.month - first.month) // months
+        groups.setdefault(index, []).append(link)
+
+    return [
+        Shard(
+            max(start, _add_months(first, index * months)),
+            min(end, _add_months(first, (index + 1) * months) - timedelta(days=1)),
+            shard_links,
+        )
+        for index, shard_links in sorted(groups.items())
+    ]
+
+def _add_months(month: date, count: int) -> date:
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+async def plan_backfill(start: date, end: date, max_pages: int = BACKFILL_MAX_INDEX_PAGES):
+    """
+    Готовит загрузку: создает таблицы, читает контрольные точки и находит
+    ссылки на еще не загруженные файлы периода.
+
+    Returns:
+        tuple: (уже загруженные бюллетени {URL: хэш}, ссылки на новые файлы)
+    """
+    await init_db()
+    known = await get_loaded_bulletins()
+    async with open_scheduler() as scheduler:
+        links = await discover_links(scheduler, start, end, known, max_pages)
+    await database.engine.dispose()
+    return known, links
+
+def run_shard(shard: Shard, known: Dict[str, str], load_method: str = LOAD_METHOD,
+              max_memory: Optional[int] = None, settings: Optional[DatabaseSettings] = None,
+              archive_dir: Optional[str] = None) -> Dict:
+    """
+    Обрабатывает шард в процессе пула: скачивает, парсит и загружает его
+    файлы конвейером со своей HTTP-сессией и своим пулом соединений с БД
+    (параметры БД settings передаются из родительского процесса). С
+    archive_dir файлы, уже сохраненные в архиве Parquet, не разбираются.
+
+    Returns:
+        dict: Итоги шарда (files, records, rejected, parse_errors, failed, seconds)
+    """
+    from async_app.pipeline import run_pipeline
+
+    if settings is not None:
+        database.configure(settings)
+    memory = memory_plan(max_memory) if max_memory is not None else None
+    archive = BulletinArchive(archive_dir) if archive_dir else None
+
+    async def process():
+        try:
+            return await run_pipeline(known=known, links=shard.links, parse_workers=0, load_method=load_method,
+                                      memory=memory, archive=archive)
+        finally:
+            await database.engine.dispose()
+
+    stats = asyncio.run(process())
+    return {
+        "files": stats.files,
+        "records": stats.records,
+        "rejected": sum(stats.rejected.values()),
+        "parse_errors": stats.parse_errors,
+        "failed": len(stats.downloads.failed),
+        "seconds": stats.wall_time,
+    }
+
+def backfill(start: date, end: date, workers: int = BACKFILL_WORKERS, shard_months: int = SHARD_MONTHS,
+             load_method: str = LOAD_METHOD, max_memory: Optional[int] = None,
+             max_pages: int = BACKFILL_MAX_INDEX_PAGES, settings: Optional[DatabaseSettings] = None,
+             archive_dir: Optional[str] = None) -> bool:
+    """
+    Загружает историю торгов за период [start, end] пулом процессов.
+
+    Args:
+        start (date): Начало периода
+        end (date): Конец периода
+        workers (int): Число процессов-загрузчиков
+        shard_months (int): Календарных месяцев в шарде
+        load_method (str): Способ записи в БД: "merge", "copy" или "insert"
+        max_memory (int): Потолок памяти каждого процесса, МБ (None - без ограничения)
+        max_pages (int): Максимум страниц индекса
+        settings (DatabaseSettings): Параметры БД (None - из переменных окружения)
+        archive_dir (str): Каталог архива разобранных бюллетеней (None - не использовать)
+
+    Returns:
+        bool: True, если все шарды обработаны без ошибок
+    """
+    if settings is not None:
+        database.configure(settings)
+    started = time.perf_counter()
+    print(f"Загрузка истории за {start:%Y-%m-%d} - {end:%Y-%m-%d}")
+    known, links = asyncio.run(plan_backfill(start, end, max_pages))
+    shards = make_shards(links, start, end, shard_months)
+    print(f"Уже загружено бюллетеней: {len(known)}, осталось файлов: {len(links)}, шардов: {len(shards)}")
+    if not shards:
+        return True
+
+    totals = {"files": 0, "records": 0, "rejected": 0, "parse_errors": 0, "failed": 0}
+    failed_shards = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(shards))), mp_context=context) as pool:
+        futures = {pool.submit(run_shard, shard, known, load_method, max_memory, database.settings,
+                               archive_dir): shard for shard in shards}
+        for done, future in enumerate(as_completed(futures), 1):
+            shard = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed_shards.append(shard)
+                print(f"[{done}/{len(shards)}] {shard.start:%Y-%m-%d} - {shard.end:%Y-%m-%d}: ошибка: {e}")
+                continue
+            for key in totals:
+                totals[key] += result[key]
+            print(f"[{done}/{len(shards)}] {shard.start:%Y-%m-%d} - {shard.end:%Y-%m-%d}: "
+                  f"файлов {result['files']}, записей {result['records']}, "
+                  f"ошибок скачивания {result['failed']}, за {result['seconds']:.1f} сек")
+
+    print(f"\nЗагружено файлов: {totals['files']}, записей: {totals['records']} "
+          f"(отброшено при очистке: {totals['rejected']}) за {time.perf_counter() - started:.1f} сек")
+    complete = not failed_shards and not totals["failed"] and not totals["parse_errors"]
+    if not complete:
+        print(f"Не загружено: шардов {len(failed_shards)}, файлов с ошибкой скачивания {totals['failed']}, "
+              f"с ошибкой парсинга {totals['parse_errors']}. "
+              f"Повторный запуск с теми же датами загрузит только недостающее.")
+    return complete
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    def parse_date(value):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+
+    parser = argparse.ArgumentParser(description='Загрузка истории торгов за период с возобновлением')
+    parser.add_argument('--from', dest='start', type=parse_date, required=True,
+                      help='Начальная дата периода (ГГГГ-ММ-ДД)')
+    parser.add_argument('--to', dest='end', type=parse_date, default=date.today(),
+                      help='Конечная дата периода (ГГГГ-ММ-ДД, по умолчанию: сегодня)')
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS,
+                      help='Число процессов-загрузчиков (по умолчанию: число ядер)')
+    parser.add_argument('--shard-months', type=int, default=SHARD_MONTHS,
+                      help='Календарных месяцев в одном шарде (по умолчанию: 1)')
+    parser.add_argument('--load-method', choices=('merge', 'copy', 'insert'), default=LOAD_METHOD,
+                      help='Способ записи в БД (по умолчанию: merge)')
+    parser.add_argument('--max-memory', type=int, default=None, metavar='MB',
+                      help='Потолок памяти каждого процесса (режим с ограничением памяти)')
+    parser.add_argument('--max-index-pages', type=int, default=BACKFILL_MAX_INDEX_PAGES,
+                      help='Максимум страниц индекса результатов торгов')
+    parser.add_argument('--archive', default=ARCHIVE_DIR, metavar='DIR',
+                      help='Каталог архива разобранных бюллетеней (по умолчанию: SPIMEX_ARCHIVE_DIR)')
+    db_settings.add_arguments(parser)
+
+    args = parser.parse_args()
+    if args.start > args.end:
+        parser.error('--from должна быть не позже --to')
+    ok = backfill(args.start, args.end, args.workers, args.shard_months, args.load_method, args.max_memory,
+                  args.max_index_pages, db_settings.from_args(args), args.archive)
+    sys.exit(0 if ok else 1)
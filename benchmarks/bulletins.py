@@ -0,0 +1,281 @@
+import io
+import os
+import random
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+# Заголовки таблицы бюллетеня в том виде, в котором они встречаются в файлах биржи
+# (None - ячейки объединенного заголовка "Цена" без собственного текста)
+HEADER = (
+    "Код\nИнструмента",
+    "Наименование\nИнструмента",
+    "Базис\nпоставки",
+    "Объем\nДоговоров\nв единицах\nизмерения",
+    "Обьем\nДоговоров,\nруб.",
+    "Изменение рыночной\nцены к цене\nпредыдуего дня",
+    "Цена (за единицу измерения), руб.",
+    None,
+    None,
+    None,
+    "Цена в Заявках (за единицу\nизмерения)",
+    None,
+    "Количество\nДоговоров,\nшт.",
+)
+SUBHEADER = (
+    None, None, None, None, None, None,
+    "Минимальная", "Средневзвешенная", "Максимальная", "Рыночная",
+    "Лучшее предложение", "Лучший спрос", None,
+)
+
+PRODUCTS = (
+    ("A592", "Бензин (АИ-92-К5)"),
+    ("A595", "Бензин (АИ-95-К5)"),
+    ("DSC5", "ДТ ЕВРО сорт C (ДТ-Л-К5)"),
+    ("DEF5", "ДТ ЕВРО межсезонное сорт E (ДТ-Е-К5)"),
+    ("M100", "Мазут топочный М-100"),
+    ("TS1A", "Топливо для реактивных двигателей ТС-1"),
+)
+BASES = (
+    ("ACC", "ст. Ачинск"),
+    ("ANK", "ст. Ангарск-Нефтехимический"),
+    ("BYN", "ст. Бензин"),
+    ("KRS", "ст. Кириши"),
+    ("NVY", "ст. Новокуйбышевская"),
+    ("OMS", "ст. Омск"),
+    ("SPB", "Санкт-Петербург"),
+    ("UFA", "ст. Уфа"),
+)
+
+# Доля инструментов без сделок (в бюллетене у них "-" вместо показателей)
+NO_TRADES_SHARE = 0.3
+
+FORMATS = ("xlsx", "xls")
+
+FILE_NAME_FORMAT = "oil_xls_%Y%m%d162000"
+
+UNITS = ("Метрическая тонна", "Килограмм", "Кубический метр")
+
+@dataclass
+class BulletinLayout:
+    """
+    Вариации структуры бюллетеня.
+
+    header_offset - сколько лишних строк вставить перед заголовком таблицы
+    (0 - заголовок в строке с индексом 6, как в файлах биржи);
+    sections - число разделов по единицам измерения;
+    summary_rows - итоговые строки "Итого:" в конце разделов и всего бюллетеня;
+    empty_share - доля инструментов без сделок, у которых показатели оставлены
+    пустыми ячейками вместо "-".
+    """
+    header_offset: int = 0
+    sections: int = 1
+    summary_rows: bool = True
+    empty_share: float = 0.0
+
+def random_layout(rng: random.Random) -> BulletinLayout:
+    """
+    Случайная вариация структуры (для корпусов с разнообразными файлами).
+    """
+    return BulletinLayout(
+        header_offset=rng.choice((0, 0, 1, 2, 5)),
+        sections=rng.choice((1, 1, 2, 3)),
+        summary_rows=rng.random() < 0.8,
+        empty_share=rng.choice((0.0, 0.0, 0.5, 1.0)),
+    )
+
+def _instrument_rows(rows: int, rng: random.Random, empty_share: float) -> List[tuple]:
+    data = []
+    for index in range(rows):
+        product, product_name = PRODUCTS[index % len(PRODUCTS)]
+        basis, basis_name = BASES[(index // len(PRODUCTS)) % len(BASES)]
+        code = f"{product}{basis}{index // (len(PRODUCTS) * len(BASES)):03d}F"
+        name = f"{product_name}, {basis_name}"
+        price = rng.randint(30000, 90000)
+        if rng.random() < NO_TRADES_SHARE:
+            missing = None if rng.random() < empty_share else "-"
+            data.append((code, name, basis_name) + (missing,) * 7 + (price, missing, missing))
+            continue
+        contracts = rng.randint(1, 40)
+        volume = contracts * 60
+        low, high = price - rng.randint(0, 500), price + rng.randint(0, 500)
+        data.append((code, name, basis_name, volume, volume * price, rng.randint(-1500, 1500),
+                     low, price, high, price, high, low, contracts))
+    return data
+
+def _summary_row(title: str, data: List[tuple]) -> list:
+    traded = [row for row in data if isinstance(row[3], int)]
+    return [None, title, None, None, sum(row[3] for row in traded), sum(row[4] for row in traded),
+            None, None, None, None, None, None, None, sum(row[12] for row in traded)]
+
+def bulletin_sheet(trade_date: date, rows: int = 500, seed: int = 0,
+                   layout: Optional[BulletinLayout] = None) -> List[list]:
+    """
+    Формирует строки листа бюллетеня той же структуры, что и файлы биржи:
+    шапка с датой торгов, заголовок таблицы (в строке с индексом 6, если
+    нет сдвига), строка подзаголовков, разделы по единицам измерения со
+    строками инструментов и итоговые строки.
+
+    Содержимое детерминировано: одинаковые аргументы дают одинаковые данные.
+
+    Args:
+        trade_date (date): Дата торгов
+        rows (int): Число строк инструментов
+        seed (int): Зерно генератора случайных чисел
+        layout (BulletinLayout): Вариации структуры (по умолчанию - как у биржи)
+
+    Returns:
+        List[list]: Строки листа (первый столбец пустой, как в файлах биржи)
+    """
+    layout = layout or BulletinLayout()
+    rng = random.Random(seed)
+    sheet = [
+        [None, "Бюллетень по итогам торгов в Секции «Нефтепродукты»"],
+        [],
+        [None, f"Дата торгов: {trade_date:%d.%m.%Y}"],
+        [],
+        [None, "Форма СЭТ-БТ"],
+    ]
+    sheet.extend([None, f"Примечание {index + 1}"] for index in range(layout.header_offset))
+    sheet.append([None, f"Единица измерения: {UNITS[0]}"])
+    sheet.append([None, *HEADER])
+    sheet.append([None, *SUBHEADER])
+
+    data = _instrument_rows(rows, rng, layout.empty_share)
+    sections = max(1, layout.sections)
+    size = -(-len(data) // sections) if data else 0
+    for number in range(sections):
+        section = data[number * size:(number + 1) * size]
+        sheet.append([None, f"Единица измерения: {UNITS[number % len(UNITS)]}"])
+        sheet.extend([None, *row] for row in section)
+        if layout.summary_rows:
+            sheet.append(_summary_row("Итого:", section))
+    if layout.summary_rows:
+        sheet.append(_summary_row("Итого по секции:", data))
+    return sheet
+
+def _write_xlsx(sheet_rows: List[list]) -> bytes:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in sheet_rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def _write_xls(sheet_rows: List[list]) -> bytes:
+    try:
+        import xlwt
+    except ImportError:
+        raise ImportError("Для формирования .xls нужен пакет xlwt: pip install xlwt") from None
+
+    workbook = xlwt.Workbook(encoding="utf-8")
+    sheet = workbook.add_sheet("TRADE_SUMMARY")
+    for row_index, row in enumerate(sheet_rows):
+        for column_index, value in enumerate(row):
+            if value is not None:
+                sheet.write(row_index, column_index, value)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+def make_bulletin(trade_date: date, rows: int = 500, seed: int = 0, fmt: str = "xlsx",
+                  layout: Optional[BulletinLayout] = None) -> bytes:
+    """
+    Формирует синтетический бюллетень в формате .xlsx или .xls.
+
+    Args:
+        trade_date (date): Дата торгов
+        rows (int): Число строк инструментов
+        seed (int): Зерно генератора случайных чисел
+        fmt (str): Формат файла: "xlsx" или "xls" (нужен пакет xlwt)
+        layout (BulletinLayout): Вариации структуры
+
+    Returns:
+        bytes: Содержимое файла
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}. Допустимые: {', '.join(FORMATS)}")
+    sheet_rows = bulletin_sheet(trade_date, rows, seed, layout)
+    return _write_xls(sheet_rows) if fmt == "xls" else _write_xlsx(sheet_rows)
+
+def _trading_days(count: int, end_date: Optional[date] = None) -> List[date]:
+    day = end_date or date.today() - timedelta(days=1)
+    days = []
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days
+
+def synthetic_bulletins(count: int, rows: int = 500, end_date: date = None, fmt: str = "xlsx",
+                        layout: Optional[BulletinLayout] = None) -> Dict[date, bytes]:
+    """
+    Формирует бюллетени за count последних рабочих дней до end_date включительно
+    (по умолчанию - до вчерашнего дня).
+
+    Args:
+        count (int): Число бюллетеней
+        rows (int): Строк инструментов в каждом бюллетене
+        end_date (date): Последняя дата торгов
+        fmt (str): Формат файлов: "xlsx" или "xls"
+        layout (BulletinLayout): Вариации структуры
+
+    Returns:
+        Dict[date, bytes]: {дата торгов: содержимое файла}
+    """
+    return {day: make_bulletin(day, rows, day.toordinal(), fmt, layout) for day in _trading_days(count, end_date)}
+
+def write_corpus(directory: str, count: int, rows: int = 500, fmt: str = "xlsx",
+                 variations: bool = False, seed: int = 0) -> List[str]:
+    """
+    Записывает корпус синтетических бюллетеней в каталог (по файлу на рабочий день).
+
+    Args:
+        directory (str): Каталог корпуса (создается при необходимости)
+        count (int): Число файлов
+        rows (int): Строк инструментов в каждом файле
+        fmt (str): Формат файлов: "xlsx", "xls" или "mixed" (поочередно)
+        variations (bool): Случайные вариации структуры (сдвиг заголовка,
+            разделы, итоговые строки, пустые ячейки)
+        seed (int): Зерно генератора случайных чисел
+
+    Returns:
+        List[str]: Пути к файлам
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index, day in enumerate(_trading_days(count)):
+        file_format = FORMATS[index % len(FORMATS)] if fmt == "mixed" else fmt
+        layout = random_layout(rng) if variations else None
+        content = make_bulletin(day, rows, seed + day.toordinal(), file_format, layout)
+        path = os.path.join(directory, f"{day:{FILE_NAME_FORMAT}}.{file_format}")
+        with open(path, "wb") as file:
+            file.write(content)
+        paths.append(path)
+    return paths
+
+def recorded_bulletins(directory: str) -> Dict[date, bytes]:
+    """
+    Читает сохраненные файлы бюллетеней из каталога. Дата торгов берется
+    из имени файла (ГГГГММДД, как в ссылках биржи).
+
+    Args:
+        directory (str): Каталог с файлами .xls/.xlsx
+
+    Returns:
+        Dict[date, bytes]: {дата торгов: содержимое файла}
+    """
+    bulletins = {}
+    for name in sorted(os.listdir(directory)):
+        match = re.search(r"(\d{8})", name)
+        if not match or not name.lower().endswith((".xls", ".xlsx")):
+            continue
+        trade_date = datetime.strptime(match.group(1), "%Y%m%d").date()
+        with open(os.path.join(directory, name), "rb") as file:
+            bulletins[trade_date] = file.read()
+    return bulletins
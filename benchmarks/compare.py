@@ -0,0 +1,38 @@
+"""
+Сравнение двух результатов benchmarks.run (например, до и после изменения).
+
+Пример:
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+from typing import Dict
+
+from benchmarks.run import STAGES
+
+def compare(base: Dict, current: Dict) -> None:
+    """
+    Печатает изменение p50 каждой стадии для сценариев, которые есть в обоих результатах.
+    """
+    base_results = {(result["version"], result["file_count"]): result for result in base["results"]}
+    print(f"{'Файлов':>7} {'Версия':7} " + " ".join(f"{stage:>20}" for stage in STAGES))
+    for result in current["results"]:
+        previous = base_results.get((result["version"], result["file_count"]))
+        if previous is None:
+            continue
+        cells = []
+        for stage in STAGES:
+            before = previous["stages"][stage]["p50"]
+            after = result["stages"][stage]["p50"]
+            change = (after - before) / before * 100 if before else 0.0
+            cells.append(f"{before:7.3f}->{after:7.3f} {change:+4.0f}%")
+        print(f"{result['file_count']:>7} {result['version']:7} " + " ".join(cells))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение двух результатов бенчмарка")
+    parser.add_argument("base", help="Базовый результат (JSON)")
+    parser.add_argument("current", help="Новый результат (JSON)")
+    args = parser.parse_args()
+
+    with open(args.base) as base_file, open(args.current) as current_file:
+        compare(json.load(base_file), json.load(current_file))
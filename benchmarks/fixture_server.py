@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from datetime import date
+from typing import Dict, Optional
+
+from aiohttp import web
+
+RESULTS_PATH = "/markets/oil_products/trades/results/"
+FILES_PATH = "/upload/reports/oil_xls/"
+
+# Ссылок на одной странице индекса (как на сайте биржи)
+LINKS_PER_PAGE = 10
+
+# Размер порции при передаче файла с ограничением пропускной способности, байт
+CHUNK_SIZE = 64 * 1024
+
+class FixtureServer:
+    """
+    Локальный сервер, отдающий бюллетени в той же структуре URL, что и
+    сайт биржи: постраничный индекс результатов торгов и файлы бюллетеней.
+
+    Сервер работает в отдельном потоке со своим циклом событий, поэтому
+    его можно использовать и из синхронного кода. Задержка (latency)
+    добавляется к каждому ответу, а пропускная способность (bandwidth)
+    ограничивает скорость отдачи каждого файла (в пределах одного соединения).
+
+    Пример:
+        with FixtureServer(bulletins, latency=0.05) as server:
+            os.environ["SPIMEX_BASE_URL"] = server.base_url
+    """
+
+    def __init__(self, bulletins: Dict[date, bytes], latency: float = 0.0, bandwidth: Optional[float] = None,
+                 links_per_page: int = LINKS_PER_PAGE, host: str = "127.0.0.1", port: int = 0):
+        """
+        Args:
+            bulletins (Dict[date, bytes]): {дата торгов: содержимое файла}
+            latency (float): Задержка перед каждым ответом, сек
+            bandwidth (float): Скорость отдачи файла, байт/сек (None - без ограничения)
+            links_per_page (int): Ссылок на странице индекса
+            host (str): Адрес сервера
+            port (int): Порт (0 - любой свободный)
+        """
+        self.bulletins = bulletins
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.links_per_page = links_per_page
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._files = {self.file_name(trade_date): content for trade_date, content in bulletins.items()}
+        self._links = [FILES_PATH + self.file_name(trade_date) for trade_date in sorted(bulletins, reverse=True)]
+        self._loop = None
+        self._thread = None
+
+    @staticmethod
+    def file_name(trade_date: date) -> str:
+        return f"oil_xls_{trade_date:%Y%m%d}162000.xls"
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def _delay(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def _index(self, request):
+        await self._delay()
+        page = request.query.get("page", "page-1")
+        try:
+            number = max(1, int(page.rsplit("-", 1)[-1]))
+        except ValueError:
+            number = 1
+        start = (number - 1) * self.links_per_page
+        # За последней страницей сайт отдает последнюю страницу повторно
+        links = self._links[start:start + self.links_per_page] or self._links[-self.links_per_page:]
+        body = "".join(f'<a class="accordeon-inner__item-title" href="{link}?r=1">{link}</a>' for link in links)
+        return web.Response(text=f"<html><body>{body}</body></html>", content_type="text/html")
+
+    async def _file(self, request):
+        await self._delay()
+        content = self._files.get(request.match_info["name"])
+        if content is None:
+            raise web.HTTPNotFound()
+        if not self.bandwidth:
+            return web.Response(body=content, content_type="application/vnd.ms-excel")
+
+        response = web.StreamResponse(headers={"Content-Type": "application/vnd.ms-excel"})
+        response.content_length = len(content)
+        await response.prepare(request)
+        for start in range(0, len(content), CHUNK_SIZE):
+            chunk = content[start:start + CHUNK_SIZE]
+            await response.write(chunk)
+            await asyncio.sleep(len(chunk) / self.bandwidth)
+        await response.write_eof()
+        return response
+
+    def _run(self, started: threading.Event):
+        loop = self._loop
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get(RESULTS_PATH, self._index)
+        app.router.add_get(FILES_PATH + "{name}", self._file)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, self.host, self.port)
+        loop.run_until_complete(site.start())
+        self.port = runner.addresses[0][1]
+        started.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(runner.cleanup())
+            loop.close()
+
+    def start(self) -> "FixtureServer":
+        """
+        Запускает сервер в фоновом потоке и ждет, пока он начнет принимать соединения.
+        """
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, args=(started,), daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,190 @@
+"""
+Бенчмарк пропускной способности парсеров бюллетеней.
+
+Общий парсер (common.parser) в каждом режиме
+(single_pass, pandas) прогоняется по корпусу файлов в отдельном чистом
+процессе. Измеряются файлов и строк в секунду, пиковая память
+(tracemalloc на выборке файлов и максимальный RSS процесса) и число
+файлов, в которых найдено не столько строк инструментов, сколько
+ожидалось, - так проверяется устойчивость к вариациям структуры.
+
+Пример:
+    python -m benchmarks.parser_bench --count 2000 --format mixed --variations --corpus-dir /tmp/corpus
+"""
+import argparse
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional
+
+from benchmarks.bulletins import write_corpus
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PARSERS = ("common.parser",)
+MODES = ("single_pass", "pandas")
+
+DEFAULT_COUNT = 200
+DEFAULT_ROWS = 500
+
+# Сколько файлов разбирать под tracemalloc (он заметно замедляет разбор)
+MEMORY_SAMPLE = 20
+
+def max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def _instrument_rows(batch) -> int:
+    """
+    Строки инструментов, найденные парсером: оставленные после очистки и
+    отброшенные как инструменты без сделок (заголовки разделов, итоги и
+    повторы не считаются).
+    """
+    return len(batch) + batch.rejected.get("no_contracts", 0) + batch.rejected.get("no_volume", 0)
+
+def measure(parser_name: str, mode: str, paths: List[str], expected_rows: Optional[int],
+            memory_sample: int = MEMORY_SAMPLE) -> Dict:
+    """
+    Прогоняет парсер по корпусу (выполняется в отдельном процессе).
+
+    Returns:
+        dict: Время, файлы и строки в секунду, пиковая память, ошибки
+    """
+    parse_data = importlib.import_module(parser_name).parse_data
+    contents = []
+    for path in paths:
+        with open(path, "rb") as file:
+            contents.append(file.read())
+    rss_before = max_rss_mb()
+
+    rows = 0
+    mismatches = 0
+    errors = 0
+    # Парсеры печатают диагностические сообщения - они не должны влиять на замер
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for content in contents:
+            try:
+                batch = parse_data(content, mode)
+            except Exception:
+                errors += 1
+                continue
+            rows += len(batch)
+            if expected_rows is not None and _instrument_rows(batch) != expected_rows:
+                mismatches += 1
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        peak = 0
+        for content in contents[:memory_sample]:
+            tracemalloc.reset_peak()
+            try:
+                parse_data(content, mode)
+            except Exception:
+                pass
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    rss_after = max_rss_mb()
+    return {
+        "parser": parser_name,
+        "mode": mode,
+        "files": len(contents),
+        "rows": rows,
+        "seconds": elapsed,
+        "files_per_sec": len(contents) / elapsed if elapsed else 0.0,
+        "rows_per_sec": rows / elapsed if elapsed else 0.0,
+        "peak_traced_mb": peak / (1024 * 1024),
+        "max_rss_mb": rss_after,
+        "rss_growth_mb": None if rss_after is None else rss_after - rss_before,
+        "errors": errors,
+        "mismatches": mismatches,
+    }
+
+def run_parser_benchmark(paths: List[str], expected_rows: Optional[int], parsers=PARSERS, modes=MODES,
+                         memory_sample: int = MEMORY_SAMPLE) -> List[Dict]:
+    """
+    Измеряет каждый парсер в каждом режиме в отдельном процессе (spawn),
+    чтобы импорты и память одного замера не влияли на другой.
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for parser_name in parsers:
+        for mode in modes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(measure, parser_name, mode, paths, expected_rows, memory_sample).result()
+            results.append(result)
+            print(f"  {parser_name:18} {mode:12} {result['files_per_sec']:8.1f} файлов/сек", file=sys.stderr)
+    return results
+
+def print_report(results: List[Dict]) -> None:
+    print(f"{'Парсер':18} {'Режим':12} {'файлов/сек':>11} {'строк/сек':>11} {'пик, МБ':>9} "
+          f"{'RSS, МБ':>9} {'ошибок':>7} {'расхожд.':>9}")
+    print("-" * 94)
+    for result in results:
+        rss = "-" if result["max_rss_mb"] is None else f"{result['max_rss_mb']:.1f}"
+        print(f"{result['parser']:18} {result['mode']:12} {result['files_per_sec']:11.1f} "
+              f"{result['rows_per_sec']:11.0f} {result['peak_traced_mb']:9.1f} {rss:>9} "
+              f"{result['errors']:7} {result['mismatches']:9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк пропускной способности парсеров бюллетеней")
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT, help="Файлов в синтетическом корпусе")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Строк инструментов в файле")
+    parser.add_argument("--format", choices=("xlsx", "xls", "mixed"), default="xlsx")
+    parser.add_argument("--variations", action="store_true",
+                        help="Вариации структуры: сдвиг заголовка, разделы, итоговые строки, пустые ячейки")
+    parser.add_argument("--corpus-dir", default=None,
+                        help="Каталог корпуса: если в нем есть файлы, они используются как есть "
+                             "(ожидаемое число строк не проверяется), иначе туда записывается синтетический")
+    parser.add_argument("--parsers", nargs="+", choices=PARSERS, default=list(PARSERS))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--memory-sample", type=int, default=MEMORY_SAMPLE,
+                        help="Файлов, разбираемых под tracemalloc")
+    parser.add_argument("--output", default=None, help="Файл для результатов в формате JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="spimex-corpus-") as temporary:
+        directory = args.corpus_dir or temporary
+        existing = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                          if name.lower().endswith((".xls", ".xlsx"))) if os.path.isdir(directory) else []
+        if existing:
+            paths, expected = existing, None
+        else:
+            started = time.perf_counter()
+            paths = write_corpus(directory, args.count, args.rows, args.format, args.variations)
+            expected = args.rows
+            print(f"Корпус из {len(paths)} файлов сформирован за {time.perf_counter() - started:.1f} сек",
+                  file=sys.stderr)
+
+        results = run_parser_benchmark(paths, expected, args.parsers, args.modes, args.memory_sample)
+
+    print_report(results)
+    if args.output:
+        report = {
+            "meta": {
+                "files": len(paths),
+                "rows_per_file": expected,
+                "format": args.format,
+                "variations": args.variations,
+                "corpus": args.corpus_dir or "synthetic",
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True, ensure_ascii=False)
+        print(f"\nРезультаты сохранены в {args.output}")
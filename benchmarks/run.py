@@ -0,0 +1,223 @@
+"""
+Воспроизводимый бенчмарк способов выполнения (бэкендов) парсера.
+
+Бюллетени (синтетические или сохраненные с сайта) отдает локальный
+FixtureServer с заданной задержкой и пропускной способностью. Каждый
+прогон выполняется в отдельном процессе с пустым кэшем бюллетеней;
+после разогревочных прогонов версии запускаются поочередно, чтобы
+дрейф окружения влиял на них одинаково. Результат - p50/p95 времени
+каждой стадии и строк в секунду - печатается и сохраняется в JSON.
+
+Пример:
+    python -m benchmarks.run --files 5 20 --runs 5 --latency 0.05 --reset-db --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.bulletins import recorded_bulletins, synthetic_bulletins
+from benchmarks.fixture_server import FixtureServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Версии - бэкенды main.BACKENDS; по умолчанию сравниваются асинхронная и синхронная
+VERSIONS = ("sync", "threads", "asyncio", "asyncio+processes")
+DEFAULT_VERSIONS = ("asyncio+processes", "sync")
+
+# Стадии, время которых собирается из прогонов (см. main.run_async_version)
+STAGES = ("db_init", "download", "parse", "db_load", "total")
+
+DEFAULT_FILE_COUNTS = (5, 20)
+DEFAULT_RUNS = 5
+DEFAULT_WARMUP = 1
+DEFAULT_ROWS = 500
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """
+    Сводка по значениям: p50, p95, минимум, максимум и среднее.
+    """
+    array = np.asarray(values, dtype=float)
+    return {
+        "p50": float(np.percentile(array, 50)),
+        "p95": float(np.percentile(array, 95)),
+        "min": float(array.min()),
+        "max": float(array.max()),
+        "mean": float(array.mean()),
+    }
+
+def summarize(runs: List[Dict]) -> Dict:
+    """
+    Сводит прогоны одной версии: перцентили времени стадий и строк в секунду.
+    """
+    return {
+        "files": runs[-1]["files"],
+        "records": runs[-1]["records"],
+        "stages": {stage: percentiles([run[stage] for run in runs]) for stage in STAGES},
+        "rows_per_sec": percentiles([run["records"] / run["total"] if run["total"] else 0.0 for run in runs]),
+        "max_rss_mb": percentiles([run["max_rss_mb"] for run in runs]) if runs[-1].get("max_rss_mb") else None,
+    }
+
+def period_days(bulletins: Dict[date, bytes]) -> int:
+    """
+    Длина периода в днях, покрывающего все бюллетени (до сегодняшнего дня).
+    """
+    return (date.today() - min(bulletins)).days + 1
+
+def run_once(version: str, days: int, base_url: str, load_method: str,
+             parse_workers: Optional[int] = None, reset_db: bool = False, verbose: bool = False,
+             max_memory: Optional[int] = None) -> Dict:
+    """
+    Выполняет один прогон версии в отдельном процессе с пустым кэшем бюллетеней.
+
+    Returns:
+        dict: Время стадий, число файлов и записей
+    """
+    with tempfile.TemporaryDirectory(prefix="spimex-bench-") as workdir:
+        output = os.path.join(workdir, "result.json")
+        command = [sys.executable, "-m", "benchmarks.worker", "--version", version, "--days", str(days),
+                   "--load-method", load_method, "--output", output]
+        if parse_workers is not None:
+            command += ["--parse-workers", str(parse_workers)]
+        if reset_db:
+            command.append("--reset-db")
+        if max_memory is not None:
+            command += ["--max-memory", str(max_memory)]
+        env = dict(os.environ, SPIMEX_BASE_URL=base_url, SPIMEX_CACHE_DIR=os.path.join(workdir, "cache"))
+        completed = subprocess.run(command, cwd=ROOT_DIR, env=env,
+                                   stderr=None if verbose else subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Прогон {version} завершился с ошибкой:\n{completed.stderr or ''}")
+        with open(output) as file:
+            return json.load(file)
+
+def run_benchmark(file_counts=DEFAULT_FILE_COUNTS, versions=DEFAULT_VERSIONS, runs=DEFAULT_RUNS, warmup=DEFAULT_WARMUP,
+                  rows=DEFAULT_ROWS, latency=0.0, bandwidth=None, load_method="merge", parse_workers=None,
+                  reset_db=False, fixtures_dir=None, verbose=False, max_memory=None) -> Dict:
+    """
+    Выполняет бенчмарк для каждого числа файлов и каждой версии.
+
+    Args:
+        file_counts (Iterable[int]): Числа бюллетеней в сценариях
+        versions (Iterable[str]): Версии (бэкенды): "sync", "threads", "asyncio", "asyncio+processes"
+        runs (int): Число измеряемых прогонов каждой версии
+        warmup (int): Число разогревочных прогонов (не учитываются)
+        rows (int): Строк в синтетическом бюллетене
+        latency (float): Задержка ответа сервера, сек
+        bandwidth (float): Скорость отдачи файла, байт/сек (None - без ограничения)
+        load_method (str): Способ записи в БД
+        parse_workers (int): Процессов-парсеров бэкенда asyncio+processes (None - по умолчанию)
+        reset_db (bool): Очищать таблицы перед каждым прогоном
+        fixtures_dir (str): Каталог сохраненных бюллетеней (None - синтетические)
+        verbose (bool): Показывать вывод прогонов
+        max_memory (int): Потолок памяти режима с ограничением памяти, МБ (None - обычный режим)
+
+    Returns:
+        dict: Параметры запуска (meta) и сводки по сценариям (results)
+    """
+    if fixtures_dir:
+        available = recorded_bulletins(fixtures_dir)
+    else:
+        available = synthetic_bulletins(max(file_counts), rows)
+    newest_first = sorted(available, reverse=True)
+
+    results = []
+    for count in file_counts:
+        bulletins = {trade_date: available[trade_date] for trade_date in newest_first[:count]}
+        days = period_days(bulletins)
+        measured = {version: [] for version in versions}
+        with FixtureServer(bulletins, latency=latency, bandwidth=bandwidth) as server:
+            for repetition in range(warmup + runs):
+                # Версии чередуются, чтобы ни одна не получала систематически "прогретое" окружение
+                order = versions if repetition % 2 == 0 else tuple(reversed(versions))
+                for version in order:
+                    result = run_once(version, days, server.base_url, load_method, parse_workers, reset_db, verbose,
+                                      max_memory)
+                    if repetition >= warmup:
+                        measured[version].append(result)
+                    print(f"  файлов: {count:4}  {version:17}  прогон {repetition + 1}/{warmup + runs}"
+                          f"{' (разогрев)' if repetition < warmup else ''}: {result['total']:.3f} сек",
+                          file=sys.stderr)
+        for version in versions:
+            results.append(dict(version=version, file_count=count, runs=measured[version],
+                                **summarize(measured[version])))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "fixtures": fixtures_dir or "synthetic",
+            "rows_per_file": None if fixtures_dir else rows,
+            "latency": latency,
+            "bandwidth": bandwidth,
+            "runs": runs,
+            "warmup": warmup,
+            "load_method": load_method,
+            "parse_workers": parse_workers,
+            "max_memory": max_memory,
+        },
+        "results": results,
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(report: Dict) -> None:
+    """
+    Печатает сводку бенчмарка: p50/p95 каждой стадии и строк в секунду.
+    """
+    header = f"{'Файлов':>7} {'Версия':17} " + " ".join(f"{stage:>17}" for stage in STAGES) + f" {'строк/сек':>17}"
+    print(header)
+    print(f"{'':25} " + " ".join(f"{'p50 / p95':>17}" for _ in range(len(STAGES) + 1)))
+    print("-" * len(header))
+    for result in report["results"]:
+        cells = [f"{result['stages'][stage]['p50']:8.3f}/{result['stages'][stage]['p95']:8.3f}" for stage in STAGES]
+        rate = result["rows_per_sec"]
+        cells.append(f"{rate['p50']:8.0f}/{rate['p95']:8.0f}")
+        print(f"{result['file_count']:>7} {result['version']:17} " + " ".join(cells))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Воспроизводимый бенчмарк версий парсера на локальном сервере")
+    parser.add_argument("--files", type=int, nargs="+", default=list(DEFAULT_FILE_COUNTS),
+                        help="Числа бюллетеней в сценариях (по умолчанию: 5 20)")
+    parser.add_argument("--versions", nargs="+", choices=VERSIONS, default=list(DEFAULT_VERSIONS),
+                        help="Бэкенды для сравнения (по умолчанию: asyncio+processes sync)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Измеряемых прогонов каждой версии")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP, help="Разогревочных прогонов")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Строк в синтетическом бюллетене")
+    parser.add_argument("--fixtures-dir", default=None,
+                        help="Каталог сохраненных бюллетеней (по умолчанию - синтетические)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Задержка ответа сервера, сек")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Скорость отдачи файла, байт/сек")
+    parser.add_argument("--load-method", choices=("merge", "copy", "insert"), default="merge")
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--reset-db", action="store_true",
+                        help="Очищать таблицы перед каждым прогоном (используйте отдельную базу!)")
+    parser.add_argument("--max-memory", type=int, default=None, metavar="MB",
+                        help="Запускать версии в режиме с ограничением памяти")
+    parser.add_argument("--output", default=None, help="Файл для результатов в формате JSON")
+    parser.add_argument("--verbose", action="store_true", help="Показывать вывод прогонов")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.files, tuple(args.versions), args.runs, args.warmup, args.rows, args.latency,
+                           args.bandwidth, args.load_method, args.parse_workers, args.reset_db,
+                           args.fixtures_dir, args.verbose, args.max_memory)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True, ensure_ascii=False)
+        print(f"\nРезультаты сохранены в {args.output}")
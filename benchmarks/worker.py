@@ -0,0 +1,63 @@
+"""
+Один прогон бенчмарка в отдельном процессе.
+
+Запускается из benchmarks.run: каждый прогон начинается в чистом
+процессе (без прогретых импортов, пулов соединений и кэшей предыдущего
+прогона), а адрес сайта и каталог кэша бюллетеней передаются через
+переменные окружения SPIMEX_BASE_URL и SPIMEX_CACHE_DIR.
+"""
+import argparse
+import contextlib
+import json
+import sys
+
+from benchmarks.parser_bench import max_rss_mb
+
+# Таблицы, очищаемые перед прогоном с --reset-db
+RESET_TABLES = ("daily_aggregates", "trades", "ingest_state", "instruments", "bases")
+
+def reset_database():
+    """
+    Очищает таблицы приложения, чтобы каждый прогон загружал данные в пустую базу.
+    """
+    from sqlalchemy import text
+    from sync_app.database import engine, init_db
+
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(RESET_TABLES)} RESTART IDENTITY CASCADE"))
+
+def run(version, days, load_method, parse_workers=None, reset_db=False, max_memory=None):
+    """
+    Выполняет один прогон версии приложения (бэкенда из main.BACKENDS).
+
+    Returns:
+        dict: Время стадий, число файлов и записей (см. main.run_async_version)
+        и максимальный RSS процесса (max_rss_mb)
+    """
+    import main
+
+    if reset_db:
+        reset_database()
+    result = main.run_backend(version, days, parse_workers=parse_workers, load_method=load_method,
+                              max_memory=max_memory)
+    result["max_rss_mb"] = max_rss_mb()
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Один прогон бенчмарка")
+    parser.add_argument("--version", choices=("sync", "threads", "asyncio", "asyncio+processes"), required=True)
+    parser.add_argument("--days", type=int, required=True)
+    parser.add_argument("--load-method", default="merge")
+    parser.add_argument("--parse-workers", type=int, default=None)
+    parser.add_argument("--reset-db", action="store_true")
+    parser.add_argument("--max-memory", type=int, default=None)
+    parser.add_argument("--output", required=True, help="Файл для результата в формате JSON")
+    args = parser.parse_args()
+
+    # Вывод приложения уходит в stderr, чтобы не смешиваться с результатом
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run(args.version, args.days, args.load_method, args.parse_workers, args.reset_db,
+                     args.max_memory)
+    with open(args.output, "w") as file:
+        json.dump(result, file)
@@ -0,0 +1,219 @@
+import json
+import os
+import tempfile
+from datetime import date, datetime
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+from common.batch import TradeBatch
+from common.ingest import Bulletin
+
+# Каталог архива разобранных бюллетеней (SPIMEX_ARCHIVE_DIR); по умолчанию архив не используется
+ARCHIVE_DIR = os.environ.get("SPIMEX_ARCHIVE_DIR") or None
+
+# Версия формата архива: файлы другой версии не используются, а бюллетень
+# разбирается заново (увеличивается при изменении разбора или состава столбцов)
+ARCHIVE_VERSION = "3"
+
+# Ключи метаданных Parquet-файла
+_VERSION_KEY = b"spimex.version"
+_TRADE_DATE_KEY = b"spimex.trade_date"
+_URL_KEY = b"spimex.url"
+_REJECTED_KEY = b"spimex.rejected"
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Для архива разобранных бюллетеней нужен пакет pyarrow: pip install pyarrow") from None
+    return pyarrow, pyarrow.parquet
+
+class BulletinArchive:
+    """
+    Архив разобранных бюллетеней в колоночном формате Parquet.
+
+    Файлы лежат в каталогах по дате торгов и называются по хэшу
+    содержимого исходного Excel-файла: <root>/trade_date=ГГГГ-ММ-ДД/<sha256>.parquet.
+    Архив служит кэшем разбора (прочитать Parquet во много раз быстрее,
+    чем разобрать Excel) и историей торгов для анализа без обращения к БД:
+    каталог читается как набор данных с секциями, например
+    pd.read_parquet(root). Переизданный бюллетень получает новый хэш и
+    хранится рядом с прежним.
+
+    Файлы записываются атомарно (временный файл и переименование), поэтому
+    архив можно пополнять из нескольких процессов одновременно.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR):
+        if not root:
+            raise ValueError("Не задан каталог архива разобранных бюллетеней")
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, content_hash: str, trade_date) -> str:
+        """
+        Путь к файлу бюллетеня в архиве.
+
+        Args:
+            content_hash (str): Хэш содержимого исходного файла
+            trade_date (date): Дата торгов
+
+        Returns:
+            str: Путь к файлу Parquet
+        """
+        return os.path.join(self.root, f"trade_date={trade_date:%Y-%m-%d}", f"{content_hash}.parquet")
+
+    def load(self, content_hash: str, trade_date) -> Optional[TradeBatch]:
+        """
+        Читает разобранный бюллетень из архива.
+
+        Args:
+            content_hash (str): Хэш содержимого исходного файла
+            trade_date (date): Дата торгов (определяет каталог файла)
+
+        Returns:
+            TradeBatch: Данные торгов или None, если файла нет, он поврежден
+            или записан другой версией формата
+        """
+        path = self.path(content_hash, trade_date)
+        if not os.path.exists(path):
+            return None
+        pa, pq = _pyarrow()
+        try:
+            table = pq.read_table(path)
+        except (OSError, pa.ArrowException):
+            return None
+        metadata = table.schema.metadata or {}
+        if metadata.get(_VERSION_KEY) != ARCHIVE_VERSION.encode():
+            return None
+        stored_date = metadata.get(_TRADE_DATE_KEY)
+        return TradeBatch.from_frame(
+            table.to_pandas(),
+            datetime.fromisoformat(stored_date.decode()) if stored_date else None,
+            json.loads(metadata.get(_REJECTED_KEY, b"{}")),
+        )
+
+    def save(self, content_hash: str, batch: TradeBatch, url: Optional[str] = None,
+             trade_date=None) -> Optional[str]:
+        """
+        Записывает разобранный бюллетень в архив.
+
+        Бюллетени без даты торгов или без столбцов не архивируются.
+
+        Args:
+            content_hash (str): Хэш содержимого исходного файла
+            batch (TradeBatch): Данные торгов
+            url (str): URL исходного файла (сохраняется в метаданных)
+            trade_date (date): Дата каталога файла (None - дата торгов из пачки);
+                должна совпадать с датой, по которой файл ищется в load
+
+        Returns:
+            str: Путь к записанному файлу или None
+        """
+        if batch.trade_date is None or not batch.columns:
+            return None
+        pa, pq = _pyarrow()
+        table = pa.Table.from_pandas(batch.to_frame(), preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_VERSION_KEY] = ARCHIVE_VERSION.encode()
+        metadata[_TRADE_DATE_KEY] = batch.trade_date.isoformat().encode()
+        if url:
+            metadata[_URL_KEY] = url.encode()
+        # Отчет об очистке нужен и при чтении из архива: строк, отброшенных при разборе, в файле нет
+        metadata[_REJECTED_KEY] = json.dumps(batch.rejected).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        path = self.path(content_hash, trade_date or batch.trade_date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pq.write_table(table, file, compression="zstd")
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return path
+
+    def partitions(self, start: Optional[date] = None, end: Optional[date] = None) -> List[date]:
+        """
+        Даты торгов, для которых в архиве есть бюллетени.
+
+        Args:
+            start (date): Начало периода (None - без ограничения)
+            end (date): Конец периода (None - без ограничения)
+
+        Returns:
+            List[date]: Даты в порядке возрастания
+        """
+        dates = []
+        for name in os.listdir(self.root):
+            if not name.startswith("trade_date="):
+                continue
+            try:
+                trade_date = datetime.strptime(name[len("trade_date="):], "%Y-%m-%d").date()
+            except ValueError:
+                continue
+            if (start is None or trade_date >= start) and (end is None or trade_date <= end):
+                dates.append(trade_date)
+        return sorted(dates)
+
+    def scan(self, start: Optional[date] = None, end: Optional[date] = None) -> pd.DataFrame:
+        """
+        Читает историю торгов из архива за период (без обращения к БД).
+
+        Args:
+            start (date): Начало периода (None - без ограничения)
+            end (date): Конец периода (None - без ограничения)
+
+        Returns:
+            pd.DataFrame: Сделки со столбцами trade_date и content_hash
+            (по content_hash отличаются переизданные бюллетени одной даты)
+        """
+        pa, pq = _pyarrow()
+        frames = []
+        for trade_date in self.partitions(start, end):
+            directory = os.path.join(self.root, f"trade_date={trade_date:%Y-%m-%d}")
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".parquet"):
+                    continue
+                frame = pq.read_table(os.path.join(directory, name)).to_pandas()
+                frame.insert(0, "content_hash", name[:-len(".parquet")])
+                frame.insert(0, "trade_date", pd.Timestamp(trade_date))
+                frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=["trade_date", "content_hash"])
+        return pd.concat(frames, ignore_index=True)
+
+def parse_archived(parse: Callable[[bytes], TradeBatch], bulletin: Bulletin,
+                   archive: Optional[BulletinArchive] = None) -> Tuple[TradeBatch, bool]:
+    """
+    Разбирает бюллетень, используя архив как кэш разбора.
+
+    Файл ищется в архиве по хэшу содержимого в каталоге даты торгов из
+    URL; если его нет, бюллетень разбирается функцией parse, и результат
+    записывается в архив в каталог той же даты (дата в листе может
+    отличаться от даты в URL, и тогда файл не нашелся бы при следующем
+    разборе). Функция выполняется и в процессах-парсерах, поэтому
+    принимает только сериализуемые аргументы.
+
+    Args:
+        parse (Callable): Функция разбора содержимого (parse_data)
+        bulletin (Bulletin): Скачанный бюллетень
+        archive (BulletinArchive): Архив (None - просто разобрать файл)
+
+    Returns:
+        tuple: (данные торгов, True - если взяты из архива)
+    """
+    if archive is None:
+        return parse(bulletin.content), False
+    if bulletin.trade_date is not None:
+        batch = archive.load(bulletin.content_hash, bulletin.trade_date)
+        # Пустая пачка в архиве не используется: разбор такого файла завершается ошибкой
+        if batch is not None and len(batch) > 0:
+            return batch, True
+    batch = parse(bulletin.content)
+    archive.save(bulletin.content_hash, batch, bulletin.url, bulletin.trade_date)
+    return batch, False
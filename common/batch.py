@@ -0,0 +1,125 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Числовые столбцы бюллетеня: хранятся массивами float64 (пропуски - NaN)
+NUMERIC_COLUMNS = (
+    "volume",
+    "value_contracts",
+    "price_change",
+    "price",
+    "max_price",
+    "price_in_quotes",
+    "contracts_count",
+)
+
+def integer_values(values: np.ndarray) -> List[Optional[int]]:
+    """
+    Округляет числовой столбец до целых для записи в целочисленный столбец БД.
+
+    Args:
+        values (np.ndarray): Массив float64
+
+    Returns:
+        List[Optional[int]]: Значения (NaN -> None)
+    """
+    missing = np.isnan(values)
+    rounded = np.rint(np.where(missing, 0, values)).astype(np.int64).tolist()
+    return [None if skip else value for value, skip in zip(rounded, missing.tolist())]
+
+def decimal_values(values: np.ndarray, places: int = 2) -> List[Optional[Decimal]]:
+    """
+    Приводит числовой столбец к Decimal с заданным числом знаков после запятой
+    для записи в столбец NUMERIC без ошибок двоичного представления.
+
+    Args:
+        values (np.ndarray): Массив float64
+        places (int): Знаков после запятой
+
+    Returns:
+        List[Optional[Decimal]]: Значения (NaN -> None)
+    """
+    return [None if value != value else Decimal(f"{value:.{places}f}") for value in values.tolist()]
+
+@dataclass
+class TradeBatch:
+    """
+    Данные торгов одного бюллетеня в колоночном виде.
+
+    Вместо списка словарей (по объекту на сделку) каждый столбец хранится
+    одним массивом NumPy: числовые - float64, строковые - массивом объектов.
+    Дата торгов одна на весь бюллетень и хранится скаляром, а в rejected -
+    число строк, отброшенных при очистке (common.cleaning), по причинам.
+    """
+    trade_date: Optional[datetime] = None
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+    rejected: Dict[str, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        for values in self.columns.values():
+            return len(values)
+        return 0
+
+    def __contains__(self, name) -> bool:
+        return name in self.columns
+
+    def __getitem__(self, name) -> np.ndarray:
+        return self.columns[name]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, trade_date: Optional[datetime] = None,
+                   rejected: Optional[Dict[str, int]] = None) -> "TradeBatch":
+        """
+        Создает пачку из DataFrame, приводя известные числовые столбцы к float64.
+
+        Args:
+            df (pd.DataFrame): Таблица бюллетеня
+            trade_date (datetime): Дата торгов
+            rejected (Dict[str, int]): Отброшено строк при очистке по причинам
+
+        Returns:
+            TradeBatch: Колоночная пачка
+        """
+        columns = {}
+        for name in df.columns:
+            if name in NUMERIC_COLUMNS:
+                columns[name] = pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                values = df[name].to_numpy(dtype=object)
+                # Пропуски pandas (NaN) заменяем на None
+                columns[name] = np.where(pd.isna(values), None, values)
+        return cls(trade_date, columns, dict(rejected or {}))
+
+    def take(self, mask) -> "TradeBatch":
+        """
+        Возвращает пачку из строк, отобранных булевой маской или индексами.
+        """
+        return TradeBatch(self.trade_date, {name: values[mask] for name, values in self.columns.items()},
+                          self.rejected)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Возвращает пачку в виде DataFrame (без столбца даты торгов).
+        """
+        return pd.DataFrame(self.columns)
+
+    def iter_rows(self, names: List[str]) -> Iterator[tuple]:
+        """
+        Итерирует по строкам, возвращая кортежи значений заданных столбцов
+        (значения - встроенные типы Python; отсутствующий столбец дает None).
+        """
+        length = len(self)
+        arrays = [self.columns[name].tolist() if name in self.columns else [None] * length
+                  for name in names]
+        return zip(*arrays)
+
+    def to_records(self) -> List[Dict]:
+        """
+        Возвращает данные в виде списка словарей (с датой торгов в каждой записи).
+        """
+        names = list(self.columns)
+        return [dict(zip(names, row), trade_date=self.trade_date) for row in self.iter_rows(names)]
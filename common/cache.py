@@ -0,0 +1,251 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional
+
+# Каталог кэша бюллетеней (общий для асинхронной и синхронной версий),
+# переопределяется переменной окружения SPIMEX_CACHE_DIR
+CACHE_DIR = os.environ.get(
+    "SPIMEX_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "bulletins")
+)
+
+# Максимальный суммарный размер кэша, байт (при превышении вытесняются давно не используемые файлы)
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+@dataclass
+class CacheEntry:
+    """
+    Запись кэша: URL, хэш содержимого и HTTP-валидаторы.
+    """
+    url: str
+    digest: str
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """
+        Заголовки условного запроса для повторной проверки файла.
+
+        Returns:
+            Dict[str, str]: If-None-Match / If-Modified-Since
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class BulletinCache:
+    """
+    Локальный кэш файлов бюллетеней с адресацией по содержимому.
+
+    Файлы хранятся в objects/<sha256[:2]>/<sha256>, соответствие URL -> хэш,
+    ETag/Last-Modified и время последнего обращения лежат в SQLite-индексе.
+    При превышении max_bytes вытесняются давно не использованные записи (LRU).
+    Каждая операция открывает собственное соединение с индексом, поэтому кэш
+    можно использовать из нескольких потоков и процессов одновременно.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " url TEXT PRIMARY KEY,"
+                " digest TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def lookup(self, url) -> Optional[CacheEntry]:
+        """
+        Ищет запись кэша для URL.
+
+        Args:
+            url (str): URL файла
+
+        Returns:
+            CacheEntry: Запись кэша или None, если файла в кэше нет
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT url, digest, size, etag, last_modified FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row)
+        if not os.path.exists(self._blob_path(entry.digest)):
+            # Файл удален с диска в обход кэша - забываем запись
+            self.discard(url)
+            return None
+        return entry
+
+    def read(self, entry: CacheEntry) -> Optional[bytes]:
+        """
+        Читает содержимое файла из кэша и отмечает обращение к нему.
+
+        Args:
+            entry (CacheEntry): Запись кэша
+
+        Returns:
+            bytes: Содержимое файла или None, если файл поврежден или удален
+        """
+        try:
+            with open(self._blob_path(entry.digest), "rb") as f:
+                content = f.read()
+        except OSError:
+            self.discard(entry.url)
+            return None
+        if hashlib.sha256(content).hexdigest() != entry.digest:
+            self.discard(entry.url)
+            return None
+        self.touch(entry.url)
+        return content
+
+    def touch(self, url, etag=None, last_modified=None) -> None:
+        """
+        Обновляет время последнего обращения и, если переданы, валидаторы.
+
+        Args:
+            url (str): URL файла
+            etag (str): Новый ETag
+            last_modified (str): Новый Last-Modified
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE entries SET accessed_at = ?,"
+                " etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)"
+                " WHERE url = ?",
+                (time.time(), etag, last_modified, url),
+            )
+
+    def store(self, url, content: bytes, etag=None, last_modified=None) -> CacheEntry:
+        """
+        Сохраняет файл в кэш и при необходимости вытесняет старые записи.
+
+        Args:
+            url (str): URL файла
+            content (bytes): Содержимое файла
+            etag (str): Значение заголовка ETag
+            last_modified (str): Значение заголовка Last-Modified
+
+        Returns:
+            CacheEntry: Созданная запись кэша
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        return self._store_blob(url, digest, len(content), lambda f: f.write(content), etag, last_modified)
+
+    def store_file(self, url, file: BinaryIO, digest: str, size: int, etag=None, last_modified=None) -> CacheEntry:
+        """
+        Сохраняет в кэш содержимое открытого файла, не читая его в память целиком.
+
+        Args:
+            url (str): URL файла
+            file (BinaryIO): Файл, установленный на начало содержимого
+            digest (str): Хэш SHA-256 содержимого
+            size (int): Размер содержимого, байт
+            etag (str): Значение заголовка ETag
+            last_modified (str): Значение заголовка Last-Modified
+
+        Returns:
+            CacheEntry: Созданная запись кэша
+        """
+        return self._store_blob(url, digest, size, lambda f: shutil.copyfileobj(file, f), etag, last_modified)
+
+    def _store_blob(self, url, digest, size, write, etag, last_modified) -> CacheEntry:
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (url, digest, size, etag, last_modified, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, digest, size, etag, last_modified, time.time()),
+            )
+        self.evict()
+        return CacheEntry(url, digest, size, etag, last_modified)
+
+    def discard(self, url) -> None:
+        """
+        Удаляет запись для URL (и файл, если на него больше никто не ссылается).
+
+        Args:
+            url (str): URL файла
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT digest FROM entries WHERE url = ?", (url,)).fetchone()
+            conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            if row is not None:
+                self._remove_orphan(conn, row[0])
+
+    def _remove_orphan(self, conn, digest):
+        referenced = conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+        if referenced is None:
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+
+    def evict(self) -> None:
+        """
+        Вытесняет давно не использованные записи, пока размер кэша превышает лимит.
+        """
+        with self._lock, self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = conn.execute("SELECT url, digest, size FROM entries ORDER BY accessed_at").fetchall()
+            for url, digest, size in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._remove_orphan(conn, digest)
+                total -= size
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_cache() -> BulletinCache:
+    """
+    Возвращает общий для процесса экземпляр кэша с настройками по умолчанию.
+
+    Returns:
+        BulletinCache: Кэш бюллетеней
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = BulletinCache()
+        return _default_cache
@@ -0,0 +1,152 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.batch import NUMERIC_COLUMNS
+from common.metrics import metrics
+
+# Код инструмента биржи: латинские буквы и цифры (например, A592ANK060F). В строках
+# разделов, итогов и примечаний в столбце кода стоит русский текст, и под шаблон они не подходят
+INSTRUMENT_CODE_PATTERN = r"[A-Z0-9]{4,20}"
+
+# Естественный ключ строки внутри бюллетеня
+ROW_KEY = ["instrument_code", "basis"]
+
+# Причины отбраковки в порядке проверки (строка учитывается по первой подошедшей):
+# нет кода, код не по шаблону, нет базиса, нет договоров, нет объема, повтор ключа
+REJECT_REASONS = ("no_code", "bad_code", "no_basis", "no_contracts", "no_volume", "duplicate")
+
+# Обязательные столбцы и причина, по которой отбрасываются все строки таблицы без столбца
+REQUIRED_COLUMNS = {
+    "instrument_code": "no_code",
+    "basis": "no_basis",
+    "contracts_count": "no_contracts",
+    "volume": "no_volume",
+}
+
+def coerce_numeric(values: pd.Series) -> pd.Series:
+    """
+    Приводит столбец к float64.
+
+    Числа из ячеек берутся как есть, а текст разбирается после удаления
+    пробелов (в том числе неразрывных) и замены десятичной запятой на
+    точку: "1 234,5" -> 1234.5. Прочий текст ("-") дает NaN.
+
+    Args:
+        values (pd.Series): Столбец бюллетеня
+
+    Returns:
+        pd.Series: Столбец float64 (пропуски - NaN)
+    """
+    numbers = pd.to_numeric(values, errors="coerce").astype(np.float64)
+    # Повторно разбираются только непустые значения, которые не удалось привести сразу
+    text = values[numbers.isna() & values.notna()]
+    if len(text):
+        normalized = text.astype(str).str.replace(r"\s", "", regex=True).str.replace(",", ".", regex=False)
+        numbers.loc[text.index] = pd.to_numeric(normalized, errors="coerce").astype(np.float64)
+    return numbers
+
+def _strip_text(values: pd.Series) -> pd.Series:
+    """
+    Убирает пробелы по краям строк; пустые строки становятся пропусками.
+    """
+    text = values.astype("string").str.strip()
+    return text.mask(text == "")
+
+def clean_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Очищает таблицу бюллетеня перед загрузкой в БД.
+
+    Из таблицы удаляются строки разделов, итогов и примечаний (код не
+    подходит под INSTRUMENT_CODE_PATTERN), строки без базиса, инструменты
+    без сделок (число договоров не больше нуля или "-"), строки без объема
+    и повторы кода и базиса (остается первая строка). Числовые столбцы
+    приводятся к float64 (coerce_numeric), у текстовых убираются пробелы.
+    Все проверки выполняются над столбцами целиком, без цикла по строкам.
+
+    Если в таблице нет обязательного столбца (REQUIRED_COLUMNS), все ее
+    строки отбрасываются по соответствующей причине: таблица другой
+    структуры не должна молча попасть в БД без проверки.
+
+    Args:
+        df (pd.DataFrame): Таблица бюллетеня (столбцы - как в RENAME_MAPPING)
+
+    Returns:
+        tuple: (очищенная таблица, число отброшенных строк по причинам из
+        REJECT_REASONS - только ненулевые)
+    """
+    if df.empty:
+        return df, {}
+
+    df = df.copy()
+    for name in ("instrument_code", "instrument_name", "basis"):
+        if name in df.columns:
+            df[name] = _strip_text(df[name])
+    for name in NUMERIC_COLUMNS:
+        if name in df.columns:
+            df[name] = coerce_numeric(df[name])
+
+    missing = [reason for name, reason in REQUIRED_COLUMNS.items() if name not in df.columns]
+    if missing:
+        # Все строки учитываются по первой причине в порядке проверки
+        reason = min(missing, key=REJECT_REASONS.index)
+        return df.iloc[:0].reset_index(drop=True), {reason: len(df)}
+
+    codes = df["instrument_code"]
+    checks = [
+        ("no_code", codes.isna()),
+        ("bad_code", ~codes.str.fullmatch(INSTRUMENT_CODE_PATTERN).fillna(False).astype(bool)),
+        ("no_basis", df["basis"].isna()),
+        ("no_contracts", ~(df["contracts_count"] > 0)),
+        ("no_volume", ~(df["volume"] > 0)),
+    ]
+
+    rejected = {}
+    keep = np.ones(len(df), dtype=bool)
+    for reason, mask in checks:
+        hit = keep & mask.to_numpy(dtype=bool)
+        if hit.any():
+            rejected[reason] = int(hit.sum())
+        keep &= ~hit
+
+    duplicate = np.zeros(len(df), dtype=bool)
+    duplicate[keep] = df.loc[keep, ROW_KEY].duplicated(keep="first").to_numpy()
+    if duplicate.any():
+        rejected["duplicate"] = int(duplicate.sum())
+    keep &= ~duplicate
+
+    return df[keep].reset_index(drop=True), rejected
+
+def merge_rejected(total: Dict[str, int], rejected: Dict[str, int]) -> Dict[str, int]:
+    """
+    Добавляет счетчики отброшенных строк rejected к total (total изменяется).
+    """
+    for reason, count in rejected.items():
+        total[reason] = total.get(reason, 0) + count
+    return total
+
+def record_rejected(rejected: Dict[str, int], app: str, total: Optional[Dict[str, int]] = None) -> None:
+    """
+    Учитывает отброшенные при очистке строки бюллетеня в метриках и,
+    если передан total, в итогах прогона.
+
+    Args:
+        rejected (Dict[str, int]): Отброшено строк по причинам (TradeBatch.rejected)
+        app (str): Версия приложения (метка метрики)
+        total (Dict[str, int]): Итоги прогона по причинам, пополняются
+    """
+    for reason, count in rejected.items():
+        metrics.inc("spimex_rows_rejected_total", count, app=app, reason=reason)
+    if total is not None:
+        merge_rejected(total, rejected)
+
+def format_rejected(rejected: Dict[str, int]) -> str:
+    """
+    Отчет об отброшенных строках: "12 (no_contracts: 10, bad_code: 2)".
+    """
+    total = sum(rejected.values())
+    if not total:
+        return "0"
+    details = ", ".join(f"{reason}: {rejected[reason]}" for reason in REJECT_REASONS if rejected.get(reason))
+    return f"{total} ({details})"
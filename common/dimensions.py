@@ -0,0 +1,40 @@
+from typing import Dict, Iterable, List
+
+class DimensionCache:
+    """
+    Кэш идентификаторов справочника (инструменты, базисы) в памяти процесса.
+
+    Справочники маленькие и почти не меняются, поэтому каждое значение
+    ищется в БД один раз за время жизни процесса, а дальше его id берется
+    из словаря. В кэш попадают только id из зафиксированных транзакций.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def missing(self, values: Iterable[str]) -> List[str]:
+        """
+        Возвращает значения, id которых еще не известны (без повторов,
+        в порядке первого появления).
+        """
+        return [value for value in dict.fromkeys(values) if value not in self._ids]
+
+    def update(self, pairs: Iterable) -> None:
+        """
+        Запоминает пары (id, значение), полученные из БД.
+        """
+        for dimension_id, value in pairs:
+            self._ids[value] = dimension_id
+
+    def lookup(self, values: Iterable[str]) -> List[int]:
+        """
+        Возвращает id для каждого значения (все значения должны быть известны).
+        """
+        ids = self._ids
+        return [ids[value] for value in values]
+
+    def clear(self) -> None:
+        self._ids.clear()
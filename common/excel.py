@@ -0,0 +1,170 @@
+import io
+import re
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Сигнатуры форматов: .xlsx - ZIP-архив, .xls - составной документ OLE2
+XLSX_SIGNATURE = b"PK\x03\x04"
+XLS_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+TRADE_DATE_MARKER = "Дата торгов:"
+
+# Сколько известных заголовков должно быть в строке, чтобы считать ее шапкой таблицы
+MIN_HEADER_MATCHES = 2
+
+def normalize_header(value) -> str:
+    """
+    Приводит текст заголовка к виду без переносов строк и лишних пробелов.
+
+    Args:
+        value: Значение ячейки
+
+    Returns:
+        str: Нормализованный текст ("" для пустых и нестроковых ячеек)
+    """
+    if not isinstance(value, str):
+        return ""
+    return " ".join(value.split())
+
+def iter_sheet_rows(content: bytes) -> Iterator[Sequence]:
+    """
+    Построчно читает первый лист Excel-файла.
+
+    .xlsx читается openpyxl в режиме read_only (потоково, без построения
+    модели всей книги), .xls - через xlrd, причем загружается только
+    первый лист.
+
+    Args:
+        content (bytes): Содержимое файла
+
+    Yields:
+        Sequence: Значения ячеек строки
+    """
+    if content.startswith(XLSX_SIGNATURE):
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield row
+        finally:
+            workbook.close()
+    elif content.startswith(XLS_SIGNATURE):
+        import xlrd
+
+        book = xlrd.open_workbook(file_contents=content, on_demand=True)
+        try:
+            sheet = book.sheet_by_index(0)
+            for index in range(sheet.nrows):
+                yield sheet.row_values(index)
+        finally:
+            book.release_resources()
+    else:
+        raise ValueError("Неизвестный формат файла: ожидается .xls или .xlsx")
+
+def parse_trade_date(value) -> Optional[datetime]:
+    """
+    Извлекает дату торгов из ячейки вида "Дата торгов: ДД.ММ.ГГГГ".
+
+    Args:
+        value: Значение ячейки
+
+    Returns:
+        datetime: Дата торгов или None, если ячейка ее не содержит
+    """
+    if not isinstance(value, str) or TRADE_DATE_MARKER not in value:
+        return None
+    match = re.search(r"\d{2}\.\d{2}\.\d{4}", value.split(TRADE_DATE_MARKER, 1)[1])
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(0), "%d.%m.%Y")
+    except ValueError:
+        return None
+
+def match_header(row: Sequence, wanted: Dict[str, str],
+                 min_matches: int = MIN_HEADER_MATCHES) -> Optional[List[Tuple[str, int]]]:
+    """
+    Проверяет, является ли строка шапкой таблицы бюллетеня.
+
+    Args:
+        row (Sequence): Значения ячеек строки
+        wanted (Dict[str, str]): Нормализованный заголовок -> имя столбца
+        min_matches (int): Сколько известных заголовков должно быть в строке
+
+    Returns:
+        List[Tuple[str, int]]: Пары (имя столбца, номер ячейки), если в строке
+        не меньше min_matches известных заголовков, иначе None
+    """
+    matches = []
+    found = set()
+    for index, cell in enumerate(row):
+        name = wanted.get(normalize_header(cell))
+        if name is not None and name not in found:
+            matches.append((name, index))
+            found.add(name)
+    return matches if len(matches) >= min_matches else None
+
+def read_bulletin_table(content: bytes, rename_mapping: Dict[str, str],
+                        subheader_mapping: Optional[Dict[str, str]] = None) -> Tuple[datetime, Dict[str, List]]:
+    """
+    Читает таблицу бюллетеня за один проход по листу.
+
+    В одном проходе находятся дата торгов и строка заголовков (первая
+    строка, в которой встретилось не меньше MIN_HEADER_MATCHES заголовков
+    из rename_mapping), после чего из строк данных извлекаются только
+    столбцы из rename_mapping. Заголовки сравниваются без учета переносов
+    строк и повторных пробелов.
+
+    Столбцы из subheader_mapping ищутся в строке сразу под заголовками
+    (подзаголовки объединенных ячеек). Сама эта строка, как и прежде,
+    попадает в данные и отбрасывается при очистке.
+
+    Args:
+        content (bytes): Содержимое Excel-файла
+        rename_mapping (Dict[str, str]): Заголовок в файле -> имя столбца
+        subheader_mapping (Dict[str, str]): Подзаголовок в файле -> имя столбца
+
+    Returns:
+        Tuple[datetime, Dict[str, List]]: Дата торгов и столбцы {имя столбца: значения}
+
+    Raises:
+        ValueError: На листе нет строки заголовков или даты торгов (файл
+        другой структуры не должен загружаться как пустой бюллетень)
+    """
+    wanted = {normalize_header(title): name for title, name in rename_mapping.items()}
+    wanted_subheaders = {normalize_header(title): name for title, name in (subheader_mapping or {}).items()}
+    trade_date = None
+    positions = None
+    columns: Dict[str, List] = {}
+    subheader_pending = False
+
+    for row in iter_sheet_rows(content):
+        if subheader_pending:
+            subheader_pending = False
+            for name, index in match_header(row, wanted_subheaders, 1) or []:
+                if name not in columns:
+                    positions.append((name, index))
+                    columns[name] = []
+        if positions is not None:
+            for name, index in positions:
+                value = row[index] if index < len(row) else None
+                columns[name].append(None if value == "" else value)
+            continue
+
+        if trade_date is None:
+            for cell in row:
+                trade_date = parse_trade_date(cell)
+                if trade_date is not None:
+                    break
+
+        positions = match_header(row, wanted)
+        if positions is not None:
+            columns = {name: [] for name, _ in positions}
+            subheader_pending = bool(wanted_subheaders)
+
+    if positions is None:
+        raise ValueError("Не найдена строка заголовков таблицы бюллетеня")
+    if trade_date is None:
+        raise ValueError(f"Не найдена дата торгов (ячейка \"{TRADE_DATE_MARKER} ДД.ММ.ГГГГ\") над таблицей")
+    return trade_date, columns
@@ -0,0 +1,123 @@
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from bs4 import BeautifulSoup
+
+# Адрес сайта биржи (SPIMEX_BASE_URL позволяет направить загрузку на локальный сервер, например в бенчмарках)
+BASE_URL = os.environ.get("SPIMEX_BASE_URL", "https://spimex.com").rstrip("/")
+RESULTS_URL = f"{BASE_URL}/markets/oil_products/trades/results/"
+
+# Ограничение на количество страниц индекса, чтобы не уйти в бесконечный обход
+MAX_INDEX_PAGES = 200
+
+def index_page_url(page):
+    """
+    Формирует URL страницы индекса результатов торгов.
+
+    Args:
+        page (int): Номер страницы (начиная с 1)
+
+    Returns:
+        str: URL страницы
+    """
+    if page <= 1:
+        return RESULTS_URL
+    return f"{RESULTS_URL}?page=page-{page}"
+
+def parse_index_page(content):
+    """
+    Извлекает ссылки на файлы бюллетеней со страницы индекса.
+
+    Args:
+        content (str): HTML-код страницы индекса
+
+    Returns:
+        dict: Словарь {дата торгов: [ссылки на файлы]}
+    """
+    soup = BeautifulSoup(content, "html.parser")
+
+    page_index = {}
+    for link in soup.find_all("a", class_="accordeon-inner__item-title", href=True):
+        href = link["href"]
+        date_match = re.search(r'(\d{8})', href)
+        if not date_match:
+            continue
+        try:
+            trade_date = datetime.strptime(date_match.group(1), "%Y%m%d").date()
+        except ValueError:
+            continue
+        page_index.setdefault(trade_date, []).append(BASE_URL + href)
+
+    return page_index
+
+def merge_index_page(links_index: Dict[date, List[str]], seen: Set[str], page_index: Dict[date, List[str]],
+                     start_date: date) -> bool:
+    """
+    Добавляет ссылки страницы индекса в общий словарь и решает, нужна ли
+    следующая страница.
+
+    Обход останавливается, когда на странице нет новых ссылок (индекс
+    закончился или страница повторяет предыдущую) или встречаются даты
+    раньше start_date (индекс отсортирован по убыванию дат).
+
+    Args:
+        links_index (Dict[date, List[str]]): Словарь {дата торгов: [ссылки]}, пополняется
+        seen (Set[str]): Уже встреченные ссылки, пополняется
+        page_index (Dict[date, List[str]]): Ссылки страницы (parse_index_page)
+        start_date (date): Самая ранняя интересующая дата
+
+    Returns:
+        bool: True, если нужно загрузить следующую страницу
+    """
+    new_links = 0
+    for trade_date, links in page_index.items():
+        for link in links:
+            if link in seen:
+                continue
+            seen.add(link)
+            links_index.setdefault(trade_date, []).append(link)
+            new_links += 1
+    return new_links > 0 and min(page_index) >= start_date
+
+def links_in_period(links_index: Dict[date, List[str]], start_date: date, end_date: date) -> List[str]:
+    """
+    Отбирает из индекса ссылки за период.
+
+    Returns:
+        List[str]: Ссылки на файлы в порядке возрастания дат
+    """
+    all_links = []
+    for trade_date in sorted(links_index):
+        if start_date <= trade_date <= end_date:
+            all_links.extend(links_index[trade_date])
+    return all_links
+
+def period_bounds(days):
+    """
+    Возвращает границы периода в days дней, заканчивающегося сегодня.
+
+    Returns:
+        tuple: (начальная дата, конечная дата)
+    """
+    end_date = datetime.now().date()
+    return end_date - timedelta(days=days), end_date
+
+def file_date_from_url(url) -> Optional[datetime]:
+    """
+    Извлекает дату торгов из URL файла бюллетеня.
+
+    Args:
+        url (str): URL файла
+
+    Returns:
+        datetime: Дата файла или None, если дату извлечь не удалось
+    """
+    date_match = re.search(r'(\d{8})', url)
+    if not date_match:
+        return None
+    try:
+        return datetime.strptime(date_match.group(1), "%Y%m%d")
+    except ValueError:
+        return None
@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from common.spool import SpooledBody
+
+class Bulletin(NamedTuple):
+    """
+    Скачанный файл бюллетеня.
+    """
+    trade_date: datetime
+    content: bytes
+    url: str
+    content_hash: str
+
+class SpooledBulletin(NamedTuple):
+    """
+    Скачанный файл бюллетеня, содержимое которого хранится во временном
+    файле (режим с ограничением памяти).
+    """
+    trade_date: datetime
+    body: SpooledBody
+    url: str
+    content_hash: str
+
+    def materialize(self) -> Bulletin:
+        """
+        Читает содержимое в память и закрывает временный файл.
+        """
+        try:
+            return Bulletin(self.trade_date, self.body.read(), self.url, self.content_hash)
+        finally:
+            self.body.close()
+
+def content_hash(content: bytes) -> str:
+    """
+    Вычисляет хэш содержимого файла (SHA-256).
+
+    Args:
+        content (bytes): Содержимое файла
+
+    Returns:
+        str: Hex-строка хэша
+    """
+    return hashlib.sha256(content).hexdigest()
+
+def make_bulletin(trade_date: datetime, content: bytes, url: str) -> Bulletin:
+    """
+    Создает описание бюллетеня с вычисленным хэшем содержимого.
+    """
+    return Bulletin(trade_date, content, url, content_hash(content))
+
+def make_spooled_bulletin(trade_date: datetime, body: SpooledBody, url: str) -> SpooledBulletin:
+    """
+    Создает описание бюллетеня, содержимое которого записано во временный файл.
+    """
+    return SpooledBulletin(trade_date, body, url, body.digest)
+
+def select_new_links(links: Iterable[str], known: Optional[Dict[str, str]], revalidate: bool = False) -> List[str]:
+    """
+    Отбирает ссылки на бюллетени, которые еще не загружались в базу.
+
+    Обычно опубликованный бюллетень не меняется, поэтому уже загруженные
+    URL не запрашиваются повторно. Если биржа переиздала файл под прежним
+    URL, изменение заметно только при повторном запросе: с revalidate
+    загруженные ссылки тоже отбираются. Скачивание идет условным запросом
+    (ETag/Last-Modified из кэша бюллетеней): неизменный файл приходит
+    ответом 304 без тела, а filter_new_bulletins отбрасывает его по хэшу
+    содержимого.
+
+    Args:
+        links (Iterable[str]): Ссылки на файлы
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш содержимого}
+        revalidate (bool): Перепроверять уже загруженные URL
+
+    Returns:
+        List[str]: Ссылки, которые нужно скачать
+    """
+    if not known or revalidate:
+        return list(links)
+    return [link for link in links if link not in known]
+
+def filter_new_bulletins(bulletins: Iterable[Bulletin], known: Optional[Dict[str, str]]) -> List[Bulletin]:
+    """
+    Отбрасывает бюллетени, содержимое которых уже загружалось
+    (например, под другим URL).
+
+    Args:
+        bulletins (Iterable[Bulletin]): Скачанные бюллетени
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш содержимого}
+
+    Returns:
+        List[Bulletin]: Бюллетени, которые нужно парсить и загружать
+    """
+    if not known:
+        return list(bulletins)
+    known_hashes = set(known.values())
+    return [bulletin for bulletin in bulletins if bulletin.content_hash not in known_hashes]
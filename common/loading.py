@@ -0,0 +1,261 @@
+from typing import Dict, Iterable, List, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import bindparam, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from common.batch import TradeBatch, decimal_values, integer_values
+from common.dimensions import DimensionCache
+from common.ingest import Bulletin
+from common.metrics import metrics
+from common.models import Basis, DailyAggregate, IngestState, Instrument, Trade
+from common.sql import (
+    create_staging_table_sql, delete_stale_daily_aggregates_sql, merge_from_staging_sql, month_start,
+    rebuild_daily_aggregates_sql, refresh_daily_aggregates_sql,
+)
+
+# Общая часть загрузчиков, не зависящая от драйвера БД. Функции, принимающие
+# session, работают с синхронной сессией SQLAlchemy: синхронная версия вызывает
+# их напрямую, асинхронная - через AsyncSession.run_sync. Передача строк
+# командой COPY у каждого драйвера своя и остается в db_loader версии.
+
+# Способы загрузки:
+#   "merge"  - COPY во временную таблицу и слияние INSERT ... ON CONFLICT DO UPDATE
+#   "copy"   - COPY прямо в trades (только для новых дат: повтор ключа - ошибка)
+#   "insert" - пакетный INSERT ... ON CONFLICT DO UPDATE
+LOAD_METHODS = ("merge", "copy", "insert")
+LOAD_METHOD = "merge"
+
+# Столбцы trades, заполняемые при загрузке (в порядке значений в записях)
+TRADE_COLUMNS = (
+    "trade_date", "instrument_id", "basis_id",
+    "volume", "value_contracts", "price_change", "price", "max_price", "price_in_quotes", "contracts_count",
+)
+
+# Естественный ключ сделки (уникальное ограничение uq_trades_natural_key)
+TRADE_KEY = ("trade_date", "instrument_id", "basis_id")
+
+# Столбцы, которые хранятся целыми числами (остальные показатели - NUMERIC)
+INTEGER_COLUMNS = ("volume", "value_contracts", "contracts_count")
+
+STAGING_TABLE = "trades_staging"
+
+# Временная таблица для режима "merge": создание, слияние с trades и очистка
+# (таблица очищается при COMMIT, но в одной транзакции может быть несколько слияний)
+CREATE_STAGING_SQL = create_staging_table_sql(Trade.__tablename__, STAGING_TABLE, TRADE_COLUMNS)
+MERGE_STAGING_SQL = merge_from_staging_sql(Trade.__tablename__, STAGING_TABLE, TRADE_COLUMNS, TRADE_KEY)
+CLEAR_STAGING_SQL = f"DELETE FROM {STAGING_TABLE}"
+
+# Сколько новых значений справочника добавлять одним запросом
+DIMENSION_BATCH_SIZE = 5000
+
+class LoaderState:
+    """
+    Состояние загрузчика в памяти процесса: кэши id инструментов (по коду)
+    и базисов (по названию) и месяцы, секции trades для которых уже созданы.
+    """
+
+    def __init__(self):
+        self.instrument_ids = DimensionCache()
+        self.basis_ids = DimensionCache()
+        self.partition_months: Set = set()
+
+    def new_months(self, batches: List[TradeBatch]) -> Set:
+        """
+        Месяцы загружаемых дат, секции для которых этот процесс еще не проверял.
+        """
+        return {month_start(batch.trade_date) for batch in batches if len(batch) > 0} - self.partition_months
+
+    def missing_dimensions(self, batches: List[TradeBatch]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Инструменты и базисы пачек, id которых еще нет в кэше.
+
+        Значения отсортированы, чтобы параллельные загрузчики блокировали
+        строки справочника в одном порядке.
+
+        Returns:
+            tuple: ({код инструмента: название} в порядке кодов, отсортированные названия базисов)
+        """
+        names = {}
+        bases = []
+        for batch in batches:
+            if len(batch) == 0:
+                continue
+            codes = batch["instrument_code"].tolist()
+            titles = batch["instrument_name"].tolist() if "instrument_name" in batch else [None] * len(codes)
+            names.update(zip(codes, titles))
+            bases.extend(batch["basis"].tolist())
+        return ({code: names[code] for code in sorted(self.instrument_ids.missing(names))},
+                sorted(self.basis_ids.missing(bases)))
+
+    def trade_records(self, batch: TradeBatch) -> List[tuple]:
+        """
+        Готовит записи для загрузки прямо из столбцов пачки, без создания
+        ORM-объекта на каждую сделку. Инструмент и базис заменяются их id
+        из кэша справочников.
+        """
+        length = len(batch)
+        if batch.trade_date is None or length == 0:
+            return []
+        columns = [
+            [batch.trade_date.date()] * length,
+            self.instrument_ids.lookup(batch["instrument_code"].tolist()),
+            self.basis_ids.lookup(batch["basis"].tolist()),
+        ]
+        for name in TRADE_COLUMNS[3:]:
+            if name not in batch:
+                columns.append([None] * length)
+            elif name in INTEGER_COLUMNS:
+                columns.append(integer_values(batch[name]))
+            else:
+                columns.append(decimal_values(batch[name]))
+        return list(zip(*columns))
+
+def check_method(method: str) -> None:
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Неизвестный способ загрузки: {method}. Допустимые: {', '.join(LOAD_METHODS)}")
+
+def keyed_rows(batch: TradeBatch) -> TradeBatch:
+    """
+    Отбирает строки с естественным ключом: датой торгов, кодом инструмента
+    и базисом поставки (строки разделов и итогов их не имеют).
+    """
+    if batch.trade_date is None or "instrument_code" not in batch or "basis" not in batch:
+        return TradeBatch()
+    return batch.take(pd.notna(batch["instrument_code"]) & pd.notna(batch["basis"]))
+
+def _insert_missing(session, model, key, rows: List[Dict]) -> None:
+    """
+    Добавляет строки справочника, которых нет в БД, порциями по DIMENSION_BATCH_SIZE.
+
+    ON CONFLICT DO NOTHING пропускает значения, добавленные параллельным
+    загрузчиком после выборки. Значение последовательности id расходуется
+    только на такие гонки, а не на каждую известную строку при каждом
+    запуске (у bases id - SMALLSERIAL, не больше 32767).
+    """
+    for start in range(0, len(rows), DIMENSION_BATCH_SIZE):
+        statement = pg_insert(model).values(rows[start:start + DIMENSION_BATCH_SIZE])
+        session.execute(statement.on_conflict_do_nothing(index_elements=[key]))
+
+def add_dimensions(session, names: Dict[str, str], bases: List[str]) -> Tuple[List[tuple], List[tuple]]:
+    """
+    Находит id инструментов и базисов, добавляя в справочники недостающие
+    значения, в текущей транзакции.
+
+    Сначала выбираются id известных значений, затем добавляются только
+    отсутствующие, и их id выбираются повторно. Название инструмента
+    обновляется, если в бюллетене оно есть и отличается от сохраненного.
+
+    Args:
+        session (Session): Сессия в открытой транзакции
+        names (Dict[str, str]): Инструменты {код: название}
+        bases (List[str]): Названия базисов
+
+    Returns:
+        tuple: Пары (id, код) инструментов и (id, название) базисов
+    """
+    codes = list(names)
+    stored = {}
+    for start in range(0, len(codes), DIMENSION_BATCH_SIZE):
+        part = codes[start:start + DIMENSION_BATCH_SIZE]
+        stored.update(session.execute(select(Instrument.code, Instrument.name).where(Instrument.code.in_(part))).all())
+    _insert_missing(session, Instrument, Instrument.code,
+                    [{"code": code, "name": names[code]} for code in codes if code not in stored])
+    renamed = [{"instrument_code": code, "instrument_name": names[code]} for code in codes
+               if code in stored and names[code] is not None and names[code] != stored[code]]
+    if renamed:
+        instruments = Instrument.__table__
+        session.execute(
+            update(instruments).where(instruments.c.code == bindparam("instrument_code"))
+            .values(name=bindparam("instrument_name")),
+            renamed
+        )
+
+    stored_bases = set()
+    for start in range(0, len(bases), DIMENSION_BATCH_SIZE):
+        stored_bases.update(session.execute(
+            select(Basis.name).where(Basis.name.in_(bases[start:start + DIMENSION_BATCH_SIZE]))).scalars())
+    _insert_missing(session, Basis, Basis.name, [{"name": name} for name in bases if name not in stored_bases])
+
+    instrument_pairs = []
+    basis_pairs = []
+    for start in range(0, len(codes), DIMENSION_BATCH_SIZE):
+        instrument_pairs.extend(session.execute(select(Instrument.id, Instrument.code).where(
+            Instrument.code.in_(codes[start:start + DIMENSION_BATCH_SIZE]))).all())
+    for start in range(0, len(bases), DIMENSION_BATCH_SIZE):
+        basis_pairs.extend(session.execute(select(Basis.id, Basis.name).where(
+            Basis.name.in_(bases[start:start + DIMENSION_BATCH_SIZE]))).all())
+    return instrument_pairs, basis_pairs
+
+def skip_empty(bulletin: Bulletin, app: str) -> None:
+    """
+    Учитывает бюллетень без строк сделок как ошибку разбора.
+
+    Такой бюллетень не отмечается в ingest_state: отметка с нулем строк
+    исключила бы файл из следующих загрузок, хотя его, скорее всего,
+    не удалось разобрать.
+    """
+    metrics.inc("spimex_parse_errors_total", app=app)
+    print(f"   Бюллетень {bulletin.url} не содержит строк сделок и не отмечен как загруженный")
+
+def ingest_state_upsert(bulletin: Bulletin, rows_count: int):
+    """
+    Готовит отметку о загрузке бюллетеня в ingest_state.
+
+    Повторная загрузка того же URL (переизданный файл) обновляет дату,
+    хэш содержимого, число строк и время загрузки.
+
+    Args:
+        bulletin (Bulletin): Загруженный бюллетень
+        rows_count (int): Число записанных строк сделок
+
+    Returns:
+        Insert: Команда INSERT ... ON CONFLICT (url) DO UPDATE для ingest_state
+    """
+    statement = pg_insert(IngestState).values(
+        url=bulletin.url,
+        trade_date=bulletin.trade_date.date(),
+        content_hash=bulletin.content_hash,
+        rows_count=rows_count
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[IngestState.url],
+        set_={
+            "trade_date": statement.excluded.trade_date,
+            "content_hash": statement.excluded.content_hash,
+            "rows_count": statement.excluded.rows_count,
+            "loaded_at": statement.excluded.loaded_at,
+        }
+    )
+
+def insert_records(session, records: List[tuple]) -> None:
+    """
+    Загружает записи пакетным INSERT ... ON CONFLICT DO UPDATE (режим "insert").
+    """
+    statement = pg_insert(Trade)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(TRADE_KEY),
+        set_={column: statement.excluded[column] for column in TRADE_COLUMNS if column not in TRADE_KEY}
+    )
+    session.execute(statement, [dict(zip(TRADE_COLUMNS, record)) for record in records])
+
+def refresh_aggregates(session, dates: Iterable) -> None:
+    """
+    Пересчитывает дневные агрегаты за загруженные даты в текущей транзакции.
+    """
+    parameters = {"dates": sorted(set(dates))}
+    session.execute(text(refresh_daily_aggregates_sql(DailyAggregate.__tablename__, Trade.__tablename__)), parameters)
+    session.execute(text(delete_stale_daily_aggregates_sql(DailyAggregate.__tablename__, Trade.__tablename__)), parameters)
+
+def rebuild_aggregates(session) -> None:
+    """
+    Пересчитывает таблицу дневных агрегатов по всей истории сделок в текущей транзакции.
+    """
+    session.execute(text(f"DELETE FROM {DailyAggregate.__tablename__}"))
+    session.execute(text(rebuild_daily_aggregates_sql(DailyAggregate.__tablename__, Trade.__tablename__)))
+
+def loaded_bulletins(session) -> Dict[str, str]:
+    """
+    Уже загруженные бюллетени: {URL бюллетеня: хэш содержимого}.
+    """
+    return dict(session.execute(select(IngestState.url, IngestState.content_hash)).all())
@@ -0,0 +1,297 @@
+import bisect
+import contextlib
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Dict, Optional, Tuple
+
+# Границы корзин гистограмм
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1024, 8192, 32768, 131072, 524288, 2097152, 8388608, 33554432)
+ROWS_BUCKETS = (10, 100, 500, 1000, 5000, 10000, 50000, 100000)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Известные метрики: имя -> (тип, описание, границы корзин для гистограмм)
+METRICS = {
+    "spimex_http_request_seconds": ("histogram", "Время HTTP-запроса (одной попытки)", LATENCY_BUCKETS),
+    "spimex_http_response_bytes": ("histogram", "Размер тела HTTP-ответа", SIZE_BUCKETS),
+    "spimex_parse_seconds": ("histogram", "Время разбора одного файла бюллетеня", LATENCY_BUCKETS),
+    "spimex_parse_rows": ("histogram", "Строк в разобранном бюллетене", ROWS_BUCKETS),
+    "spimex_parse_errors_total": ("counter", "Файлы, которые не удалось разобрать", None),
+    "spimex_archive_hits_total": ("counter", "Бюллетени, взятые из архива вместо разбора Excel", None),
+    "spimex_rows_rejected_total": ("counter", "Строки бюллетеня, отброшенные при очистке (по причинам)", None),
+    "spimex_db_batch_seconds": ("histogram", "Время транзакции загрузки пачки в БД", LATENCY_BUCKETS),
+    "spimex_db_batch_rows": ("histogram", "Строк в пачке загрузки", ROWS_BUCKETS),
+    "spimex_db_batch_round_trips": ("histogram", "Команд SQL и COPY за транзакцию загрузки (без BEGIN/COMMIT)", COUNT_BUCKETS),
+    "spimex_stage_seconds_total": ("counter", "Время стадии", None),
+    "spimex_stage_peak_memory_bytes": ("gauge", "Пиковая память стадии по tracemalloc", None),
+    "spimex_daemon_polls_total": ("counter", "Опросы индекса службой загрузки (по результату)", None),
+    "spimex_daemon_bulletins_total": ("counter", "Бюллетени, загруженные службой", None),
+    "spimex_daemon_ingest_seconds": ("histogram", "От начала опроса, нашедшего новые бюллетени, до их записи в БД", LATENCY_BUCKETS),
+    "spimex_daemon_last_success_timestamp_seconds": ("gauge", "Время последнего успешного опроса (Unix)", None),
+}
+
+# Ключ счетчика обращений к серверу в Connection.info (словарь соединения пула)
+ROUND_TRIPS_KEY = "spimex_round_trips"
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин (как в Prometheus).
+    """
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "started")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: Tuple, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+class Metrics:
+    """
+    Реестр метрик процесса: счетчики, показатели и гистограммы с метками.
+
+    По умолчанию выключен: все методы сразу возвращаются, а timer() и
+    stage() отдают общий пустой контекстный менеджер, поэтому точки
+    измерения в загрузчике, парсере и записи в БД почти ничего не стоят.
+    После enable() значения накапливаются и выгружаются в текстовом
+    формате Prometheus (to_prometheus) или снимком JSON (snapshot).
+
+    Для стадий (stage) дополнительно можно включить профилирование
+    cProfile (файл <стадия>.prof в profile_dir) и замер пиковой памяти
+    tracemalloc.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.profile_dir: Optional[str] = None
+        self.trace_memory = False
+        self._series: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        self._profiling = False
+
+    def enable(self, profile_dir: Optional[str] = None, trace_memory: bool = False) -> None:
+        """
+        Включает сбор метрик.
+
+        Args:
+            profile_dir (str): Каталог для профилей cProfile по стадиям (None - без профилирования)
+            trace_memory (bool): Замерять пиковую память стадий через tracemalloc
+        """
+        self.enabled = True
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def _definition(self, name: str):
+        try:
+            return METRICS[name]
+        except KeyError:
+            raise KeyError(f"Неизвестная метрика: {name}") from None
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        if not self.enabled:
+            return
+        self._definition(name)
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def set(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        self._definition(name)
+        with self._lock:
+            self._series[(name, _label_key(labels))] = float(value)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        bounds = self._definition(name)[2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._series.get(key)
+            if histogram is None:
+                histogram = self._series[key] = Histogram(bounds)
+            histogram.observe(value)
+
+    def timer(self, name: str, **labels):
+        """
+        Контекстный менеджер, записывающий длительность блока в гистограмму.
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Timer(self, name, labels)
+
+    def stage(self, name: str, **labels):
+        """
+        Контекстный менеджер стадии: время (spimex_stage_seconds_total) и,
+        если включено, профиль cProfile и пиковая память tracemalloc.
+
+        Профилируется одна стадия за раз: cProfile не допускает вложенных
+        профилировщиков, поэтому вложенные и одновременные стадии только
+        замеряются по времени.
+        """
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._stage(name, labels)
+
+    @contextlib.contextmanager
+    def _stage(self, name, labels):
+        profiler = None
+        if self.profile_dir and not self._profiling:
+            self._profiling = True
+            profiler = cProfile.Profile()
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                suffix = "".join(f"-{value}" for _, value in _label_key(labels))
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}{suffix}.prof"))
+            self.inc("spimex_stage_seconds_total", time.perf_counter() - started, stage=name, **labels)
+            if self.trace_memory:
+                self.set("spimex_stage_peak_memory_bytes", tracemalloc.get_traced_memory()[1], stage=name, **labels)
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def count_round_trip(self, info: dict, amount: int = 1) -> None:
+        """
+        Учитывает обращение к серверу БД в словаре соединения (Connection.info).
+        """
+        if self.enabled:
+            info[ROUND_TRIPS_KEY] = info.get(ROUND_TRIPS_KEY, 0) + amount
+
+    def round_trips(self, info: dict) -> int:
+        """
+        Возвращает счетчик обращений к серверу для соединения.
+        """
+        return info.get(ROUND_TRIPS_KEY, 0)
+
+    def install_statement_counter(self, engine) -> None:
+        """
+        Подключает к движку SQLAlchemy (синхронному; для асинхронного -
+        engine.sync_engine) подсчет выполняемых команд в Connection.info.
+        """
+        from sqlalchemy import event
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            self.count_round_trip(conn.info)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+    def snapshot(self) -> Dict:
+        """
+        Снимок метрик: {имя: {"type", "help", "series": [{"labels", ...значения}]}}.
+        """
+        result = {}
+        with self._lock:
+            items = sorted(self._series.items(), key=lambda item: item[0])
+            for (name, labels), value in items:
+                kind, description, _ = METRICS[name]
+                metric = result.setdefault(name, {"type": kind, "help": description, "series": []})
+                series = {"labels": dict(labels)}
+                if isinstance(value, Histogram):
+                    series.update(count=value.count, sum=value.sum,
+                                  buckets={_format_bound(bound): total for bound, total in value.cumulative()})
+                else:
+                    series["value"] = value
+                metric["series"].append(series)
+        return result
+
+    def to_prometheus(self) -> str:
+        """
+        Метрики в текстовом формате Prometheus (exposition format 0.0.4).
+        """
+        lines = []
+        current = None
+        with self._lock:
+            items = sorted(self._series.items(), key=lambda item: item[0])
+            for (name, labels), value in items:
+                kind, description, _ = METRICS[name]
+                if name != current:
+                    lines.append(f"# HELP {name} {description}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    current = name
+                if isinstance(value, Histogram):
+                    for bound, total in value.cumulative():
+                        bucket_labels = _format_labels(labels, 'le="%s"' % _format_bound(bound))
+                        lines.append(f"{name}_bucket{bucket_labels} {total}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {value.sum!r}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Сохраняет метрики в файл: .json - снимок JSON, иначе - текст Prometheus.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            if path.endswith(".json"):
+                json.dump(self.snapshot(), file, indent=2, ensure_ascii=False)
+            else:
+                file.write(self.to_prometheus())
+
+# Реестр метрик процесса
+metrics = Metrics()
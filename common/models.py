@@ -0,0 +1,119 @@
+from datetime import datetime
+from sqlalchemy.orm import declarative_base
+from sqlalchemy import (
+    BigInteger, Column, Date, DateTime, ForeignKey, Index, Integer, Numeric, PrimaryKeyConstraint, SmallInteger,
+    String, UniqueConstraint,
+)
+
+Base = declarative_base()
+
+class Instrument(Base):
+    """
+    ORM model representing a bulletin instrument (dictionary dimension).
+
+    The instrument code and name are stored once here; trades reference the
+    instrument by its compact integer id.
+    """
+    __tablename__ = 'instruments'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    code = Column(String, nullable=False, unique=True)
+    name = Column(String)
+
+    def __repr__(self):
+        return f"<Instrument(id={self.id}, code={self.code}, name={self.name})>"
+
+class Basis(Base):
+    """
+    ORM model representing a delivery basis (dictionary dimension).
+    """
+    __tablename__ = 'bases'
+
+    id = Column(SmallInteger, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"<Basis(id={self.id}, name={self.name})>"
+
+class Trade(Base):
+    """
+    ORM model representing a trade record.
+
+    Volumes and ruble amounts are exact integers, prices are fixed-point
+    numerics; instrument and basis are ids of the dimension tables.
+    Measures are nullable: bulletin cells may be empty. Instruments
+    without trades (marked with "-") are dropped by common.cleaning.
+
+    The table is range-partitioned by month on trade_date (partitions are
+    created by init_db and by the loaders), so the primary key and the
+    natural key both include trade_date. The parent's indexes - BRIN on
+    trade_date and (instrument_id, trade_date) - exist on every partition.
+    """
+    __tablename__ = 'trades'
+    __table_args__ = (
+        PrimaryKeyConstraint('id', 'trade_date', name='pk_trades'),
+        UniqueConstraint('trade_date', 'instrument_id', 'basis_id', name='uq_trades_natural_key'),
+        Index('ix_trades_trade_date_brin', 'trade_date', postgresql_using='brin'),
+        Index('ix_trades_instrument_id_trade_date', 'instrument_id', 'trade_date'),
+        {'postgresql_partition_by': 'RANGE (trade_date)'},
+    )
+
+    id = Column(BigInteger, autoincrement=True)
+    trade_date = Column(Date, nullable=False)
+    instrument_id = Column(Integer, ForeignKey('instruments.id'), nullable=False)
+    basis_id = Column(SmallInteger, ForeignKey('bases.id'), nullable=False)
+    volume = Column(BigInteger)
+    value_contracts = Column(BigInteger)
+    price_change = Column(Numeric(14, 2))
+    price = Column(Numeric(14, 2))
+    max_price = Column(Numeric(14, 2))
+    price_in_quotes = Column(Numeric(14, 2))
+    contracts_count = Column(Integer)
+
+    def __repr__(self):
+        return (f"<Trade(id={self.id}, trade_date={self.trade_date}, instrument_id={self.instrument_id}, "
+                f"basis_id={self.basis_id}, volume={self.volume}, price={self.price})>")
+
+class DailyAggregate(Base):
+    """
+    ORM model holding daily per-instrument aggregates of trades.
+
+    Rows are derived from trades with contracts (all bases of the
+    instrument together). The loaders refresh the dates they load in the
+    same transaction, so the table never lags behind trades.
+    """
+    __tablename__ = 'daily_aggregates'
+    __table_args__ = (
+        Index('ix_daily_aggregates_instrument_id_trade_date', 'instrument_id', 'trade_date'),
+    )
+
+    trade_date = Column(Date, primary_key=True)
+    instrument_id = Column(Integer, ForeignKey('instruments.id'), primary_key=True)
+    total_volume = Column(BigInteger)
+    total_value = Column(BigInteger)
+    vwap = Column(Numeric(14, 2))
+    contracts_count = Column(Integer)
+    min_price = Column(Numeric(14, 2))
+    max_price = Column(Numeric(14, 2))
+
+    def __repr__(self):
+        return (f"<DailyAggregate(trade_date={self.trade_date}, instrument_id={self.instrument_id}, "
+                f"total_volume={self.total_volume}, vwap={self.vwap})>")
+
+class IngestState(Base):
+    """
+    ORM model recording a bulletin that has already been loaded.
+
+    Serves as the incremental ingest watermark: a bulletin URL present here is
+    not downloaded again, and the maximum trade_date is the latest loaded day.
+    """
+    __tablename__ = 'ingest_state'
+
+    url = Column(String, primary_key=True)
+    trade_date = Column(Date, nullable=False, index=True)
+    content_hash = Column(String(64), nullable=False, index=True)
+    rows_count = Column(Integer, nullable=False)
+    loaded_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<IngestState(url={self.url}, trade_date={self.trade_date}, rows_count={self.rows_count})>"
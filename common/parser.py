@@ -0,0 +1,137 @@
+import io
+import pandas as pd
+
+from common.batch import TradeBatch
+from common.cleaning import clean_frame, format_rejected
+from common.excel import TRADE_DATE_MARKER, match_header, normalize_header, parse_trade_date, read_bulletin_table
+
+# Маппинг заголовков
+RENAME_MAPPING = {
+    "Код\nИнструмента": "instrument_code",
+    "Наименование\nИнструмента": "instrument_name",
+    "Базис\nпоставки": "basis",
+    "Объем\nДоговоров\nв единицах\nизмерения": "volume",
+    "Обьем\nДоговоров,\nруб.": "value_contracts",
+    "Изменение рыночной\nцены к цене\nпредыдуего дня": "price_change",
+    "Цена (за единицу измерения), руб.": "price",
+    "Цена в Заявках (за единицу\nизмерения)": "price_in_quotes",
+    "Количество\nДоговоров,\nшт.": "contracts_count"
+}
+
+# Маппинг подзаголовков объединенных ячеек (строка под заголовками). Столбец
+# "Минимальная" стоит под самим заголовком "Цена" и попадает в price
+SUBHEADER_MAPPING = {
+    "Максимальная": "max_price",
+}
+
+# Режимы парсинга: однопроходный (по умолчанию) и исходный двухпроходный через pandas
+PARSE_MODES = ("single_pass", "pandas")
+
+def parse_data(file_content: bytes, mode: str = "single_pass") -> TradeBatch:
+    """
+    Парсит данные из содержимого Excel-файла.
+
+    В режиме "single_pass" лист читается один раз: в том же проходе
+    находятся дата торгов и строка заголовков (по тексту заголовков, а не
+    по фиксированному номеру строки), и извлекаются только нужные столбцы.
+    Режим "pandas" - исходная реализация с двумя чтениями листа (строка
+    заголовков ищется по тексту при первом чтении).
+
+    В обоих режимах таблица очищается (common.cleaning.clean_frame):
+    строки разделов и итогов, инструменты без сделок и повторы не
+    попадают в пачку, а их число по причинам сохраняется в TradeBatch.rejected.
+    Файл, в котором после очистки не осталось строк сделок, считается
+    ошибкой разбора: иначе он был бы отмечен как загруженный и больше не
+    запрашивался бы.
+    
+    Args:
+        file_content (bytes): Содержимое Excel-файла.
+        mode (str): Режим парсинга: "single_pass" или "pandas".
+        
+    Returns:
+        TradeBatch: Колоночная пачка данных торгов (дата торгов - скаляр).
+
+    Raises:
+        ValueError: В файле не найдены строка заголовков таблицы или дата
+            торгов, или после очистки не осталось строк сделок.
+    """
+    if mode not in PARSE_MODES:
+        raise ValueError(f"Неизвестный режим парсинга: {mode}. Допустимые: {', '.join(PARSE_MODES)}")
+
+    if isinstance(file_content, bytes):
+        if mode == "pandas":
+            batch = _parse_data_pandas(file_content)
+        else:
+            batch = _parse_data_single_pass(file_content)
+        if len(batch) == 0:
+            raise ValueError(f"В бюллетене нет строк сделок (отброшено строк: {format_rejected(batch.rejected)})")
+        return batch
+    
+    else:
+        raise TypeError("Неподдерживаемый тип file_content. Ожидается bytes.")
+
+def _parse_data_single_pass(file_content: bytes) -> TradeBatch:
+    trade_date, columns = read_bulletin_table(file_content, RENAME_MAPPING, SUBHEADER_MAPPING)
+
+    # Числовые столбцы приводятся к float64 при очистке
+    df, rejected = clean_frame(pd.DataFrame(columns))
+    return TradeBatch.from_frame(df, trade_date, rejected)
+
+def _parse_data_pandas(file_content: bytes) -> TradeBatch:
+    # Создаем объект ExcelFile из бинарных данных
+    excel_file = pd.ExcelFile(io.BytesIO(file_content))
+    # Предполагаем, что данные находятся на первом листе
+    sheet_name = excel_file.sheet_names[0]
+    
+    # Считываем весь лист без заголовка для поиска метаданных
+    df_full = pd.read_excel(excel_file, sheet_name=sheet_name, header=None)
+    
+    # Ищем ячейку с датой торгов
+    date_cell = None
+    for row in df_full.itertuples(index=False):
+        date_cell = next((cell for cell in row if isinstance(cell, str) and TRADE_DATE_MARKER in cell), None)
+        if date_cell is not None:
+            break
+    if date_cell is None:
+        raise ValueError(f"Не найдена дата торгов (ячейка \"{TRADE_DATE_MARKER} ДД.ММ.ГГГГ\") над таблицей")
+    trade_date = parse_trade_date(date_cell)
+    if trade_date is None:
+        raise ValueError(f"Не удалось разобрать дату торгов в ячейке \"{date_cell}\"")
+
+    # Ищем строку заголовков по тексту: ее номер зависит от числа строк над таблицей
+    wanted = {normalize_header(title): name for title, name in RENAME_MAPPING.items()}
+    header_row = None
+    for index, row in enumerate(df_full.itertuples(index=False)):
+        if match_header(row, wanted) is not None:
+            header_row = index
+            break
+    if header_row is None:
+        raise ValueError("Не найдена строка заголовков таблицы бюллетеня")
+
+    # Считываем таблицу с заголовками
+    df_table = pd.read_excel(excel_file, sheet_name=sheet_name, header=header_row)
+
+    # Столбцы под объединенными заголовками называются по строке подзаголовков
+    if header_row + 1 < len(df_full):
+        titles = list(df_table.columns)
+        subheaders = {normalize_header(title): name for title, name in SUBHEADER_MAPPING.items()}
+        for name, index in match_header(df_full.iloc[header_row + 1].tolist(), subheaders, 1) or []:
+            if index < len(titles):
+                titles[index] = name
+        df_table.columns = titles
+    
+    # Удаляем столбцы без имени
+    df_table = df_table.loc[:, ~df_table.columns.astype(str).str.contains('Unnamed')]
+    
+    # Маппинг заголовков (без учета переносов строк и повторных пробелов)
+    df_table.rename(columns=lambda title: wanted.get(normalize_header(title), title), inplace=True)
+    
+    # Приводим числовые столбцы к правильному типу
+    if "volume" in df_table.columns:
+        df_table["volume"] = pd.to_numeric(df_table["volume"], errors='coerce')
+    
+    if "price" in df_table.columns:
+        df_table["price"] = pd.to_numeric(df_table["price"], errors='coerce')
+    
+    df_table, rejected = clean_frame(df_table)
+    return TradeBatch.from_frame(df_table, trade_date, rejected)
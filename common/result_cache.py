@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+# Сколько результатов запросов хранить и сколько секунд они считаются свежими
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_TTL = 300
+
+class ResultCache:
+    """
+    Кэш результатов запросов в памяти процесса с вытеснением LRU и
+    временем жизни записей (TTL).
+
+    Загрузчики сбрасывают кэш после фиксации новых сделок. Сброс
+    увеличивает номер поколения: результат запроса, начатого до сброса,
+    не сохраняется, чтобы в кэш не попали данные, прочитанные до загрузки.
+    Записи других процессов кэш не видит - для них свежесть ограничена TTL.
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Ищет результат в кэше.
+
+        Returns:
+            Tuple[bool, Any]: (найден ли свежий результат, результат)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        Сохраняет результат, вытесняя давно не использованные записи.
+
+        Args:
+            key (Hashable): Ключ запроса
+            value (Any): Результат (не должен изменяться после сохранения)
+            generation (int): Поколение на момент начала запроса; если с тех
+                пор кэш сбрасывался, результат не сохраняется
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """
+        Сбрасывает все результаты (вызывается после загрузки новых данных).
+        """
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+# Кэш запросов процесса: заполняется async_app.queries, сбрасывается загрузчиками
+query_cache = ResultCache()
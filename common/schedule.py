@@ -0,0 +1,91 @@
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Tuple
+
+# Московское время (без перехода на летнее время с 2014 года)
+MOSCOW_TZ = timezone(timedelta(hours=3), "MSK")
+
+# Окно публикации бюллетеня по итогам торгов (московское время)
+PUBLICATION_START = time(14, 0)
+PUBLICATION_END = time(20, 0)
+
+# Интервал опроса индекса в окне публикации, пока бюллетень дня не загружен, сек
+POLL_INTERVAL = 10.0
+
+# Интервал опроса вне окна и после загрузки бюллетеня дня (переизданные файлы), сек
+IDLE_POLL_INTERVAL = 30 * 60.0
+
+# Торговые дни недели (0 - понедельник)
+TRADING_WEEKDAYS = (0, 1, 2, 3, 4)
+
+def moscow_now() -> datetime:
+    """
+    Текущее московское время (с часовым поясом).
+    """
+    return datetime.now(MOSCOW_TZ)
+
+@dataclass(frozen=True)
+class TradingSchedule:
+    """
+    Расписание опроса индекса результатов торгов.
+
+    В торговый день в окне публикации [window_start, window_end) индекс
+    опрашивается каждые poll_interval секунд, пока бюллетень дня не
+    загружен. В остальное время - раз в idle_interval секунд (чтобы
+    подхватить переизданные файлы), но не позже начала следующего окна.
+    Праздники не учитываются: в праздник окно проходит без бюллетеня,
+    и опрос просто возвращается к редкому.
+    """
+    window_start: time = PUBLICATION_START
+    window_end: time = PUBLICATION_END
+    poll_interval: float = POLL_INTERVAL
+    idle_interval: float = IDLE_POLL_INTERVAL
+    trading_weekdays: Tuple[int, ...] = TRADING_WEEKDAYS
+
+    def __post_init__(self):
+        if self.window_start >= self.window_end:
+            raise ValueError("Начало окна публикации должно быть раньше его конца")
+        if self.poll_interval <= 0 or self.idle_interval <= 0:
+            raise ValueError("Интервалы опроса должны быть положительными")
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() in self.trading_weekdays
+
+    def in_window(self, now: datetime) -> bool:
+        """
+        Находится ли момент now (московское время) в окне публикации торгового дня.
+        """
+        return self.is_trading_day(now.date()) and self.window_start <= now.time() < self.window_end
+
+    def next_window_start(self, now: datetime) -> datetime:
+        """
+        Начало ближайшего окна публикации позже момента now.
+        """
+        day = now.date()
+        while True:
+            start = datetime.combine(day, self.window_start, tzinfo=now.tzinfo)
+            if start > now and self.is_trading_day(day):
+                return start
+            day += timedelta(days=1)
+
+    def next_poll_delay(self, now: datetime, published: bool) -> float:
+        """
+        Пауза до следующего опроса индекса.
+
+        Args:
+            now (datetime): Текущее московское время
+            published (bool): Бюллетень торгового дня now уже загружен
+
+        Returns:
+            float: Пауза в секундах
+        """
+        if self.in_window(now) and not published:
+            return self.poll_interval
+        until_window = (self.next_window_start(now) - now).total_seconds()
+        return max(0.0, min(self.idle_interval, until_window))
+
+def parse_clock(value: str) -> time:
+    """
+    Разбирает время в формате ЧЧ:ММ (для параметров командной строки).
+    """
+    return datetime.strptime(value, "%H:%M").time()
@@ -0,0 +1,172 @@
+from datetime import date
+from typing import Iterable, List
+
+from sqlalchemy import text
+
+from common.loading import TRADE_COLUMNS, TRADE_KEY, rebuild_aggregates
+from common.models import Base, DailyAggregate, Trade
+from common.sql import (
+    PARTITION_LOCK_KEY, create_partition_sql, detach_partition_sql, list_partitions_sql, month_start,
+    next_month, partition_month, table_kind_sql,
+)
+
+# На сколько месяцев вперед init_db создает секции trades
+FUTURE_PARTITIONS = 2
+
+# Под этим именем сохраняется несекционированная таблица trades предыдущих версий
+LEGACY_TRADES_TABLE = "trades_unpartitioned"
+
+# Столбцы trades, добавленные после создания секционированной таблицы: create_all
+# не меняет существующие таблицы, поэтому init_db добавляет их сам
+ADDED_TRADE_COLUMNS = (
+    ("max_price", "NUMERIC(14, 2)"),
+)
+
+# Агрегаты, которые прежние версии считали неверно (max_price - как max(price)):
+# при добавлении max_price в trades они обнуляются до повторной загрузки бюллетеней
+STALE_AGGREGATE_COLUMNS = ("max_price",)
+
+# Функции этого модуля принимают синхронное соединение SQLAlchemy: синхронная
+# версия вызывает их напрямую, асинхронная - через AsyncConnection.run_sync
+
+def create_partitions(conn, months: Iterable[date]) -> None:
+    """
+    Создает недостающие месячные секции trades (под рекомендательной блокировкой).
+
+    Args:
+        conn (Connection): Соединение в открытой транзакции
+        months (Iterable[date]): Даты месяцев, для которых нужны секции
+    """
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    for month in sorted({month_start(month) for month in months}):
+        conn.execute(text(create_partition_sql(Trade.__tablename__, month)))
+
+def _rename_legacy_trades(conn) -> None:
+    """
+    Переименовывает несекционированную таблицу trades в LEGACY_TRADES_TABLE
+    вместе с ее индексами, ограничениями и последовательностью id, чтобы
+    их имена не мешали создать новую таблицу.
+    """
+    table = Trade.__tablename__
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {LEGACY_TRADES_TABLE}"))
+    parameters = {"table": LEGACY_TRADES_TABLE}
+    constraints = conn.execute(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype IN ('p', 'u')"
+    ), parameters).scalars().all()
+    for name in constraints:
+        conn.execute(text(f"ALTER TABLE {LEGACY_TRADES_TABLE} RENAME CONSTRAINT {name} "
+                          f"TO {name.replace(table, LEGACY_TRADES_TABLE, 1)}"))
+    indexes = conn.execute(text(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = CAST(:table AS regclass) "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid)"
+    ), parameters).scalars().all()
+    for name in indexes:
+        conn.execute(text(f"ALTER INDEX {name} RENAME TO {name.replace(table, LEGACY_TRADES_TABLE, 1)}"))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), parameters).scalar()
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {LEGACY_TRADES_TABLE}_id_seq"))
+
+def _copy_legacy_trades(conn) -> int:
+    """
+    Копирует сделки из LEGACY_TRADES_TABLE в секционированную trades
+    (столбцы, которых в старой таблице нет, остаются пустыми).
+
+    Returns:
+        int: Число скопированных строк (-1, если у старой таблицы нет
+        естественного ключа сделки и строки не копировались)
+    """
+    legacy_columns = set(conn.execute(text(
+        "SELECT attname FROM pg_attribute WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped"
+    ), {"table": LEGACY_TRADES_TABLE}).scalars())
+    if not set(TRADE_KEY) <= legacy_columns:
+        return -1
+    months = conn.execute(text(
+        f"SELECT DISTINCT CAST(date_trunc('month', trade_date) AS date) FROM {LEGACY_TRADES_TABLE}"
+    )).scalars().all()
+    create_partitions(conn, months)
+    columns = ", ".join(column for column in TRADE_COLUMNS if column in legacy_columns)
+    copied = conn.execute(text(
+        f"INSERT INTO {Trade.__tablename__} ({columns}) SELECT {columns} FROM {LEGACY_TRADES_TABLE} "
+        f"ON CONFLICT ({', '.join(TRADE_KEY)}) DO NOTHING"
+    )).rowcount
+    if copied:
+        rebuild_aggregates(conn)
+    return copied
+
+def _add_trade_columns(conn) -> None:
+    """
+    Добавляет в существующую таблицу trades столбцы из ADDED_TRADE_COLUMNS.
+
+    Если столбцы действительно добавлены (таблица создана прежней версией),
+    агрегаты из STALE_AGGREGATE_COLUMNS обнуляются: они посчитаны прежней
+    формулой, а значения столбцов у загруженных сделок пусты.
+    """
+    existing = set(conn.execute(text(
+        "SELECT attname FROM pg_attribute WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped"
+    ), {"table": Trade.__tablename__}).scalars())
+    added = [(column, column_type) for column, column_type in ADDED_TRADE_COLUMNS if column not in existing]
+    for column, column_type in added:
+        conn.execute(text(f"ALTER TABLE {Trade.__tablename__} ADD COLUMN {column} {column_type}"))
+    if added:
+        assignments = ", ".join(f"{column} = NULL" for column in STALE_AGGREGATE_COLUMNS)
+        conn.execute(text(f"UPDATE {DailyAggregate.__tablename__} SET {assignments}"))
+        print(f"В trades добавлены столбцы: {', '.join(column for column, _ in added)}; "
+              f"загрузите бюллетени заново, чтобы заполнить их")
+
+def init_schema(conn) -> None:
+    """
+    Создает таблицы приложения.
+
+    Таблица trades создается секционированной по месяцам торгов; секции
+    текущего и FUTURE_PARTITIONS следующих месяцев создаются сразу,
+    секции прошлых месяцев - загрузчиками по мере появления данных.
+
+    Несекционированная таблица trades предыдущих версий не удаляется:
+    она переименовывается в LEGACY_TRADES_TABLE, ее строки копируются в
+    новую таблицу (INSERT ... SELECT в этой же транзакции), а дневные
+    агрегаты пересчитываются. Старую таблицу можно удалить после проверки.
+
+    Args:
+        conn (Connection): Соединение в открытой транзакции
+    """
+    # Миграцию и создание таблиц параллельные процессы выполняют по очереди
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    legacy = conn.execute(text(table_kind_sql(Trade.__tablename__))).scalar() == "r"
+    if legacy:
+        _rename_legacy_trades(conn)
+    Base.metadata.create_all(bind=conn)
+    _add_trade_columns(conn)
+    months = [month_start(date.today())]
+    for _ in range(FUTURE_PARTITIONS):
+        months.append(next_month(months[-1]))
+    create_partitions(conn, months)
+    if legacy:
+        copied = _copy_legacy_trades(conn)
+        if copied < 0:
+            print(f"Таблица trades предыдущей версии другой структуры сохранена как {LEGACY_TRADES_TABLE}; "
+                  f"сделки нужно загрузить заново")
+        else:
+            print(f"Таблица trades преобразована в секционированную: скопировано строк {copied}, "
+                  f"прежняя таблица сохранена как {LEGACY_TRADES_TABLE} (удалите ее после проверки)")
+
+def detach_partitions(conn, before: date) -> List[str]:
+    """
+    Отсоединяет от trades секции месяцев раньше заданной даты.
+
+    Args:
+        conn (Connection): Соединение в открытой транзакции
+        before (date): Секции месяцев, закончившихся не позже этой даты, отсоединяются
+
+    Returns:
+        List[str]: Имена отсоединенных секций
+    """
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    detached = []
+    names = conn.execute(text(list_partitions_sql(Trade.__tablename__))).scalars().all()
+    for name in names:
+        month = partition_month(Trade.__tablename__, name)
+        if month is not None and next_month(month) <= before:
+            conn.execute(text(detach_partition_sql(Trade.__tablename__, name)))
+            detached.append(name)
+    return detached
@@ -0,0 +1,93 @@
+import hashlib
+import tempfile
+from typing import NamedTuple
+
+# Сколько байт тела ответа держать в памяти, прежде чем сбросить его во временный файл
+SPOOL_MAX_BYTES = 256 * 1024
+
+# Размер порции при потоковом чтении тела ответа, байт
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+# Оценка памяти на разбор одного файла (содержимое, книга openpyxl/xlrd, строки), байт
+FILE_MEMORY_ESTIMATE = 16 * 1024 * 1024
+
+# Оценка памяти на одну строку пачки загрузки (TradeBatch и записи для COPY), байт
+ROW_MEMORY_ESTIMATE = 1024
+
+# Нижняя граница размера пачки загрузки, строк
+MIN_BATCH_ROWS = 1000
+
+class SpooledBody:
+    """
+    Тело HTTP-ответа, записываемое порциями во временный файл
+    (SpooledTemporaryFile: первые max_size байт хранятся в памяти,
+    остальное - на диске). Хэш SHA-256 и размер вычисляются по мере записи.
+    """
+
+    def __init__(self, max_size: int = SPOOL_MAX_BYTES):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+        self.size += len(chunk)
+        self._sha256.update(chunk)
+
+    @property
+    def digest(self) -> str:
+        return self._sha256.hexdigest()
+
+    def rewind(self):
+        """
+        Возвращает файл, установленный на начало (для копирования в кэш).
+        """
+        self.file.seek(0)
+        return self.file
+
+    def read(self) -> bytes:
+        """
+        Читает тело целиком (для разбора файла).
+        """
+        return self.rewind().read()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "SpooledBody":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class MemoryPlan(NamedTuple):
+    """
+    Параметры режима с ограничением памяти.
+    """
+    spool_max_bytes: int   # Байт тела ответа в памяти до сброса на диск
+    files_in_flight: int   # Файлов, одновременно ожидающих разбора или разбираемых
+    batch_rows: int        # Максимум строк в одной транзакции загрузки
+
+def memory_plan(max_memory_mb: int) -> MemoryPlan:
+    """
+    Распределяет потолок памяти между стадиями: половина - на файлы в
+    разборе, четверть - на пачку загрузки, остальное - запас.
+
+    Потолок относится к данным сверх базового размера процесса
+    (интерпретатор, pandas, SQLAlchemy) и соблюдается приблизительно:
+    ограничивается число файлов и строк, одновременно находящихся в памяти.
+
+    Args:
+        max_memory_mb (int): Потолок памяти на данные, МБ
+
+    Returns:
+        MemoryPlan: Параметры конвейера
+    """
+    if max_memory_mb <= 0:
+        raise ValueError("Потолок памяти должен быть положительным")
+    budget = max_memory_mb * 1024 * 1024
+    return MemoryPlan(
+        spool_max_bytes=SPOOL_MAX_BYTES,
+        files_in_flight=max(1, budget // 2 // FILE_MEMORY_ESTIMATE),
+        batch_rows=max(MIN_BATCH_ROWS, budget // 4 // ROW_MEMORY_ESTIMATE),
+    )
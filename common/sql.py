@@ -0,0 +1,187 @@
+import re
+from datetime import date
+from typing import Optional, Sequence
+
+# Ключ рекомендательной блокировки, под которой создаются секции:
+# параллельные загрузчики не пытаются создать одну секцию одновременно
+PARTITION_LOCK_KEY = 7_420_001
+
+def create_staging_table_sql(table: str, staging: str, columns: Sequence[str]) -> str:
+    """
+    SQL создания промежуточной таблицы для загрузки через слияние.
+
+    Таблица временная: она видна только своему соединению (параллельные
+    загрузчики не мешают друг другу), не пишется в WAL и очищается при
+    каждом COMMIT, а создается один раз на соединение пула.
+
+    Args:
+        table (str): Целевая таблица
+        staging (str): Имя промежуточной таблицы
+        columns (Sequence[str]): Загружаемые столбцы
+
+    Returns:
+        str: SQL-команда
+    """
+    return (
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS AS "
+        f"SELECT {', '.join(columns)} FROM {table} WITH NO DATA"
+    )
+
+def merge_from_staging_sql(table: str, staging: str, columns: Sequence[str], key: Sequence[str]) -> str:
+    """
+    SQL слияния промежуточной таблицы с целевой одним оператором
+    INSERT ... ON CONFLICT DO UPDATE.
+
+    Повторы ключа внутри промежуточной таблицы схлопываются через
+    DISTINCT ON, иначе ON CONFLICT не сможет обновить одну строку дважды.
+
+    Args:
+        table (str): Целевая таблица
+        staging (str): Промежуточная таблица
+        columns (Sequence[str]): Загружаемые столбцы
+        key (Sequence[str]): Столбцы естественного ключа (уникального ограничения)
+
+    Returns:
+        str: SQL-команда
+    """
+    column_list = ", ".join(columns)
+    key_list = ", ".join(key)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column not in key)
+    return (
+        f"INSERT INTO {table} ({column_list}) "
+        f"SELECT DISTINCT ON ({key_list}) {column_list} FROM {staging} ORDER BY {key_list} "
+        f"ON CONFLICT ({key_list}) DO UPDATE SET {updates}"
+    )
+
+def month_start(value: date) -> date:
+    """
+    Возвращает первое число месяца, к которому относится дата.
+    """
+    return date(value.year, value.month, 1)
+
+def next_month(value: date) -> date:
+    """
+    Возвращает первое число следующего месяца.
+    """
+    if value.month == 12:
+        return date(value.year + 1, 1, 1)
+    return date(value.year, value.month + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    """
+    Имя месячной секции таблицы, например trades_2024_01.
+    """
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+def partition_month(table: str, name: str) -> Optional[date]:
+    """
+    Месяц секции по ее имени (None, если имя не соответствует partition_name).
+    """
+    match = re.fullmatch(rf"{re.escape(table)}_(\d{{4}})_(\d{{2}})", name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+def create_partition_sql(table: str, month: date) -> str:
+    """
+    SQL создания месячной секции таблицы, секционированной по диапазону дат.
+
+    Индексы родительской таблицы (BRIN по дате, составной по инструменту и
+    дате) PostgreSQL создает в новой секции автоматически.
+
+    Args:
+        table (str): Секционированная таблица
+        month (date): Любая дата месяца секции
+
+    Returns:
+        str: SQL-команда
+    """
+    start = month_start(month)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_month(start).isoformat()}')"
+    )
+
+def list_partitions_sql(table: str) -> str:
+    """
+    SQL получения имен секций таблицы.
+    """
+    return (
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        f"WHERE i.inhparent = '{table}'::regclass ORDER BY c.relname"
+    )
+
+def detach_partition_sql(table: str, name: str) -> str:
+    """
+    SQL отсоединения секции: меняются только метаданные, данные остаются
+    в отдельной таблице, которую можно архивировать или удалить.
+    """
+    return f"ALTER TABLE {table} DETACH PARTITION {name}"
+
+def table_kind_sql(table: str) -> str:
+    """
+    SQL получения вида таблицы (relkind): 'p' - секционированная,
+    'r' - обычная, NULL - таблицы нет.
+    """
+    return f"SELECT relkind FROM pg_class WHERE oid = to_regclass('{table}')"
+
+# Столбцы дневных агрегатов и выражения, которыми они считаются по trades.
+# Учитываются только строки со сделками (в бюллетене есть и инструменты без них)
+DAILY_AGGREGATE_EXPRESSIONS = (
+    ("trade_date", "trade_date"),
+    ("instrument_id", "instrument_id"),
+    ("total_volume", "sum(volume)"),
+    ("total_value", "sum(value_contracts)"),
+    ("vwap", "round(sum(value_contracts)::numeric / nullif(sum(volume), 0), 2)"),
+    ("contracts_count", "sum(contracts_count)"),
+    ("min_price", "min(price)"),
+    ("max_price", "max(max_price)"),
+)
+
+def _daily_aggregates_select(source: str, dates_filter: bool) -> str:
+    expressions = ", ".join(expression for _, expression in DAILY_AGGREGATE_EXPRESSIONS)
+    where = "contracts_count > 0"
+    if dates_filter:
+        where += " AND trade_date = ANY(:dates)"
+    return f"SELECT {expressions} FROM {source} WHERE {where} GROUP BY trade_date, instrument_id"
+
+def refresh_daily_aggregates_sql(table: str, source: str) -> str:
+    """
+    SQL пересчета дневных агрегатов за даты из параметра :dates (список дат).
+
+    Агрегаты пересчитываются из source и записываются через
+    INSERT ... ON CONFLICT DO UPDATE, поэтому параллельные загрузки одной
+    даты не конфликтуют. Строки инструментов, у которых за дату не
+    осталось сделок, удаляет delete_stale_daily_aggregates_sql.
+
+    Args:
+        table (str): Таблица агрегатов
+        source (str): Таблица сделок
+
+    Returns:
+        str: SQL-команда
+    """
+    columns = [column for column, _ in DAILY_AGGREGATE_EXPRESSIONS]
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns[2:])
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) {_daily_aggregates_select(source, True)} "
+        f"ON CONFLICT (trade_date, instrument_id) DO UPDATE SET {updates}"
+    )
+
+def delete_stale_daily_aggregates_sql(table: str, source: str) -> str:
+    """
+    SQL удаления агрегатов за даты из :dates, для которых в source больше
+    нет сделок инструмента.
+    """
+    return (
+        f"DELETE FROM {table} a WHERE a.trade_date = ANY(:dates) AND NOT EXISTS ("
+        f"SELECT 1 FROM {source} t WHERE t.trade_date = a.trade_date "
+        f"AND t.instrument_id = a.instrument_id AND t.contracts_count > 0)"
+    )
+
+def rebuild_daily_aggregates_sql(table: str, source: str) -> str:
+    """
+    SQL заполнения пустой таблицы агрегатов по всей истории сделок.
+    """
+    columns = ", ".join(column for column, _ in DAILY_AGGREGATE_EXPRESSIONS)
+    return f"INSERT INTO {table} ({columns}) {_daily_aggregates_select(source, False)}"
@@ -0,0 +1,280 @@
+"""
+Служба загрузки новых бюллетеней.
+
+В отличие от запуска main.py по расписанию cron, служба работает
+постоянно: HTTP-сессия, пул соединений с БД и процессы-парсеры
+создаются один раз и остаются прогретыми между опросами. Индекс
+результатов торгов опрашивается по расписанию торговых дней
+(common.schedule): в окне публикации бюллетеня - каждые несколько секунд,
+пока бюллетень дня не загружен, в остальное время - редко. Новый
+бюллетень скачивается, разбирается и записывается в БД обычным
+конвейером async_app.pipeline сразу после появления в индексе. Раз в
+REVALIDATE_INTERVAL секунд уже загруженные файлы за LOOKBACK_DAYS
+перепроверяются условным запросом (ETag/Last-Modified из кэша бюллетеней),
+и переизданные под прежним URL загружаются заново.
+
+Состояние службы доступно по HTTP на локальном адресе:
+    /health  - JSON с итогами опросов (503, если опросы подряд завершаются ошибкой)
+    /metrics - метрики в текстовом формате Prometheus
+
+Пример:
+    python daemon.py --port 9108 --archive archive/
+"""
+import asyncio
+import signal
+import time
+from concurrent.futures import Executor
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from async_app import database
+from async_app.database import init_db
+from async_app.db_loader import LOAD_METHOD, get_loaded_bulletins
+from async_app.downloader import discover_links, open_scheduler
+from async_app.pipeline import create_parse_pool, run_pipeline, warm_up_pool
+from common import db_settings
+from common.archive import ARCHIVE_DIR, BulletinArchive
+from common.cleaning import format_rejected
+from common.index import file_date_from_url
+from common.metrics import metrics
+from common.schedule import (
+    IDLE_POLL_INTERVAL, POLL_INTERVAL, PUBLICATION_END, PUBLICATION_START, TradingSchedule, moscow_now,
+    parse_clock,
+)
+
+# Адрес HTTP-сервера состояния (только локальный интерфейс)
+HEALTH_HOST = "127.0.0.1"
+HEALTH_PORT = 9108
+
+# Процессов-парсеров: за опрос обычно приходит один бюллетень
+DAEMON_PARSE_WORKERS = 1
+
+# За сколько дней назад искать ссылки в индексе (догрузка после простоя и переизданные файлы)
+LOOKBACK_DAYS = 7
+
+# После стольких неудачных опросов подряд /health отвечает 503
+MAX_FAILED_POLLS = 3
+
+# Как часто перепроверять уже загруженные файлы (переизданные под прежним URL), сек
+REVALIDATE_INTERVAL = IDLE_POLL_INTERVAL
+
+def latest_trade_date(known: Dict[str, str]) -> Optional[date]:
+    """
+    Последняя дата торгов среди загруженных бюллетеней.
+
+    Args:
+        known (Dict[str, str]): Загруженные бюллетени {URL: хэш}
+
+    Returns:
+        date: Дата торгов или None, если бюллетеней нет
+    """
+    dates = [file_date.date() for file_date in map(file_date_from_url, known) if file_date is not None]
+    return max(dates, default=None)
+
+class IngestDaemon:
+    """
+    Служба загрузки: держит прогретые ресурсы и опрашивает индекс по расписанию.
+
+    Итоги опросов хранятся в state и отдаются обработчиком /health.
+    """
+
+    def __init__(self, schedule: TradingSchedule, load_method: str = LOAD_METHOD,
+                 parse_workers: int = DAEMON_PARSE_WORKERS, archive: Optional[BulletinArchive] = None,
+                 lookback_days: int = LOOKBACK_DAYS, revalidate_interval: float = REVALIDATE_INTERVAL):
+        self.schedule = schedule
+        self.load_method = load_method
+        self.parse_workers = max(0, parse_workers)
+        self.archive = archive
+        self.lookback_days = lookback_days
+        self.revalidate_interval = revalidate_interval
+        # time.monotonic() последней перепроверки загруженных файлов
+        self.revalidated_at: Optional[float] = None
+        self.scheduler = None
+        self.executor: Optional[Executor] = None
+        # Создается в run(): событие должно принадлежать циклу событий службы
+        self.stopping: Optional[asyncio.Event] = None
+        self.state = {
+            "status": "starting",
+            "started_at": moscow_now().isoformat(timespec="seconds"),
+            "polls": 0,
+            "failed_polls": 0,
+            "last_poll_at": None,
+            "last_success_at": None,
+            "last_error": None,
+            "next_poll_at": None,
+            "bulletins_loaded": 0,
+            "records_loaded": 0,
+            "last_ingest_seconds": None,
+            "latest_trade_date": None,
+        }
+
+    async def poll(self) -> bool:
+        """
+        Один опрос: находит в индексе новые бюллетени и загружает их конвейером.
+
+        Returns:
+            bool: Загружен ли бюллетень текущего торгового дня (московское время)
+        """
+        started = time.perf_counter()
+        today = moscow_now().date()
+        known = await get_loaded_bulletins()
+        revalidate = self.revalidate_interval > 0 and (
+            self.revalidated_at is None or time.monotonic() - self.revalidated_at >= self.revalidate_interval)
+        links = await discover_links(self.scheduler, today - timedelta(days=self.lookback_days), today, known,
+                                     revalidate=revalidate)
+        new_links = [link for link in links if link not in known]
+        if new_links:
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} Новых файлов в индексе: {len(new_links)}")
+        if links:
+            stats = await run_pipeline(known=known, links=links, parse_workers=self.parse_workers,
+                                       parse_executor=self.executor, scheduler=self.scheduler,
+                                       load_method=self.load_method, archive=self.archive)
+            elapsed = time.perf_counter() - started
+            metrics.inc("spimex_daemon_bulletins_total", stats.files)
+            self.state["bulletins_loaded"] += stats.files
+            self.state["records_loaded"] += stats.records
+            # Задержка загрузки учитывается, только если бюллетени записаны в БД: опросы,
+            # где все файлы не изменились (304) или не скачались, исказили бы гистограмму
+            if stats.files:
+                metrics.observe("spimex_daemon_ingest_seconds", elapsed)
+                self.state["last_ingest_seconds"] = round(elapsed, 3)
+            # Перепроверка без изменений ничего не загружает: отчет не выводится
+            if new_links or stats.files:
+                print(f"   Загружено файлов: {stats.files}, записей: {stats.records}, "
+                      f"отброшено строк: {format_rejected(stats.rejected)}, за {elapsed:.1f} сек")
+            if stats.downloads.failed or stats.parse_errors:
+                print(f"   Ошибок скачивания: {len(stats.downloads.failed)}, парсинга: {stats.parse_errors} "
+                      f"(файлы будут запрошены при следующем опросе)")
+            known = await get_loaded_bulletins()
+        if revalidate:
+            self.revalidated_at = time.monotonic()
+
+        latest = latest_trade_date(known)
+        self.state["latest_trade_date"] = latest.isoformat() if latest else None
+        return latest is not None and latest >= today
+
+    async def run(self) -> None:
+        """
+        Опрашивает индекс до остановки (stop); ошибка опроса не останавливает службу.
+        """
+        self.stopping = asyncio.Event()
+        await init_db()
+        async with open_scheduler() as scheduler:
+            self.scheduler = scheduler
+            if self.parse_workers > 0:
+                self.executor = create_parse_pool(self.parse_workers)
+                await warm_up_pool(self.executor, self.parse_workers)
+            try:
+                while not self.stopping.is_set():
+                    published = await self._poll_safely()
+                    now = moscow_now()
+                    delay = self.schedule.next_poll_delay(now, published)
+                    self.state["next_poll_at"] = (now + timedelta(seconds=delay)).isoformat(timespec="seconds")
+                    try:
+                        await asyncio.wait_for(self.stopping.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if self.executor is not None:
+                    self.executor.shutdown(wait=True)
+                await database.engine.dispose()
+
+    async def _poll_safely(self) -> bool:
+        self.state["polls"] += 1
+        self.state["last_poll_at"] = moscow_now().isoformat(timespec="seconds")
+        try:
+            published = await self.poll()
+        except Exception as e:
+            self.state["failed_polls"] += 1
+            self.state["last_error"] = f"{type(e).__name__}: {e}"
+            self.state["status"] = "failing" if self.state["failed_polls"] >= MAX_FAILED_POLLS else "degraded"
+            metrics.inc("spimex_daemon_polls_total", result="error")
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} Ошибка опроса: {e}")
+            return False
+        self.state["failed_polls"] = 0
+        self.state["status"] = "ok"
+        self.state["last_success_at"] = moscow_now().isoformat(timespec="seconds")
+        metrics.inc("spimex_daemon_polls_total", result="ok")
+        metrics.set("spimex_daemon_last_success_timestamp_seconds", time.time())
+        return published
+
+    def stop(self) -> None:
+        if self.stopping is not None:
+            self.stopping.set()
+
+    async def handle_health(self, request) -> web.Response:
+        status = 503 if self.state["status"] == "failing" else 200
+        return web.json_response(self.state, status=status)
+
+    async def handle_metrics(self, request) -> web.Response:
+        return web.Response(text=metrics.to_prometheus(), content_type="text/plain", charset="utf-8")
+
+async def serve(daemon: IngestDaemon, host: str = HEALTH_HOST, port: int = HEALTH_PORT) -> None:
+    """
+    Запускает службу и HTTP-сервер состояния до сигнала SIGINT/SIGTERM.
+    """
+    app = web.Application()
+    app.router.add_get("/health", daemon.handle_health)
+    app.router.add_get("/metrics", daemon.handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Состояние службы: http://{host}:{port}/health, метрики: http://{host}:{port}/metrics")
+
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, daemon.stop)
+        except NotImplementedError:
+            # Windows: остановка по KeyboardInterrupt
+            pass
+    try:
+        await daemon.run()
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Служба загрузки новых бюллетеней по расписанию торговых дней')
+    parser.add_argument('--host', default=HEALTH_HOST,
+                      help=f'Адрес HTTP-сервера состояния (по умолчанию: {HEALTH_HOST})')
+    parser.add_argument('--port', type=int, default=HEALTH_PORT,
+                      help=f'Порт HTTP-сервера состояния (по умолчанию: {HEALTH_PORT})')
+    parser.add_argument('--window-start', type=parse_clock, default=PUBLICATION_START, metavar='ЧЧ:ММ',
+                      help=f'Начало окна публикации бюллетеня, МСК (по умолчанию: {PUBLICATION_START:%H:%M})')
+    parser.add_argument('--window-end', type=parse_clock, default=PUBLICATION_END, metavar='ЧЧ:ММ',
+                      help=f'Конец окна публикации бюллетеня, МСК (по умолчанию: {PUBLICATION_END:%H:%M})')
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL,
+                      help=f'Интервал опроса в окне публикации, сек (по умолчанию: {POLL_INTERVAL:g})')
+    parser.add_argument('--idle-interval', type=float, default=IDLE_POLL_INTERVAL,
+                      help=f'Интервал опроса вне окна, сек (по умолчанию: {IDLE_POLL_INTERVAL:g})')
+    parser.add_argument('--lookback-days', type=int, default=LOOKBACK_DAYS,
+                      help=f'За сколько дней искать незагруженные файлы (по умолчанию: {LOOKBACK_DAYS})')
+    parser.add_argument('--revalidate-interval', type=float, default=REVALIDATE_INTERVAL,
+                      help=f'Как часто перепроверять загруженные файлы условным запросом, сек '
+                           f'(0 - не перепроверять; по умолчанию: {REVALIDATE_INTERVAL:g})')
+    parser.add_argument('--parse-workers', type=int, default=DAEMON_PARSE_WORKERS,
+                      help='Число процессов-парсеров (0 - парсить в цикле событий)')
+    parser.add_argument('--load-method', choices=('merge', 'copy', 'insert'), default=LOAD_METHOD,
+                      help='Способ записи в БД (по умолчанию: merge)')
+    parser.add_argument('--archive', default=ARCHIVE_DIR, metavar='DIR',
+                      help='Каталог архива разобранных бюллетеней (по умолчанию: SPIMEX_ARCHIVE_DIR)')
+    db_settings.add_arguments(parser)
+
+    args = parser.parse_args()
+    try:
+        schedule = TradingSchedule(args.window_start, args.window_end, args.poll_interval, args.idle_interval)
+    except ValueError as e:
+        parser.error(str(e))
+    database.configure(db_settings.from_args(args))
+    metrics.enable()
+    daemon = IngestDaemon(schedule, args.load_method, args.parse_workers,
+                          BulletinArchive(args.archive) if args.archive else None, args.lookback_days,
+                          args.revalidate_interval)
+    try:
+        asyncio.run(serve(daemon, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
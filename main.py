@@ -3,31 +3,95 @@ import time
 from datetime import datetime
 
 # Импорт модулей асинхронной версии
-from async_app.downloader import download_files_for_period as async_download_files
-from async_app.parser import parse_data as async_parse_data
-from async_app.db_loader import load_data as async_load_data
-from async_app.database import init_db as async_init_db, engine as async_engine
+from async_app.downloader import print_download_report as async_print_download_report
+from async_app.pipeline import run_pipeline as async_run_pipeline
+from async_app.db_loader import get_loaded_bulletins as async_get_loaded_bulletins
+from async_app import database as async_database
+from async_app.database import init_db as async_init_db
 
 # Импорт модулей синхронной версии
-from sync_app.downloader import download_files_for_period as sync_download_files
-from sync_app.parser import parse_data as sync_parse_data
-from sync_app.db_loader import load_data as sync_load_data
-from sync_app.database import init_db as sync_init_db, engine as sync_engine
+from sync_app.downloader import (
+    download_files_for_period as sync_download_files,
+    iter_files_for_period as sync_iter_files,
+)
+from sync_app.db_loader import (
+    load_bulletin as sync_load_bulletin,
+    load_bulletins as sync_load_bulletins,
+    get_loaded_bulletins as sync_get_loaded_bulletins,
+    rebuild_daily_aggregates as sync_rebuild_daily_aggregates,
+)
+from sync_app.pipeline import run_pipeline as sync_run_pipeline
+from sync_app import database as sync_database
+from sync_app.database import init_db as sync_init_db
+
+from common import db_settings
+from common.archive import ARCHIVE_DIR, BulletinArchive, parse_archived
+from common.cleaning import format_rejected, merge_rejected, record_rejected
+from common.metrics import metrics
+from common.parser import parse_data
+from common.spool import memory_plan
+
+# Способы выполнения (бэкенды) и их названия. Все они используют общие
+# обход индекса, разбор (common.parser), кэш и архив бюллетеней и
+# отличаются только тем, как выполняются стадии
+BACKENDS = {
+    "sync": "Синхронная",                       # Все стадии по очереди в одном потоке
+    "threads": "Потоки",                        # Пулы потоков для скачивания с разбором и для записи в БД
+    "asyncio": "asyncio",                       # Конвейер asyncio, разбор в цикле событий
+    "asyncio+processes": "asyncio+процессы",    # Конвейер asyncio, разбор в пуле процессов
+}
+
+# Бэкенды, которые сравниваются по умолчанию
+DEFAULT_BACKENDS = ("asyncio+processes", "sync")
 
 def format_time(seconds):
     """Форматирует время в удобочитаемый вид"""
     return f"{seconds:.3f}"
 
-async def run_async_version(days=7):
+def open_archive(archive_dir):
+    """Открывает архив разобранных бюллетеней (None - архив не используется)"""
+    return BulletinArchive(archive_dir) if archive_dir else None
+
+def sync_parse(bulletin, archive=None):
+    """
+    Парсит бюллетень синхронной версии (с архивом - только если его нет в
+    архиве), записывая время и число строк в метрики.
+    """
+    with metrics.timer("spimex_parse_seconds", app="sync"):
+        data, archived = parse_archived(parse_data, bulletin, archive)
+    metrics.observe("spimex_parse_rows", len(data), app="sync")
+    if archived:
+        metrics.inc("spimex_archive_hits_total", app="sync")
+    record_rejected(data.rejected, "sync")
+    return data
+
+async def run_async_version(days=7, incremental=False, parse_workers=None, load_method="merge", max_memory=None,
+                            archive_dir=None, revalidate=False):
     """
     Запускает асинхронную версию приложения.
+
+    Скачивание, парсинг и загрузка выполняются потоковым конвейером
+    (async_app.pipeline), поэтому время стадий перекрывается.
+
+    Парсинг выполняется в пуле из parse_workers процессов (по умолчанию -
+    по числу ядер).
+
+    С max_memory (МБ) конвейер работает в режиме с ограничением памяти
+    (см. common.spool.memory_plan).
+
+    С archive_dir разобранные бюллетени сохраняются в архив Parquet
+    (common.archive), а уже архивированные не разбираются повторно.
+
+    В инкрементальном режиме скачиваются, парсятся и загружаются только
+    бюллетени, которых еще нет в таблице ingest_state; с revalidate уже
+    загруженные URL перепроверяются условным запросом.
+
+    Returns:
+        dict: Время стадий в секундах (db_init, download, parse, db_load,
+        total), число файлов (files) и записей (records)
     """
     print(f"\n=== Асинхронная версия (период: {days} дней) ===")
     timings = {}
-    total_records = 0
-    
-    # Отключаем echo для движка базы данных
-    async_engine.echo = False
     
     # Инициализация БД
     print("1. Инициализация базы данных...")
@@ -35,50 +99,104 @@ async def run_async_version(days=7):
     await async_init_db()
     timings['db_init'] = time.perf_counter() - start
 
-    # Скачивание данных
-    print("2. Скачивание данных с сайта...")
-    start = time.perf_counter()
-    files = await async_download_files(days)
-    timings['download'] = time.perf_counter() - start
-    print(f"   Найдено файлов: {len(files)}")
-
-    # Парсинг данных
-    print("3. Парсинг данных...")
-    start = time.perf_counter()
-    all_data = []
-    for date, content in files:
-        data = async_parse_data(content)
-        total_records += len(data)
-        all_data.extend(data)
-    timings['parse'] = time.perf_counter() - start
-
-    # Загрузка в БД
-    print("4. Загрузка данных в базу...")
-    start = time.perf_counter()
-    await async_load_data(all_data)
-    timings['db_load'] = time.perf_counter() - start
+    # Скачивание, парсинг и загрузка конвейером
+    print("2. Скачивание, парсинг и загрузка данных (конвейер)...")
+    known = await async_get_loaded_bulletins() if incremental else None
+    pipeline_options = {} if parse_workers is None else {'parse_workers': parse_workers}
+    if max_memory is not None:
+        pipeline_options['memory'] = memory_plan(max_memory)
+    pipeline_options['archive'] = open_archive(archive_dir)
+    pipeline_options['revalidate'] = revalidate
+    with metrics.stage("pipeline", app="async"):
+        stats = await async_run_pipeline(days, known, load_method=load_method, **pipeline_options)
+    # Соединения пула привязаны к текущему циклу событий: следующий asyncio.run откроет новые
+    await async_database.engine.dispose()
+    async_print_download_report(stats.downloads)
+    timings['download'] = stats.download_time
+    timings['parse'] = stats.parse_time
+    timings['db_load'] = stats.load_time
 
-    total_time = sum(timings.values())
+    timings['pipeline'] = stats.wall_time
+    timings['total'] = timings['db_init'] + stats.wall_time
+    timings['files'] = stats.files
+    timings['records'] = stats.records
     
     print(f"\nРезультаты асинхронной версии:")
     print(f"├── Инициализация БД: {format_time(timings['db_init'])} сек")
     print(f"├── Скачивание файлов: {format_time(timings['download'])} сек")
     print(f"├── Парсинг данных: {format_time(timings['parse'])} сек")
     print(f"├── Загрузка в БД: {format_time(timings['db_load'])} сек")
-    print(f"├── Обработано файлов: {len(files)}")
-    print(f"└── Всего записей: {total_records}")
-    return total_time, len(files), total_records
+    print(f"├── Общее время конвейера: {format_time(timings['pipeline'])} сек")
+    print(f"├── Отброшено строк при очистке: {format_rejected(stats.rejected)}")
+    print(f"├── Обработано файлов: {stats.files}")
+    print(f"└── Всего записей: {stats.records}")
+    return timings
+
+def run_sync_streaming(days, known, load_method, spool_max_bytes, archive=None, revalidate=False):
+    """
+    Обрабатывает бюллетени синхронной версии по одному: файл скачивается
+    во временный файл, парсится и записывается в БД до скачивания
+    следующего. За весь прогон сохраняются только счетчики.
 
-def run_sync_version(days=7):
+    Returns:
+        dict: Суммарное время стадий (download, parse, db_load), число файлов (files), записей (records),
+        ошибок парсинга (parse_errors) и строк, отброшенных при очистке, по причинам (rejected)
     """
-    Запускает синхронную версию приложения.
+    timings = {'download': 0.0, 'parse': 0.0, 'db_load': 0.0, 'files': 0, 'records': 0, 'parse_errors': 0,
+               'rejected': {}}
+    bulletins = sync_iter_files(days, known, spool_max_bytes=spool_max_bytes, workers=1, revalidate=revalidate)
+    while True:
+        start = time.perf_counter()
+        spooled = next(bulletins, None)
+        timings['download'] += time.perf_counter() - start
+        if spooled is None:
+            break
+
+        start = time.perf_counter()
+        bulletin = spooled.materialize()
+        try:
+            data = sync_parse(bulletin, archive)
+        except Exception as e:
+            timings['parse_errors'] += 1
+            metrics.inc("spimex_parse_errors_total", app="sync")
+            print(f"   Ошибка парсинга {bulletin.url}: {e}")
+            continue
+        finally:
+            timings['parse'] += time.perf_counter() - start
+        merge_rejected(timings['rejected'], data.rejected)
+
+        start = time.perf_counter()
+        sync_load_bulletin(bulletin._replace(content=b""), data, load_method)
+        timings['db_load'] += time.perf_counter() - start
+        timings['files'] += 1
+        timings['records'] += len(data)
+    return timings
+
+def run_sync_version(days=7, incremental=False, load_method="merge", max_memory=None, archive_dir=None,
+                     revalidate=False):
+    """
+    Запускает синхронную версию приложения: файлы скачиваются, парсятся
+    и загружаются по одному, в одном потоке и по одному соединению.
+
+    В инкрементальном режиме скачиваются, парсятся и загружаются только
+    бюллетени, которых еще нет в таблице ingest_state; с revalidate уже
+    загруженные URL перепроверяются условным запросом.
+
+    С max_memory (МБ) файлы обрабатываются по одному (run_sync_streaming),
+    и память не зависит от длины периода.
+
+    С archive_dir бюллетени, уже сохраненные в архиве Parquet, не
+    разбираются повторно.
+
+    Returns:
+        dict: Время стадий в секундах (db_init, download, parse, db_load,
+        total), число файлов (files) и записей (records)
     """
     print(f"\n=== Синхронная версия (период: {days} дней) ===")
     timings = {}
     total_records = 0
-    
-    # Отключаем echo для движка базы данных
-    sync_engine.echo = False
+    parse_errors = 0
+    rejected = {}
     
     # Инициализация БД
     print("1. Инициализация базы данных...")
@@ -86,95 +204,270 @@ def run_sync_version(days=7):
     sync_init_db()
     timings['db_init'] = time.perf_counter() - start
 
-    # Скачивание данных
-    print("2. Скачивание данных с сайта...")
-    start = time.perf_counter()
-    files = sync_download_files(days)
-    timings['download'] = time.perf_counter() - start
-    print(f"   Найдено файлов: {len(files)}")
+    known = sync_get_loaded_bulletins() if incremental else None
+    archive = open_archive(archive_dir)
+    if max_memory is not None:
+        print("2. Скачивание, парсинг и загрузка по одному файлу (ограничение памяти)...")
+        with metrics.stage("stream", app="sync"):
+            streamed = run_sync_streaming(days, known, load_method, memory_plan(max_memory).spool_max_bytes,
+                                          archive, revalidate)
+        files_count, total_records = streamed.pop('files'), streamed.pop('records')
+        rejected, parse_errors = streamed.pop('rejected'), streamed.pop('parse_errors')
+        timings.update(streamed)
+    else:
+        # Скачивание данных
+        print("2. Скачивание данных с сайта...")
+        start = time.perf_counter()
+        with metrics.stage("download", app="sync"):
+            files = sync_download_files(days, known, workers=1, revalidate=revalidate)
+        timings['download'] = time.perf_counter() - start
+        files_count = len(files)
+        print(f"   Найдено файлов: {files_count}")
 
-    # Парсинг данных
-    print("3. Парсинг данных...")
-    start = time.perf_counter()
-    all_data = []
-    for date, content in files:
-        data = sync_parse_data(content)
-        total_records += len(data)
-        all_data.extend(data)
-    timings['parse'] = time.perf_counter() - start
-
-    # Загрузка в БД
-    print("4. Загрузка данных в базу...")
-    start = time.perf_counter()
-    sync_load_data(all_data)
-    timings['db_load'] = time.perf_counter() - start
+        # Парсинг данных
+        print("3. Парсинг данных...")
+        start = time.perf_counter()
+        parsed = []
+        with metrics.stage("parse", app="sync"):
+            for bulletin in files:
+                try:
+                    data = sync_parse(bulletin, archive)
+                except Exception as e:
+                    parse_errors += 1
+                    metrics.inc("spimex_parse_errors_total", app="sync")
+                    print(f"   Ошибка парсинга {bulletin.url}: {e}")
+                    continue
+                total_records += len(data)
+                merge_rejected(rejected, data.rejected)
+                parsed.append((bulletin, data))
+        timings['parse'] = time.perf_counter() - start
+        files_count = len(parsed)
 
-    total_time = sum(timings.values())
+        # Загрузка в БД
+        print("4. Загрузка данных в базу...")
+        start = time.perf_counter()
+        with metrics.stage("load", app="sync"):
+            sync_load_bulletins(parsed, load_method, writers=1)
+        timings['db_load'] = time.perf_counter() - start
+
+    timings['total'] = sum(timings.values())
+    timings['files'] = files_count
+    timings['records'] = total_records
     
     print(f"\nРезультаты синхронной версии:")
     print(f"├── Инициализация БД: {format_time(timings['db_init'])} сек")
     print(f"├── Скачивание файлов: {format_time(timings['download'])} сек")
     print(f"├── Парсинг данных: {format_time(timings['parse'])} сек")
     print(f"├── Загрузка в БД: {format_time(timings['db_load'])} сек")
-    print(f"├── Обработано файлов: {len(files)}")
+    print(f"├── Отброшено строк при очистке: {format_rejected(rejected)}")
+    if parse_errors:
+        print(f"├── Ошибок парсинга: {parse_errors} (файлы не загружены)")
+    print(f"├── Обработано файлов: {files_count}")
     print(f"└── Всего записей: {total_records}")
-    return total_time, len(files), total_records
+    return timings
 
-def main(days=7):
+def run_threads_version(days=7, incremental=False, load_method="merge", archive_dir=None, revalidate=False):
     """
-    Основная функция: запускает обе версии и выводит сравнительный анализ производительности.
+    Запускает синхронную версию на пулах потоков (sync_app.pipeline):
+    файлы скачиваются и парсятся несколькими потоками через общую
+    HTTP-сессию, а загружаются в БД несколькими соединениями. Память
+    ограничена самим конвейером и не зависит от длины периода.
+
+    В инкрементальном режиме скачиваются, парсятся и загружаются только
+    бюллетени, которых еще нет в таблице ingest_state; с revalidate уже
+    загруженные URL перепроверяются условным запросом.
+
+    Returns:
+        dict: Время стадий в секундах (db_init, download, parse, db_load,
+        total), число файлов (files) и записей (records)
+    """
+    print(f"\n=== Синхронная версия на пулах потоков (период: {days} дней) ===")
+    timings = {}
+
+    # Инициализация БД
+    print("1. Инициализация базы данных...")
+    start = time.perf_counter()
+    sync_init_db()
+    timings['db_init'] = time.perf_counter() - start
+
+    # Скачивание, парсинг и загрузка пулами потоков
+    print("2. Скачивание, парсинг и загрузка данных (пулы потоков)...")
+    known = sync_get_loaded_bulletins() if incremental else None
+    with metrics.stage("pipeline", app="threads"):
+        stats = sync_run_pipeline(days, known, load_method=load_method, archive=open_archive(archive_dir),
+                                  revalidate=revalidate)
+    if stats['failed'] or stats['parse_errors']:
+        print(f"   Ошибок скачивания: {stats['failed']}, парсинга: {stats['parse_errors']}")
+    timings['download'] = stats['download']
+    timings['parse'] = stats['parse']
+    timings['db_load'] = stats['db_load']
+
+    timings['pipeline'] = stats['wall_time']
+    timings['total'] = timings['db_init'] + stats['wall_time']
+    timings['files'] = stats['files']
+    timings['records'] = stats['records']
+
+    print(f"\nРезультаты версии на пулах потоков:")
+    print(f"├── Инициализация БД: {format_time(timings['db_init'])} сек")
+    print(f"├── Скачивание файлов: {format_time(timings['download'])} сек")
+    print(f"├── Парсинг данных: {format_time(timings['parse'])} сек")
+    print(f"├── Загрузка в БД: {format_time(timings['db_load'])} сек")
+    print(f"├── Общее время конвейера: {format_time(timings['pipeline'])} сек")
+    print(f"├── Отброшено строк при очистке: {format_rejected(stats['rejected'])}")
+    print(f"├── Обработано файлов: {stats['files']}")
+    print(f"└── Всего записей: {stats['records']}")
+    return timings
+
+def run_backend(backend, days=7, incremental=False, parse_workers=None, load_method="merge", max_memory=None,
+                archive_dir=None, revalidate=False):
+    """
+    Запускает приложение выбранным способом выполнения (см. BACKENDS).
+
+    Args:
+        backend (str): "sync", "threads", "asyncio" или "asyncio+processes"
+        parse_workers (int): Число процессов-парсеров для "asyncio+processes"
+            (по умолчанию - по числу ядер, 0 - то же, что "asyncio")
+        max_memory (int): Потолок памяти, МБ; "threads" ограничивает память сам
+        revalidate (bool): В инкрементальном режиме перепроверять уже загруженные URL
+
+    Returns:
+        dict: Время стадий и счетчики (см. run_async_version)
+    """
+    if backend == "sync":
+        return run_sync_version(days, incremental, load_method, max_memory, archive_dir, revalidate)
+    if backend == "threads":
+        return run_threads_version(days, incremental, load_method, archive_dir, revalidate)
+    if backend == "asyncio":
+        return asyncio.run(run_async_version(days, incremental, 0, load_method, max_memory, archive_dir,
+                                             revalidate))
+    if backend == "asyncio+processes":
+        return asyncio.run(run_async_version(days, incremental, parse_workers, load_method, max_memory,
+                                             archive_dir, revalidate))
+    raise ValueError(f"Неизвестный бэкенд: {backend}. Допустимые: {', '.join(BACKENDS)}")
+
+def main(days=7, incremental=False, parse_workers=None, load_method="merge", max_memory=None, archive_dir=None,
+         backends=DEFAULT_BACKENDS, revalidate=False):
+    """
+    Основная функция: запускает приложение выбранными способами выполнения
+    (по умолчанию - асинхронную и синхронную версии) и выводит сравнение
+    их времени.
+
+    Это однократный запуск против сайта биржи: для воспроизводимых замеров
+    (локальный сервер, повторные прогоны, p50/p95) используйте benchmarks.run.
     """
     print("=" * 60)
     print("СРАВНИТЕЛЬНЫЙ АНАЛИЗ ПРОИЗВОДИТЕЛЬНОСТИ")
     print(f"Дата и время запуска: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Период анализа: {days} дней")
+    print(f"Бэкенды: {', '.join(backends)}")
+    if incremental:
+        print("Режим: инкрементальная загрузка" + (" с перепроверкой загруженных файлов" if revalidate else ""))
+    if max_memory is not None:
+        print(f"Режим: ограничение памяти {max_memory} МБ")
+    if archive_dir:
+        print(f"Архив разобранных бюллетеней: {archive_dir}")
     print("=" * 60)
 
-    # Запуск обеих версий
-    async_time, async_files, async_records = asyncio.run(run_async_version(days))
-    sync_time, sync_files, sync_records = run_sync_version(days)
+    # Запуск выбранных бэкендов по очереди
+    results = {}
+    for backend in backends:
+        results[backend] = run_backend(backend, days, incremental, parse_workers, load_method, max_memory,
+                                       archive_dir, revalidate)
 
     # Подробное сравнение
     print("\n=== Итоговое сравнение ===")
-    print(f"{'Метрика':25} {'Асинхронная':15} {'Синхронная':15}")
-    print("-" * 60)
-    print(f"{'Общее время (сек)':25} {format_time(async_time):15} {format_time(sync_time):15}")
-    print(f"{'Обработано файлов':25} {async_files:15} {sync_files:15}")
-    print(f"{'Всего записей':25} {async_records:15} {sync_records:15}")
-    
+    print(f"{'Метрика':25} " + " ".join(f"{BACKENDS[backend]:>17}" for backend in backends))
+    print("-" * (26 + 18 * len(backends)))
+    print(f"{'Общее время (сек)':25} " + " ".join(f"{format_time(results[backend]['total']):>17}"
+                                                  for backend in backends))
+    print(f"{'Обработано файлов':25} " + " ".join(f"{results[backend]['files']:>17}" for backend in backends))
+    print(f"{'Всего записей':25} " + " ".join(f"{results[backend]['records']:>17}" for backend in backends))
+
     # Анализ производительности
-    diff = abs(async_time - sync_time)
-    faster = "асинхронная" if async_time < sync_time else "синхронная"
-    percent = (diff / max(async_time, sync_time)) * 100
+    if len(backends) > 1:
+        fastest = min(backends, key=lambda backend: results[backend]['total'])
+        fastest_time = results[fastest]['total']
+        print("\nВЫВОДЫ:")
+        print(f"1. Быстрее всех: {BACKENDS[fastest]} ({format_time(fastest_time)} сек)")
+        for backend in backends:
+            if backend == fastest:
+                continue
+            diff = results[backend]['total'] - fastest_time
+            percent = diff / max(results[backend]['total'], 1e-9) * 100
+            print(f"   - {BACKENDS[backend]} медленнее на {format_time(diff)} сек ({percent:.1f}%)")
 
-    print("\nВЫВОДЫ:")
-    print(f"1. {faster.capitalize()} версия быстрее на {format_time(diff)} сек ({percent:.1f}%)")
-    
-    # Анализ эффективности для разного количества файлов
-    if async_files > 1:
-        async_per_file = async_time / async_files
-        sync_per_file = sync_time / sync_files
-        print(f"2. Среднее время на файл:")
-        print(f"   - Асинхронная версия: {format_time(async_per_file)} сек")
-        print(f"   - Синхронная версия:  {format_time(sync_per_file)} сек")
-    
-    # Рекомендации
-    print("\nРЕКОМЕНДАЦИИ:")
-    if async_time < sync_time:
-        print("• Для обработки нескольких файлов рекомендуется использовать асинхронную версию")
-        print("• Асинхронная версия особенно эффективна при большом количестве файлов")
-    else:
-        print("• Для текущего набора данных синхронная версия показывает лучшую производительность")
-        print("• Рекомендуется провести дополнительное тестирование с большим количеством файлов")
-    
+        # Анализ эффективности для разного количества файлов
+        if all(results[backend]['files'] > 1 for backend in backends):
+            print("2. Среднее время на файл:")
+            for backend in backends:
+                per_file = results[backend]['total'] / results[backend]['files']
+                print(f"   - {BACKENDS[backend] + ':':18} {format_time(per_file)} сек")
+
+    print("\nОднократный замер против сайта зависит от сети и порядка запуска версий;")
+    print("для воспроизводимого сравнения используйте: python -m benchmarks.run")
     print("=" * 60)
 
+def rebuild_aggregates():
+    """
+    Пересчитывает дневные агрегаты по всей истории сделок.
+    """
+    sync_init_db()
+    start_time = time.time()
+    sync_rebuild_daily_aggregates()
+    print(f"Дневные агрегаты пересчитаны за {format_time(time.time() - start_time)} сек")
+
 if __name__ == "__main__":
     import argparse
     
-    parser = argparse.ArgumentParser(description='Сравнение производительности синхронной и асинхронной версий парсера')
+    parser = argparse.ArgumentParser(description='Сравнение производительности способов выполнения парсера '
+                                                 '(синхронно, потоки, asyncio, asyncio с процессами)')
     parser.add_argument('--days', type=int, default=7,
                       help='Количество дней для анализа (по умолчанию: 7)')
+    parser.add_argument('--backend', dest='backends', nargs='+', choices=tuple(BACKENDS),
+                      default=list(DEFAULT_BACKENDS),
+                      help='Способы выполнения для запуска и сравнения: sync - все стадии в одном потоке, '
+                           'threads - пулы потоков, asyncio - конвейер asyncio, asyncio+processes - '
+                           'конвейер asyncio с разбором в пуле процессов (по умолчанию: asyncio+processes sync)')
+    parser.add_argument('--incremental', action='store_true',
+                      help='Загружать только бюллетени, которых еще нет в базе')
+    parser.add_argument('--revalidate', action='store_true',
+                      help='С --incremental перепроверять уже загруженные файлы условным запросом '
+                           '(ETag/Last-Modified) и загружать заново переизданные под прежним URL')
+    parser.add_argument('--parse-workers', type=int, default=None,
+                      help='Число процессов для парсинга в бэкенде asyncio+processes '
+                           '(по умолчанию: число ядер, 0 - парсить в цикле событий)')
+    parser.add_argument('--load-method', choices=('merge', 'copy', 'insert'), default='merge',
+                      help='Способ записи в БД: merge - COPY во временную таблицу и слияние, '
+                           'copy - COPY прямо в trades, insert - пакетный INSERT с обновлением '
+                           '(по умолчанию: merge)')
+    parser.add_argument('--rebuild-aggregates', action='store_true',
+                      help='Пересчитать дневные агрегаты по всей истории и завершить работу')
+    parser.add_argument('--max-memory', type=int, default=None, metavar='MB',
+                      help='Режим с ограничением памяти: файлы скачиваются во временные файлы и '
+                           'обрабатываются по мере готовности, память не растет с длиной периода')
+    parser.add_argument('--archive', default=ARCHIVE_DIR, metavar='DIR',
+                      help='Каталог архива разобранных бюллетеней (Parquet, нужен pyarrow): уже '
+                           'архивированные файлы не разбираются повторно (по умолчанию: SPIMEX_ARCHIVE_DIR)')
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                      help='Собрать метрики (HTTP, парсинг, запись в БД) и сохранить их в файл: '
+                           '.json - снимок JSON, иначе - текстовый формат Prometheus')
+    parser.add_argument('--profile', default=None, metavar='DIR',
+                      help='Сохранить профили cProfile по стадиям в каталог (включает сбор метрик)')
+    parser.add_argument('--trace-memory', action='store_true',
+                      help='Замерять пиковую память стадий через tracemalloc (включает сбор метрик)')
+    db_settings.add_arguments(parser)
     
     args = parser.parse_args()
-    main(args.days)
\ No newline at end of file
+    settings = db_settings.from_args(args)
+    async_database.configure(settings)
+    sync_database.configure(settings)
+    if args.metrics or args.profile or args.trace_memory:
+        metrics.enable(args.profile, args.trace_memory)
+    if args.rebuild_aggregates:
+        rebuild_aggregates()
+    else:
+        main(args.days, args.incremental, args.parse_workers, args.load_method, args.max_memory, args.archive,
+             tuple(args.backends), args.revalidate)
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"Метрики сохранены в {args.metrics}")
\ No newline at end of file
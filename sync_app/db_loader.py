@@ -1,27 +1,223 @@
-from typing import List, Dict
-from sync_app.database import SessionLocal, init_db
-from sync_app.models import Trade
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import text
+from sync_app import database
+from sync_app.database import SessionLocal, init_db, ensure_partitions
+from common import loading
+from common.batch import TradeBatch
+from common.ingest import Bulletin
+from common.loading import (  # noqa: F401
+    CLEAR_STAGING_SQL, CREATE_STAGING_SQL, INTEGER_COLUMNS, LOAD_METHOD, LOAD_METHODS, MERGE_STAGING_SQL,
+    STAGING_TABLE, TRADE_COLUMNS, TRADE_KEY, check_method, keyed_rows,
+)
+from common.metrics import metrics
+from common.models import Trade
+from common.result_cache import query_cache
 
-def load_data(data: List[Dict]) -> None:
+# Способы загрузки и общая часть загрузчика - в common.loading; здесь строки
+# передаются командой COPY FROM STDIN (CSV) по соединению psycopg2
+
+# Кэши справочников и проверенные месяцы секций в памяти процесса
+_state = loading.LoaderState()
+
+def _ensure_partitions(batches: List[TradeBatch]) -> None:
+    """
+    Создает секции trades для месяцев загружаемых дат, которых этот
+    процесс еще не проверял.
+    """
+    months = _state.new_months(batches)
+    if months:
+        ensure_partitions(months)
+        _state.partition_months.update(months)
+
+def _resolve_dimensions(batches: List[TradeBatch]) -> None:
+    """
+    Находит id инструментов и базисов, которых еще нет в кэше, добавляя
+    новые значения в справочники.
+
+    Справочники пополняются отдельной короткой транзакцией, и id попадают
+    в кэш только после ее фиксации: откат загрузки сделок не оставит в
+    кэше id несуществующих строк.
+    """
+    names, bases = _state.missing_dimensions(batches)
+    if not names and not bases:
+        return
+    with SessionLocal() as session:
+        with session.begin():
+            instrument_pairs, basis_pairs = loading.add_dimensions(session, names, bases)
+    _state.instrument_ids.update(instrument_pairs)
+    _state.basis_ids.update(basis_pairs)
+
+def _copy_records(session, records: List[tuple], batch_size: int, table: str = Trade.__tablename__) -> None:
+    """
+    Передает записи в таблицу командой COPY FROM STDIN (copy_expert psycopg2)
+    внутри текущей транзакции сессии.
+    """
+    connection = session.connection()
+    cursor = connection.connection.dbapi_connection.cursor()
+    sql = f"COPY {table} ({', '.join(TRADE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    try:
+        for start in range(0, len(records), batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(records[start:start + batch_size])
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            metrics.count_round_trip(connection.info)
+    finally:
+        cursor.close()
+
+def _merge_records(session, records: List[tuple], batch_size: int) -> None:
+    """
+    Загружает записи во временную таблицу и сливает ее с trades одним
+    оператором INSERT ... ON CONFLICT DO UPDATE.
+    """
+    session.execute(text(CREATE_STAGING_SQL))
+    _copy_records(session, records, batch_size, STAGING_TABLE)
+    session.execute(text(MERGE_STAGING_SQL))
+    session.execute(text(CLEAR_STAGING_SQL))
+
+def _write_records(session, records: List[tuple], method: str, batch_size: Optional[int]) -> None:
+    check_method(method)
+    if not records:
+        return
+    batch_size = batch_size or database.settings.copy_batch_size
+    if method == "merge":
+        _merge_records(session, records, batch_size)
+    elif method == "copy":
+        _copy_records(session, records, batch_size)
+    else:
+        loading.insert_records(session, records)
+
+def load_data(data: TradeBatch, method: str = LOAD_METHOD, batch_size: Optional[int] = None) -> None:
     """
     Синхронно загружает данные торгов в базу данных.
 
     Args:
-        data (List[Dict]): Список словарей с данными торгов.
+        data (TradeBatch): Колоночная пачка данных торгов.
+        method (str): Способ загрузки: "merge", "copy" или "insert".
+        batch_size (int): Строк в одной команде COPY (None - из database.settings).
     """
     session = SessionLocal()
     try:
-        trades = [
-            Trade(
-                trade_date=record["trade_date"],
-                volume=record["volume"],
-                price=record["price"]
-            ) for record in data
-        ]
-        session.add_all(trades)
+        batch = keyed_rows(data)
+        _ensure_partitions([batch])
+        _resolve_dimensions([batch])
+        records = _state.trade_records(batch)
+        _write_records(session, records, method, batch_size)
+        if records:
+            loading.refresh_aggregates(session, [batch.trade_date.date()])
         session.commit()
-    except Exception as e:
+        if records:
+            # Сохраненные результаты запросов устарели
+            query_cache.invalidate()
+    except Exception:
+        # Ошибка передается вызывающему: иначе незагруженный бюллетень выглядел бы загруженным
         session.rollback()
-        print(f"Error loading data into DB: {e}")
+        raise
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+def get_loaded_bulletins() -> Dict[str, str]:
+    """
+    Возвращает уже загруженные бюллетени.
+
+    Returns:
+        Dict[str, str]: Словарь {URL бюллетеня: хэш содержимого}
+    """
+    session = SessionLocal()
+    try:
+        return loading.loaded_bulletins(session)
+    finally:
+        session.close()
+
+def load_bulletin(bulletin: Bulletin, data: TradeBatch, method: str = LOAD_METHOD,
+                  batch_size: Optional[int] = None) -> None:
+    """
+    Загружает данные торгов одного бюллетеня и отмечает бюллетень как
+    загруженный в одной транзакции.
+
+    В режимах "merge" и "copy" строки передаются командой COPY FROM STDIN
+    (CSV) по соединению psycopg2 этой же транзакции, порциями по
+    batch_size строк. В режиме "merge" строки сначала попадают во временную
+    таблицу, а затем сливаются с trades, поэтому повторная загрузка того
+    же бюллетеня безопасна.
+
+    Инструменты и базисы хранятся в справочниках instruments и bases, а
+    их id берутся из кэша в памяти процесса; новые значения добавляются
+    в справочники перед загрузкой сделок. Дневные агрегаты
+    (daily_aggregates) за загруженные даты пересчитываются в той же
+    транзакции. Бюллетень без строк сделок не отмечается как загруженный
+    (см. common.loading.skip_empty) и будет запрошен снова.
+
+    Args:
+        bulletin (Bulletin): Загружаемый бюллетень
+        data (TradeBatch): Колоночная пачка данных торгов бюллетеня.
+        method (str): Способ загрузки: "merge", "copy" или "insert".
+        batch_size (int): Строк в одной команде COPY (None - из database.settings).
+    """
+    batch = keyed_rows(data)
+    if len(batch) == 0:
+        loading.skip_empty(bulletin, "sync")
+        return
+    session = SessionLocal()
+    try:
+        _ensure_partitions([batch])
+        _resolve_dimensions([batch])
+        records = _state.trade_records(batch)
+        with metrics.timer("spimex_db_batch_seconds", app="sync", method=method):
+            info = session.connection().info
+            round_trips = metrics.round_trips(info)
+            session.execute(loading.ingest_state_upsert(bulletin, len(records)))
+            _write_records(session, records, method, batch_size)
+            if records:
+                loading.refresh_aggregates(session, [batch.trade_date.date()])
+            metrics.observe("spimex_db_batch_round_trips", metrics.round_trips(info) - round_trips,
+                            app="sync", method=method)
+            session.commit()
+        metrics.observe("spimex_db_batch_rows", len(records), app="sync", method=method)
+        if records:
+            # Сохраненные результаты запросов устарели
+            query_cache.invalidate()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def load_bulletins(items: List[Tuple[Bulletin, TradeBatch]], method: str = LOAD_METHOD,
+                   batch_size: Optional[int] = None, writers: Optional[int] = None) -> None:
+    """
+    Загружает бюллетени, распределяя их по writers одновременным
+    транзакциям: каждый бюллетень загружается load_bulletin в своем
+    потоке и по своему соединению из пула.
+
+    Бюллетени разных дат не пересекаются по ключам trades и
+    daily_aggregates, поэтому транзакции не блокируют друг друга;
+    справочники пополняются в порядке сортировки значений.
+
+    Args:
+        items (List[Tuple[Bulletin, TradeBatch]]): Пары (бюллетень, данные торгов)
+        method (str): Способ загрузки: "merge", "copy" или "insert".
+        batch_size (int): Строк в одной команде COPY (None - из database.settings).
+        writers (int): Одновременных транзакций (None - из database.settings).
+    """
+    writers = min(writers or database.settings.writers, len(items))
+    if writers <= 1:
+        for bulletin, data in items:
+            load_bulletin(bulletin, data, method, batch_size)
+        return
+    with ThreadPoolExecutor(max_workers=writers, thread_name_prefix="db-writer") as pool:
+        for _ in pool.map(lambda item: load_bulletin(item[0], item[1], method, batch_size), items):
+            pass
+
+def rebuild_daily_aggregates() -> None:
+    """
+    Пересчитывает таблицу дневных агрегатов по всей истории сделок
+    (одной транзакцией: до её фиксации читатели видят прежние агрегаты).
+    """
+    with SessionLocal() as session:
+        with session.begin():
+            loading.rebuild_aggregates(session)
+    query_cache.invalidate()
@@ -1,92 +1,331 @@
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
-import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import time
 
-def find_file_links(date):
+from common.cache import get_cache
+from common.index import (  # noqa: F401
+    BASE_URL, MAX_INDEX_PAGES, RESULTS_URL, file_date_from_url, index_page_url, links_in_period,
+    merge_index_page, parse_index_page, period_bounds,
+)
+from common.ingest import filter_new_bulletins, make_bulletin, make_spooled_bulletin, select_new_links
+from common.metrics import metrics
+from common.spool import SPOOL_CHUNK_SIZE, SPOOL_MAX_BYTES, SpooledBody
+
+# Параметры HTTP-сессии и пула потоков загрузки
+DOWNLOAD_WORKERS = 8       # Потоков, одновременно скачивающих файлы
+CONNECT_TIMEOUT = 10       # Таймаут установки соединения, сек
+READ_TIMEOUT = 60          # Таймаут чтения из сокета, сек
+MAX_RETRIES = 5            # Повторных попыток после первой неудачной
+BACKOFF_FACTOR = 0.5       # Базовая задержка экспоненциального backoff, сек
+
+# HTTP-статусы, при которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def create_session(pool_size=DOWNLOAD_WORKERS, max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
     """
-    Находит ссылки на файлы для конкретной даты.
-    
+    Создает requests.Session с пулом keep-alive соединений на pool_size
+    соединений к хосту и повторными попытками с экспоненциальной задержкой
+    при ошибках 5xx/429 и обрывах соединения (с учетом Retry-After).
+
+    Returns:
+        requests.Session: Сессия для HTTP-запросов
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods={"GET"},
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True,
+                          max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Возвращает общую для процесса HTTP-сессию (соединения переиспользуются
+    всеми запросами и потоками загрузки).
+
+    Returns:
+        requests.Session: Сессия для HTTP-запросов
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+def http_get(url, headers=None, stream=False):
+    """
+    Выполняет GET-запрос через общую сессию, записывая время запроса
+    (вместе с повторными попытками) и размер ответа в метрики.
+
     Args:
-        date (datetime): Дата для поиска файлов
-    
+        url (str): URL запроса
+        headers (dict): Дополнительные заголовки запроса
+        stream (bool): Не читать тело ответа (его читает вызывающий код,
+            он же учитывает размер в метриках)
+
     Returns:
-        list: Список найденных ссылок на файлы
+        requests.Response: Ответ сервера
+    """
+    started = time.perf_counter()
+    response = get_session().get(url, headers=headers, stream=stream, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    metrics.observe("spimex_http_request_seconds", time.perf_counter() - started,
+                    app="sync", status=response.status_code)
+    if not stream:
+        metrics.observe("spimex_http_response_bytes", len(response.content), app="sync")
+    return response
+
+def build_links_index(start_date):
+    """
+    Один раз обходит постраничный индекс результатов торгов и строит
+    словарь {дата торгов: [ссылки на файлы]}.
+
+    Обход останавливается, как только на странице встречаются даты раньше
+    start_date, либо когда страница не содержит новых ссылок.
+
+    Args:
+        start_date (date): Самая ранняя интересующая дата
+
+    Returns:
+        dict: Словарь {дата торгов: [ссылки на файлы]}
+    """
+    links_index = {}
+    seen = set()
+
+    for page in range(1, MAX_INDEX_PAGES + 1):
+        response = http_get(index_page_url(page))
+        response.raise_for_status()
+        if not merge_index_page(links_index, seen, parse_index_page(response.text), start_date):
+            break
+
+    return links_index
+
+def _check_response(response):
+    """
+    Проверяет ответ на запрос тела файла: ошибочный статус или 304 на
+    безусловный запрос (тела в нем нет, и пустое содержимое не должно
+    попасть в кэш) вызывают requests.HTTPError.
     """
-    date_str = date.strftime("%Y%m%d")
-    url = f"https://spimex.com/markets/oil_products/trades/results/"
-    
-    response = requests.get(url)
     response.raise_for_status()
-    content = response.text
-    soup = BeautifulSoup(content, "html.parser")
-    
-    links = []
-    for link in soup.find_all("a", class_="accordeon-inner__item-title", href=True):
-        if date_str in link["href"]:
-            links.append("https://spimex.com" + link["href"])
-    
-    return links
+    if response.status_code == 304:
+        raise requests.HTTPError("HTTP 304 на безусловный запрос", response=response)
 
-def download_file(url):
+def download_file(url, cache=None):
     """
     Скачивает содержимое файла по URL.
+
+    Если передан кэш и файл в нем есть, выполняется условный запрос
+    (If-None-Match / If-Modified-Since); при ответе 304 содержимое берется
+    из кэша.
     
     Args:
         url (str): URL файла
+        cache (BulletinCache): Локальный кэш бюллетеней
     
     Returns:
         tuple: (дата файла, содержимое файла)
+
+    Raises:
+        requests.HTTPError: Ошибочный статус ответа или 304 без файла в кэше
     """
-    response = requests.get(url)
-    response.raise_for_status()
-    content = response.content
+    entry = cache.lookup(url) if cache is not None else None
+    response = http_get(url, headers=entry.conditional_headers() if entry else None)
+
+    content = None
+    if response.status_code == 304 and entry is not None:
+        content = cache.read(entry)
+        if content is not None:
+            cache.touch(url, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        else:
+            # Файл в кэше поврежден - скачиваем заново без условий
+            response = http_get(url)
+
+    if content is None:
+        _check_response(response)
+        content = response.content
+        if cache is not None:
+            cache.store(url, content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
     
-    # Извлекаем дату из URL
-    date_match = re.search(r'(\d{8})', url)
-    if date_match:
-        date_str = date_match.group(1)
-        file_date = datetime.strptime(date_str, "%Y%m%d")
-    else:
-        file_date = None
-        
-    return file_date, content
-
-def download_files_for_period(days=7):
+    return file_date_from_url(url), content
+
+def download_file_spooled(url, cache=None, spool_max_bytes=SPOOL_MAX_BYTES):
+    """
+    Скачивает файл по URL, записывая тело ответа порциями во временный файл.
+
+    Работает как download_file, но содержимое не собирается в памяти
+    целиком: в памяти остается не больше spool_max_bytes байт, остальное
+    хранится на диске.
+
+    Args:
+        url (str): URL файла
+        cache (BulletinCache): Локальный кэш бюллетеней
+        spool_max_bytes (int): Байт содержимого в памяти до сброса на диск
+
+    Returns:
+        tuple: (дата файла, SpooledBody с содержимым файла)
+
+    Raises:
+        requests.HTTPError: Ошибочный статус ответа или 304 без файла в кэше
+    """
+    entry = cache.lookup(url) if cache is not None else None
+    body = SpooledBody(spool_max_bytes)
+    response = http_get(url, headers=entry.conditional_headers() if entry else None, stream=True)
+    try:
+        content = None
+        if response.status_code == 304 and entry is not None:
+            content = cache.read(entry)
+        if content is not None:
+            body.write(content)
+            cache.touch(url, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        else:
+            if response.status_code == 304 and entry is not None:
+                # Файл в кэше поврежден - скачиваем заново без условий
+                response.close()
+                response = http_get(url, stream=True)
+            _check_response(response)
+            for chunk in response.iter_content(SPOOL_CHUNK_SIZE):
+                body.write(chunk)
+            metrics.observe("spimex_http_response_bytes", body.size, app="sync")
+            if cache is not None:
+                cache.store_file(url, body.rewind(), body.digest, body.size,
+                                 response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    except BaseException:
+        body.close()
+        raise
+    finally:
+        response.close()
+
+    return file_date_from_url(url), body
+
+def period_links(days=7, known=None, revalidate=False):
+    """
+    Находит ссылки на еще не загруженные бюллетени за период.
+
+    Args:
+        days (int): Количество дней (по умолчанию 7)
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш}
+        revalidate (bool): Не пропускать загруженные URL, а перепроверять их
+            условным запросом (см. common.ingest.select_new_links)
+
+    Returns:
+        List[str]: Ссылки на файлы в порядке дат торгов
+    """
+    start_date, end_date = period_bounds(days)
+
+    # Индекс скачивается один раз, даты берутся из него
+    links_index = build_links_index(start_date)
+    return select_new_links(links_in_period(links_index, start_date, end_date), known, revalidate)
+
+def _download_or_report(link, cache, download=download_file, **options):
+    """
+    Скачивает файл, печатая ошибку вместо исключения (для пула потоков).
+
+    Returns:
+        tuple: (дата файла, содержимое) или None при ошибке
+    """
+    try:
+        return download(link, cache, **options)
+    except Exception as e:
+        print(f"Error downloading {link}: {e}")
+        return None
+
+def download_files_for_period(days=7, known=None, use_cache=True, workers=DOWNLOAD_WORKERS, revalidate=False):
     """
     Скачивает файлы за указанный период дней.
+
+    Файлы скачиваются пулом из workers потоков через общую сессию с
+    keep-alive соединениями; порядок результата совпадает с порядком дат.
     
     Args:
         days (int): Количество дней для скачивания (по умолчанию 7)
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш}; если
+            передан, скачиваются и возвращаются только новые или измененные
+        use_cache (bool): Использовать локальный кэш бюллетеней
+        workers (int): Число потоков загрузки
+        revalidate (bool): Перепроверять уже загруженные URL (см. period_links)
     
     Returns:
-        list: Список кортежей (дата, содержимое файла)
+        List[Bulletin]: Скачанные бюллетени (дата, содержимое, URL, хэш)
     """
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    # Создаем список дат для скачивания
-    dates = []
-    current_date = start_date
-    while current_date <= end_date:
-        if current_date.weekday() < 5:  # Пропускаем выходные
-            dates.append(current_date)
-        current_date += timedelta(days=1)
-
-    # Получаем ссылки на файлы для всех дат
-    all_links = []
-    for date in dates:
-        links = find_file_links(date)
-        all_links.extend(links)
+    all_links = period_links(days, known, revalidate)
 
     # Скачиваем все файлы
+    cache = get_cache() if use_cache else None
     results = []
-    for link in all_links:
-        try:
-            result = download_file(link)
-            if isinstance(result[1], bytes) and result[0] is not None:
-                results.append(result)
-        except Exception as e:
-            print(f"Error downloading {link}: {e}")
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="downloader") as pool:
+        downloaded = pool.map(lambda link: _download_or_report(link, cache), all_links)
+        for link, result in zip(all_links, downloaded):
+            if result is None:
+                continue
+            file_date, content = result
+            if isinstance(content, bytes) and file_date is not None:
+                results.append(make_bulletin(file_date, content, link))
     
-    return results
\ No newline at end of file
+    return filter_new_bulletins(results, known)
+
+def iter_files_for_period(days=7, known=None, use_cache=True, spool_max_bytes=SPOOL_MAX_BYTES,
+                          workers=DOWNLOAD_WORKERS, revalidate=False):
+    """
+    Скачивает файлы за период по мере перебора (режим с ограничением памяти).
+
+    Пул из workers потоков скачивает не больше workers файлов вперед от
+    того, который обрабатывает вызывающий код; содержимое хранится во
+    временных файлах. За весь перебор в памяти не накапливается ничего,
+    кроме списка ссылок.
+
+    Args:
+        days (int): Количество дней для скачивания (по умолчанию 7)
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш}
+        use_cache (bool): Использовать локальный кэш бюллетеней
+        spool_max_bytes (int): Байт содержимого в памяти до сброса на диск
+        workers (int): Число потоков загрузки (и файлов, скачиваемых вперед)
+        revalidate (bool): Перепроверять уже загруженные URL (см. period_links)
+
+    Yields:
+        SpooledBulletin: Скачанный бюллетень (содержимое - во временном файле)
+    """
+    cache = get_cache() if use_cache else None
+    links = iter(period_links(days, known, revalidate))
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="downloader") as pool:
+        def submit_next():
+            link = next(links, None)
+            if link is not None:
+                pending.append((link, pool.submit(_download_or_report, link, cache, download_file_spooled,
+                                                  spool_max_bytes=spool_max_bytes)))
+
+        try:
+            for _ in range(max(1, workers)):
+                submit_next()
+            while pending:
+                link, future = pending.popleft()
+                submit_next()
+                result = future.result()
+                if result is None:
+                    continue
+                file_date, body = result
+                bulletin = make_spooled_bulletin(file_date, body, link)
+                if file_date is None or not filter_new_bulletins([bulletin], known):
+                    body.close()
+                    continue
+                yield bulletin
+        finally:
+            # Перебор прерван: временные файлы уже скачанных бюллетеней закрываются
+            for _, future in pending:
+                if not future.cancel():
+                    result = future.result()
+                    if result is not None:
+                        result[1].close()
@@ -0,0 +1,146 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+from common.archive import BulletinArchive, parse_archived
+from common.batch import TradeBatch
+from common.cache import get_cache
+from common.cleaning import merge_rejected, record_rejected
+from common.ingest import Bulletin, filter_new_bulletins, make_bulletin
+from common.metrics import metrics
+from common.parser import parse_data
+from sync_app import database
+from sync_app.db_loader import LOAD_METHOD, load_bulletin
+from sync_app.downloader import DOWNLOAD_WORKERS, download_file, period_links
+
+class _Fetched(NamedTuple):
+    """
+    Итог обработки одной ссылки потоком загрузки.
+    """
+    bulletin: Optional[Bulletin]
+    data: Optional[TradeBatch]
+    download_time: float
+    parse_time: float
+    failed: bool = False
+    parse_error: bool = False
+
+def _fetch_and_parse(link, cache, known, archive) -> _Fetched:
+    """
+    Скачивает и парсит один файл (выполняется в потоке пула).
+    """
+    started = time.perf_counter()
+    try:
+        file_date, content = download_file(link, cache)
+    except Exception as e:
+        print(f"Error downloading {link}: {e}")
+        return _Fetched(None, None, time.perf_counter() - started, 0.0, failed=True)
+    download_time = time.perf_counter() - started
+    if file_date is None:
+        return _Fetched(None, None, download_time, 0.0)
+    bulletin = make_bulletin(file_date, content, link)
+    if not filter_new_bulletins([bulletin], known):
+        return _Fetched(None, None, download_time, 0.0)
+
+    started = time.perf_counter()
+    try:
+        data, archived = parse_archived(parse_data, bulletin, archive)
+    except Exception as e:
+        metrics.inc("spimex_parse_errors_total", app="sync")
+        print(f"   Ошибка парсинга {link}: {e}")
+        return _Fetched(None, None, download_time, time.perf_counter() - started, parse_error=True)
+    parse_time = time.perf_counter() - started
+    metrics.observe("spimex_parse_seconds", parse_time, app="sync")
+    metrics.observe("spimex_parse_rows", len(data), app="sync")
+    if archived:
+        metrics.inc("spimex_archive_hits_total", app="sync")
+    record_rejected(data.rejected, "sync")
+    # Содержимое файла больше не нужно: на загрузку уходит только описание бюллетеня
+    return _Fetched(bulletin._replace(content=b""), data, download_time, parse_time)
+
+def _timed_load(bulletin, data, load_method) -> float:
+    started = time.perf_counter()
+    load_bulletin(bulletin, data, load_method)
+    return time.perf_counter() - started
+
+def run_pipeline(days=7, known: Optional[Dict[str, str]] = None, workers=DOWNLOAD_WORKERS,
+                 writers: Optional[int] = None, load_method=LOAD_METHOD,
+                 archive: Optional[BulletinArchive] = None, links: Optional[List[str]] = None,
+                 revalidate: bool = False) -> Dict:
+    """
+    Скачивает, парсит и загружает бюллетени за период на пулах потоков.
+
+    Каждый поток загрузки скачивает файл через общую HTTP-сессию и сразу
+    его парсит, а разобранные бюллетени загружаются в БД пулом из writers
+    потоков, каждый по своему соединению. Вперед скачивается не больше
+    2 * workers файлов, а загрузки ждут не больше writers бюллетеней,
+    поэтому память не растет с длиной периода. Парсинг выполняется под
+    GIL, и потоки ускоряют в основном сеть и БД.
+
+    Args:
+        days (int): Количество дней (по умолчанию 7)
+        known (Dict[str, str]): Уже загруженные бюллетени {URL: хэш}, они пропускаются
+        workers (int): Число потоков, скачивающих и парсящих файлы
+        writers (int): Число потоков загрузки в БД (None - из database.settings)
+        load_method (str): Способ записи в БД: "merge", "copy" или "insert"
+        archive (BulletinArchive): Архив разобранных бюллетеней (None - не использовать)
+        links (List[str]): Готовый список ссылок на файлы; если передан, индекс
+            не обходится, а days не используется
+        revalidate (bool): Перепроверять уже загруженные URL условным запросом
+            (см. common.ingest.select_new_links)
+
+    Returns:
+        dict: Суммарное время занятости стадий (download, parse, db_load),
+        общее время (wall_time), число файлов (files), записей (records),
+        ошибок скачивания (failed) и парсинга (parse_errors) и строк,
+        отброшенных при очистке, по причинам (rejected)
+    """
+    workers = max(1, workers)
+    writers = writers or database.settings.writers
+    started = time.perf_counter()
+    stats = {'download': 0.0, 'parse': 0.0, 'db_load': 0.0, 'files': 0, 'records': 0,
+             'failed': 0, 'parse_errors': 0, 'rejected': {}}
+    if links is None:
+        links = period_links(days, known, revalidate)
+    # Время поиска ссылок относится к скачиванию, как в асинхронном конвейере
+    stats['download'] += time.perf_counter() - started
+
+    cache = get_cache()
+    pending_links = iter(links)
+    fetches = deque()
+    loads = deque()
+
+    def finish_load():
+        rows, future = loads.popleft()
+        stats['db_load'] += future.result()
+        stats['files'] += 1
+        stats['records'] += rows
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="downloader") as fetchers, \
+            ThreadPoolExecutor(max_workers=writers, thread_name_prefix="db-writer") as loaders:
+        def submit_fetch():
+            link = next(pending_links, None)
+            if link is not None:
+                fetches.append(fetchers.submit(_fetch_and_parse, link, cache, known, archive))
+
+        for _ in range(2 * workers):
+            submit_fetch()
+        while fetches:
+            fetched = fetches.popleft().result()
+            submit_fetch()
+            stats['download'] += fetched.download_time
+            stats['parse'] += fetched.parse_time
+            stats['failed'] += fetched.failed
+            stats['parse_errors'] += fetched.parse_error
+            if fetched.bulletin is None:
+                continue
+            merge_rejected(stats['rejected'], fetched.data.rejected)
+            loads.append((len(fetched.data), loaders.submit(_timed_load, fetched.bulletin, fetched.data,
+                                                            load_method)))
+            while len(loads) > writers:
+                finish_load()
+        while loads:
+            finish_load()
+
+    stats['wall_time'] = time.perf_counter() - started
+    return stats